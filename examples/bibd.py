@@ -9,17 +9,16 @@ import minizinc
 # occur together in exactly λ blocks.
 
 def bibd(model, solver, v, b, r, k, l):
-    indicies = [(i, j) for i in range(v) for j in range(b)]
-    xs = model.add_variables("x", indices=indicies, vtype=pymzm.Variable.VTYPE_BOOL) # bool if object v is in block b
+    xs = model.add_variable_array("x", (v, b), vtype=pymzm.Variable.VTYPE_BOOL) # bool if object v is in block b
 
     for i in range(b):
-        model.add_constraint(pymzm.Expression.sum(xs[i, j] for j in range(v)) == r)
+        model.add_constraint(pymzm.Expression.sum(xs[i, :]) == r)
     for i in range(v):
-        model.add_constraint(pymzm.Expression.sum(xs[j, i] for j in range(b)) == k)
+        model.add_constraint(pymzm.Expression.sum(xs[:, i]) == k)
 
     for i in range(b):
         for j in range(i):
-            model.add_constraint(pymzm.Expression.sum(xs[i, k] * xs[j, k] for k in range(v)) == l)
+            model.add_constraint(pymzm.Expression.sum(xs[i, :] * xs[j, :]) == l)
 
     model.set_solve_criteria(pymzm.SOLVE_SATISFY)
     model.generate()
@@ -5,11 +5,11 @@ import minizinc
 # https://imada.sdu.dk/u/march/Teaching/AY2023-2024/DM841/exercises/sheet02
 
 def nqueens(model, solver, n):
-    q = model.add_variables("q", range(n), val_min=0, val_max=n-1)
+    q = model.add_variable_array("q", n, val_min=0, val_max=n-1)
 
     model.add_constraint(pymzm.Constraint.alldifferent(q))
-    model.add_constraint(pymzm.Constraint.alldifferent([q[i] + i for i in range(n)]))
-    model.add_constraint(pymzm.Constraint.alldifferent([q[i] - i for i in range(n)]))
+    model.add_constraint(pymzm.Constraint.alldifferent(q + list(range(n))))
+    model.add_constraint(pymzm.Constraint.alldifferent(q - list(range(n))))
 
     model.set_solve_criteria("satisfy")
     model.generate()
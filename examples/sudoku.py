@@ -8,17 +8,18 @@ model = pymzm.Model()
 
 n = 3
 N = n * n
-xs = model.add_variables("x", [(i, j) for i in range(N) for j in range(N)], val_min=1, val_max=N)
+xs = model.add_variable_array("x", (N, N), val_min=1, val_max=N)
 
 # Small squares alldifferent
+boxes = xs.blocks(n, n)
 for i in range(n):
     for j in range(n):
-        model.add_constraint(pymzm.Constraint.alldifferent([xs[i * 3 + kx, j * 3 + ky] for kx in range(n) for ky in range(n)]))
+        model.add_constraint(pymzm.Constraint.alldifferent(boxes[i, j]))
 
 for i in range(N):
-    model.add_constraint(pymzm.Constraint.alldifferent([xs[i, j] for j in range(N)]))
+    model.add_constraint(pymzm.Constraint.alldifferent(xs[i, :]))
 for j in range(N):
-    model.add_constraint(pymzm.Constraint.alldifferent([xs[i, j] for i in range(N)]))
+    model.add_constraint(pymzm.Constraint.alldifferent(xs[:, j]))
 
 _ = 0
 sod = [
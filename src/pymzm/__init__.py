@@ -2,7 +2,14 @@ from .exceptions import *
 from .model import *
 from .misc import *
 
+from .domain import *
 from .expression import *
+from .expression_array import *
 from .variable import *
 from .constraint import *
+from .parameter import *
+from .optimize import *
+from .flatzinc import *
+from .solution import *
 
+from .snapshot import *
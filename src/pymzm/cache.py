@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import List, Optional, Tuple
+
+import minizinc
+
+from .exceptions import *
+
+CACHE_FZN = "model.fzn"
+CACHE_OZN = "model.ozn"
+
+class CompileCache:
+    """On-disk cache of compiled models, a directory with one entry per
+    fingerprint (see `Model.fingerprint`) holding the `.fzn` and `.ozn` files
+    written by `minizinc -c`.
+
+    Entries are used in least recently used order: a hit touches the entry and
+    `put` removes the oldest entries once the files take more than `max_bytes`.
+    New entries are renamed into place, so several processes can share the
+    directory.
+
+    Args:
+        directory (str): cache directory, created if missing
+        max_bytes (int): size the entries are trimmed to after each `put`
+    """
+    def __init__(self, directory: str, max_bytes: int=1 << 30):
+        self.directory = os.fspath(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str) -> Optional[Tuple[str, str]]:
+        """Paths of the cached `.fzn` and `.ozn` files of `key`, None on a miss."""
+        entry = self._entry(key)
+        fzn, ozn = os.path.join(entry, CACHE_FZN), os.path.join(entry, CACHE_OZN)
+        if (not (os.path.isfile(fzn) and os.path.isfile(ozn))):
+            self.misses += 1
+            return None
+        try:
+            os.utime(entry)
+        except FileNotFoundError:
+            # Evicted by another process in the meantime
+            self.misses += 1
+            return None
+        self.hits += 1
+        return fzn, ozn
+
+    def put(self, key: str, fzn: str, ozn: str) -> Tuple[str, str]:
+        """Move the compiled files into the cache under `key` and evict the
+        least recently used entries beyond `max_bytes`.
+
+        Returns:
+            Tuple[str, str]: the paths of the cached files
+        """
+        entry = self._entry(key)
+        staging = tempfile.mkdtemp(prefix=".tmp-", dir=self.directory)
+        shutil.move(os.fspath(fzn), os.path.join(staging, CACHE_FZN))
+        shutil.move(os.fspath(ozn), os.path.join(staging, CACHE_OZN))
+        try:
+            os.rename(staging, entry)
+        except OSError:
+            # Stored by another process first, the contents are the same
+            shutil.rmtree(staging, ignore_errors=True)
+            os.utime(entry)
+        self.evict(keep=key)
+        return os.path.join(entry, CACHE_FZN), os.path.join(entry, CACHE_OZN)
+
+    def entries(self) -> List[Tuple[float, int, str]]:
+        """(last use, size in bytes, key) of each entry, oldest first."""
+        entries = []
+        for key in os.listdir(self.directory):
+            entry = self._entry(key)
+            if (key.startswith(".") or not os.path.isdir(entry)):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+                entries.append((os.path.getmtime(entry), size, key))
+            except FileNotFoundError:
+                continue
+        entries.sort()
+        return entries
+
+    def size(self) -> int:
+        """Total size of the cached files in bytes."""
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep: str=None):
+        """Remove the least recently used entries until the cache fits in
+        `max_bytes`. The entry `keep` is never removed."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if (total <= self.max_bytes):
+                break
+            if (key == keep):
+                continue
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """Remove every entry."""
+        for _, _, key in self.entries():
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+
+def fingerprint(texts: List[str], files: List[str], solver: minizinc.Solver, options: List[str]=()) -> str:
+    """Content hash of a compilation: the model text and data given as strings,
+    the contents of the included files, the solver and its version, and the
+    extra `minizinc -c` options.
+
+    Returns:
+        str: hex digest, usable as a file name
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    def feed(part: bytes):
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    for text in texts:
+        feed(text.encode())
+    for path in files:
+        with open(path, "rb") as f:
+            feed(f.read())
+    feed(f"{solver.id}@{solver.version}".encode())
+    feed(json.dumps(list(options)).encode())
+    return digest.hexdigest()
+
+def compile_mzn(files: List[str], solver: minizinc.Solver, fzn: str, ozn: str, options: List[str]=()):
+    """Run `minizinc -c` on `files`, writing the FlatZinc to `fzn` and the
+    output model to `ozn`.
+
+    Raises:
+        PymzmCompileError: the compiler failed, with its error output
+    """
+    driver = minizinc.default_driver
+    if (driver is None):
+        raise Exception("No compatible driver provided")
+    args = [str(driver.executable), "-c", "--solver", solver.id, *options,
+            "--fzn", os.fspath(fzn), "--ozn", os.fspath(ozn), *map(os.fspath, files)]
+    output = subprocess.run(args, capture_output=True, text=True)
+    if (output.returncode != 0):
+        raise PymzmCompileError(output.stderr)
@@ -1,4 +1,7 @@
 
+import hashlib
+from typing import Dict, List
+
 from .variable import *
 from .misc import *
 
@@ -8,6 +11,7 @@ class Constant:
     def __init__(self, name: str, value, vtype=Variable.VTYPE_INTEGER):
         self.name = name
         self.value = value
+        self._digest = None
         if (self.value is None):
             raise Exception("Non-initialized constant is not supported by pymzm.")
         
@@ -15,35 +19,119 @@ class Constant:
         if (self.vtype not in [Variable.VTYPE_INTEGER, Variable.VTYPE_BOOL]):
             raise Exception("Invalid vtype for constant. Currently only integer and boolean types are supported")
         
-        arr = np.array(value)
-        if (arr.shape):
+        # Arrays, including np.memmap, are kept by reference and only read
+        # when the value is written
+        shape = value.shape if isinstance(value, np.ndarray) else np.shape(value)
+        if (shape):
             # Is nd array
-            self.shape = arr.shape
+            self.shape = shape
 
         else:
             # is single value
             self.shape = None
         
+    @property
+    def digest(self) -> bytes:
+        """Hash of the type, shape and values, computed once. Constants with the
+        same digest have the same content, the value must not change after the
+        first use."""
+        if (self._digest is None):
+            self._digest = self._content_hash()
+        return self._digest
+
+    def _content_hash(self) -> bytes:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{self.vtype}:{self.shape}:".encode())
+        if (self.shape is None):
+            h.update(repr(self._data_value()).encode())
+            return h.digest()
+
+        # Integer and bool elements hash as int64, read block by block
+        values = np.asarray(self.value)
+        flat = values.reshape(-1) if values.flags.c_contiguous else values.flat
+        for start in range(0, values.size, 1 << 16):
+            block = np.asarray(flat[start:start + (1 << 16)])
+            if (block.dtype.kind in "iub"):
+                h.update(block.astype(np.int64, copy=False).tobytes())
+            else:
+                h.update(repr(block.tolist()).encode())
+        return h.digest()
+
     def __getitem__(self, other: Expression):
         # TODO boolean expression
         if (self.shape is None):
             raise Exception("Constant cant be indexed as it is a single value")
         
+        cls = ExpressionBool if self.vtype == Variable.VTYPE_BOOL else Expression
         if (len(self.shape) == 1):
-            return Expression(f"{self.name}[{str(other)} + 1]")
+            return cls._index(self.name, [other + 1])
         
         else:
-            return Expression(f"{self.name}[{', '.join(f'{o} + 1' for o in other)}]")
+            return cls._index(self.name, [o + 1 for o in other])
 
     def __str__(self):
         return self.name
     
-    def _to_mz(self):
+    def _type(self) -> str:
         if (self.shape is None):
-            return f"{self.vtype}: {self.name} = {self.value};\n"
-        
+            return self.vtype
+        return f"array[{','.join(f'1..{d}' for d in self.shape)}] of {self.vtype}"
+
+    def _value_mz(self) -> str:
+        if (self.shape is None):
+            value = self._data_value()
+            return str(value).lower() if isinstance(value, bool) else f"{value}"
+        return array_to_mz(self.value)
+
+    def _value_chunks(self):
+        if (self.shape is None):
+            yield self._value_mz()
         else:
-            mz_array = array_py2mz(self.value, self.shape)
-            return f"array[{','.join(f'1..{d}' for d in self.shape)}] of {self.vtype}: {self.name} = {mz_array};\n"
-        
-        
\ No newline at end of file
+            yield from array_to_mz_chunks(self.value)
+
+    def _to_mz(self):
+        return f"{self._type()}: {self.name} = {self._value_mz()};\n"
+
+    def _to_mz_chunks(self):
+        """`_to_mz` in pieces of bounded size."""
+        yield f"{self._type()}: {self.name} = "
+        yield from self._value_chunks()
+        yield ";\n"
+
+    def _alias(self, original: "Constant"):
+        """Declaration of the constant as a copy of `original`."""
+        return f"{self._type()}: {self.name} = {original.name};\n"
+
+    def _declaration(self):
+        """Declaration without the value, which is given by the instance data."""
+        return f"{self._type()}: {self.name};\n"
+
+    def _to_dzn(self):
+        return f"{self.name} = {self._value_mz()};\n"
+
+    def _to_dzn_chunks(self):
+        yield f"{self.name} = "
+        yield from self._value_chunks()
+        yield ";\n"
+
+    def _data_value(self):
+        """Value as plain Python data, for JSON and `minizinc.Instance` data."""
+        if (isinstance(self.value, np.ndarray)):
+            return self.value.tolist()
+        if (isinstance(self.value, np.generic)):
+            return self.value.item()
+        return self.value
+
+def find_duplicate_constants(constants: List[Constant]) -> Dict[Constant, Constant]:
+    """Constants with the same content as an earlier one.
+
+    Returns:
+        Dict[Constant, Constant]: duplicate -> first constant with its content
+    """
+    first = {}
+    duplicates = {}
+    for constant in constants:
+        original = first.setdefault(constant.digest, constant)
+        if (original is not constant):
+            duplicates[constant] = original
+    return duplicates
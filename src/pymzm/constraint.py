@@ -3,6 +3,7 @@ from typing import List
 
 from .exceptions import *
 from .expression import *
+from .expression import _render
 
 class AnnotationConstraint:
     ANNOTATIONS = [
@@ -67,17 +68,17 @@ class Constraint:
         self.is_redundant = is_redundant
 
     def __str__(self):
-        return self.cstr
+        return str(self.cstr)
     
-    def _to_mz(self):
+    def _to_mz(self, aliases: dict=None):
         if (self.is_redundant):
-            return f"constraint redundant_constraint({self.cstr});\n"
+            return f"constraint redundant_constraint({_render(self.cstr, aliases)});\n"
         else:
-            return f"constraint {self.cstr};\n"
+            return f"constraint {_render(self.cstr, aliases)};\n"
 
     @staticmethod
     def _from_global_constraint(func: str, ctype: str, *args):
-        return Constraint(f"{func}({', '.join(str(a) for a in args)})", ctype)
+        return Constraint(ExpressionBool._func(func, args), ctype)
 
     @staticmethod
     def alldifferent(exprs: List[Expression]) -> "Constraint":
@@ -0,0 +1,133 @@
+from bisect import bisect_right
+from typing import Iterable, List, Tuple
+
+class Domain:
+    """Set of integers stored as sorted, disjoint intervals.
+
+    Large mostly contiguous domains stay small: `Domain(range(1, 501))` is one
+    interval and is written as `1..500`, `{1, 2, 700, 701, 702}` is written as
+    `{1, 2} union 700..702`. Membership, intersection and union run on the
+    intervals without expanding them. Domains are immutable and compare equal
+    to sets of the same values.
+    """
+    __slots__ = ("intervals", "_lows", "_hash")
+
+    def __init__(self, values: Iterable[int]=()):
+        if (isinstance(values, Domain)):
+            intervals = values.intervals
+        elif (isinstance(values, range) and values.step == 1):
+            intervals = ((values.start, values.stop - 1),) if len(values) else ()
+        else:
+            intervals = Domain._coalesce((v, v) for v in sorted(set(map(int, values))))
+        self._set(intervals)
+
+    def _set(self, intervals: tuple):
+        self.intervals = intervals
+        self._lows = tuple(lo for lo, _ in intervals)
+        self._hash = None
+
+    @staticmethod
+    def from_intervals(intervals: Iterable[Tuple[int, int]]) -> "Domain":
+        """Domain of the union of the closed intervals `(lo, hi)`, empty ones are ignored."""
+        domain = Domain.__new__(Domain)
+        domain._set(Domain._coalesce(sorted((int(lo), int(hi)) for lo, hi in intervals if lo <= hi)))
+        return domain
+
+    @staticmethod
+    def _coalesce(intervals: Iterable[Tuple[int, int]]) -> tuple:
+        # Merge sorted intervals that overlap or touch
+        merged = []
+        for lo, hi in intervals:
+            if (merged and lo <= merged[-1][1] + 1):
+                if (hi > merged[-1][1]):
+                    merged[-1] = (merged[-1][0], hi)
+            else:
+                merged.append((lo, hi))
+        return tuple(merged)
+
+    @property
+    def lower(self) -> int:
+        return self.intervals[0][0]
+
+    @property
+    def upper(self) -> int:
+        return self.intervals[-1][1]
+
+    def __len__(self):
+        return sum(hi - lo + 1 for lo, hi in self.intervals)
+
+    def __bool__(self):
+        return bool(self.intervals)
+
+    def __iter__(self):
+        for lo, hi in self.intervals:
+            yield from range(lo, hi + 1)
+
+    def __contains__(self, value) -> bool:
+        i = bisect_right(self._lows, value) - 1
+        return i >= 0 and value <= self.intervals[i][1]
+
+    def intersection(self, other) -> "Domain":
+        other = other if isinstance(other, Domain) else Domain(other)
+        a, b = self.intervals, other.intervals
+        i = j = 0
+        intervals = []
+        while (i < len(a) and j < len(b)):
+            lo = max(a[i][0], b[j][0])
+            hi = min(a[i][1], b[j][1])
+            if (lo <= hi):
+                intervals.append((lo, hi))
+            if (a[i][1] < b[j][1]):
+                i += 1
+            else:
+                j += 1
+        domain = Domain.__new__(Domain)
+        domain._set(tuple(intervals))
+        return domain
+
+    def union(self, other) -> "Domain":
+        other = other if isinstance(other, Domain) else Domain(other)
+        return Domain.from_intervals(self.intervals + other.intervals)
+
+    __and__ = intersection
+    __or__ = union
+
+    def issubset(self, other) -> bool:
+        return self.intersection(other) == self
+
+    def __eq__(self, other):
+        if (isinstance(other, Domain)):
+            return self.intervals == other.intervals
+        if (isinstance(other, (set, frozenset, range))):
+            return self.intervals == Domain(other).intervals
+        return NotImplemented
+
+    def __hash__(self):
+        if (self._hash is None):
+            self._hash = hash(self.intervals)
+        return self._hash
+
+    def _parts(self) -> List[str]:
+        # Runs of three or more values as `lo..hi`, the others gathered in set literals
+        parts = []
+        values = []
+        for lo, hi in self.intervals:
+            if (hi - lo >= 2):
+                if (values):
+                    parts.append("{" + ", ".join(values) + "}")
+                    values = []
+                parts.append(f"{lo}..{hi}")
+            else:
+                values.extend(str(v) for v in range(lo, hi + 1))
+        if (values):
+            parts.append("{" + ", ".join(values) + "}")
+        return parts
+
+    def __str__(self):
+        """MiniZinc set expression, e.g. `1..500 union 700..900`."""
+        if (not self.intervals):
+            return "{}"
+        return " union ".join(self._parts())
+
+    def __repr__(self):
+        return f"Domain({str(self)!r})"
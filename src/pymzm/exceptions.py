@@ -66,4 +66,60 @@ class PymzmInvalidSearchAnnotation(PymzmException):
     def __init__(self):
         pass
     def __str__(self):
-        return f"PymzmInvalidSearchAnnotation."
\ No newline at end of file
+        return f"PymzmInvalidSearchAnnotation."
+class PymzmInvalidShape(PymzmException):
+    def __init__(self, argname, reason):
+        self.argname = argname
+        self.reason = reason
+
+    def __str__(self):
+        return f"Argument \"{self.argname}\" has an invalid shape: {self.reason}."
+
+class PymzmDuplicateName(PymzmException):
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return f"Name \"{self.name}\" is used by more than one variable."
+
+class PymzmOverflowWarning(UserWarning):
+    pass
+
+class PymzmUnrolledArrayWarning(UserWarning):
+    pass
+
+class PymzmSnapshotError(PymzmException):
+    def __init__(self, reason):
+        self.reason = reason
+
+    def __str__(self):
+        return f"Invalid model snapshot: {self.reason}."
+
+class PymzmUnsupportedFlatZinc(PymzmException):
+    def __init__(self, what):
+        self.what = what
+
+    def __str__(self):
+        return f"{self.what} can't be written as FlatZinc directly, use generate instead."
+
+class PymzmCompileError(PymzmException):
+    def __init__(self, message):
+        self.message = message
+
+    def __str__(self):
+        return f"MiniZinc compilation failed: {self.message.strip()}"
+
+class PymzmParameterError(PymzmException):
+    def __init__(self, name, reason):
+        self.name = name
+        self.reason = reason
+
+    def __str__(self):
+        return f"Parameter \"{self.name}\" {self.reason}."
+
+class PymzmNotTraceable(PymzmException):
+    def __init__(self, reason):
+        self.reason = reason
+
+    def __str__(self):
+        return f"The loop body can't be traced: {self.reason}."
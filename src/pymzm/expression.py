@@ -1,12 +1,53 @@
 
-from typing import List
+from typing import List, Tuple
 from collections.abc import Iterable
 
 from .exceptions import *
+from .domain import *
+
+# Node kinds of the expression tree
+_LEAF = 0
+_OPERATOR = 1
+_FUNC = 2
+_IFTHENELSE = 3
+_INDEX = 4
+_PREFIX = 5
+_LINEAR = 6
+_GENERATOR = 7
+_LET = 8
+
+# Variable types that can be terms of a linear expression
+_LINEAR_VTYPES = ["int", "float", "bool"]
+
+# Loops being traced (see `Model.forall`), their indices can't be used as Python values
+_traces = []
 
 class Expression:
-    def __init__(self, name):
-        self.name = name
+    """Node of an expression tree.
+
+    Operators build new nodes without rendering any text, the MiniZinc text is
+    produced once (see `_render`) when the model is generated.
+    """
+    __slots__ = ("_kind", "_symbol", "_args", "_hash")
+
+    def __init__(self, name, kind: int=_LEAF, args: tuple=()):
+        self._kind = kind
+        self._symbol = name
+        self._args = args
+        self._hash = None
+
+    @property
+    def name(self):
+        if (self._kind == _LEAF):
+            return self._symbol
+        return _render(self)
+    
+    @name.setter
+    def name(self, name):
+        self._kind = _LEAF
+        self._symbol = name
+        self._args = ()
+        self._hash = None
 
     def __str__(self):
         return self.name
@@ -15,8 +56,55 @@ class Expression:
         return self.name
 
     def __bool__(self):
+        if (_traces and _refers_to_trace(self)):
+            raise PymzmNotTraceable("a condition on the indices is used as a Python bool, e.g. by if, and, or")
         return False
 
+    def __hash__(self):
+        # Structural hash: identical trees hash equal even if built separately.
+        # `==` builds a constraint, use `Expression.is_same` for equality.
+        if (self._hash is None):
+            if (self._kind == _LEAF):
+                self._hash = hash((_LEAF, self._symbol, isinstance(self, ExpressionBool), ()))
+            else:
+                _compute_hashes(self)
+        return self._hash
+
+    def bounds(self) -> "Tuple[int | float, int | float] | None":
+        """Interval of the values the expression can take, inferred from the
+        bounds of its variables. Conditions are in 0..1.
+
+        Returns:
+            Tuple[int | float, int | float]: (lower, upper), None if unknown
+        """
+        return _compute_bounds(self)
+
+    def is_same(self, other) -> bool:
+        """Structural equality of two expression trees."""
+        if (self is other):
+            return True
+        if (not isinstance(other, Expression) or hash(self) != hash(other)):
+            return False
+
+        stack = [(self, other)]
+        while (stack):
+            a, b = stack.pop()
+            if (a is b):
+                continue
+            if (isinstance(a, Expression)):
+                if (not isinstance(b, Expression) or a._hash != b._hash or a._kind != b._kind
+                        or a._symbol != b._symbol or len(a._args) != len(b._args)
+                        or isinstance(a, ExpressionBool) != isinstance(b, ExpressionBool)):
+                    return False
+                stack.extend(zip(a._args, b._args))
+            elif (isinstance(a, tuple)):
+                if (not isinstance(b, tuple) or len(a) != len(b)):
+                    return False
+                stack.extend(zip(a, b))
+            elif (type(a) is not type(b) or a != b):
+                return False
+        return True
+
     @staticmethod
     def ifthenelse(condition: "ExpressionBool", expr1: "Expression", expr2: "Expression") -> "Expression":
         """ifelse: if (condition) then expr1 else expr2:
@@ -38,87 +126,101 @@ class Expression:
         if (not isinstance(expr2, (Expression, int, float))):
             raise PymzmValueIsNotExpression("expr2", expr2)
         
-        return Expression(f"(if {condition} then {expr1} else {expr2} endif)")
+        return Expression(None, _IFTHENELSE, (condition, expr1, expr2))
 
     @staticmethod
     def sum(exprs: List["Expression"]) -> "Expression":
+        """Sum of the expressions, any iterable is consumed in a single pass.
+
+        Variables and linear terms are merged into one `LinearExpression`
+        as they arrive, the other terms are kept as they are. The sum of no
+        terms is 0.
+        """
         if (not isinstance(exprs, Iterable)):
             raise PymzmValueIsNotExpression("exprs", exprs)
-        
-        #exprs = list(exprs)
-        if (not len(exprs)):
-            return Expression("0")
-            raise PymzmNoValues("exprs")
 
+        terms = {}
+        get = terms.get
+        constant = 0
+        others = []
+        is_empty = True
         for expr in exprs:
-            if (not isinstance(expr, (Expression, int, float))):
+            is_empty = False
+            if (expr.__class__ is LinearExpression):
+                for var, coef in expr._terms.items():
+                    terms[var] = get(var, 0) + coef
+                constant += expr._constant
+            elif (_is_linear(expr)):
+                constant += LinearExpression._add_into(terms, expr, 1)
+            elif (isinstance(expr, (Expression, int, float))):
+                others.append(expr)
+            else:
                 raise PymzmValueIsNotExpression("exprs", exprs)
-            
-        return Expression._func("sum", [exprs])
-    
+
+        if (is_empty):
+            return Expression("0")
+
+        linear = LinearExpression({var: coef for var, coef in terms.items() if coef != 0}, constant)
+        if (not others):
+            return linear
+        if (terms or constant):
+            others.insert(0, linear)
+        return Expression("sum", _FUNC, (tuple(others),))
+
     @staticmethod
     def product(exprs) -> "Expression":
-        if (not isinstance(exprs, Iterable)):
-            raise PymzmValueIsNotExpression("exprs", exprs)
-        
-        exprs = list(exprs)
-        if (not len(exprs)):
-            raise PymzmNoValues("exprs")
-
-        for expr in exprs:
-            if (not isinstance(expr, (Expression, int, float))):
-                raise PymzmValueIsNotExpression("exprs", exprs)
-            
-        return Expression._func("product", [exprs])
+        return Expression._aggregate("product", exprs)
 
     @staticmethod
     def min(exprs: List["Expression"]) -> "Expression":
-        if (not isinstance(exprs, Iterable)):
-            raise PymzmValueIsNotExpression("exprs", exprs)
-        
-        exprs = list(exprs)
-        if (not len(exprs)):
-            raise PymzmNoValues("exprs")
-
-        for expr in exprs:
-            if (not isinstance(expr, (Expression, int, float))):
-                raise PymzmValueIsNotExpression("exprs", exprs)
-            
-        return Expression._func("min", [exprs])
+        return Expression._aggregate("min", exprs)
 
     @staticmethod
     def max(exprs: List["Expression"]) -> "Expression":
+        return Expression._aggregate("max", exprs)
+
+    @staticmethod
+    def _aggregate(func_symbol: str, exprs) -> "Expression":
+        """func([e1, e2, ...]), validating the terms while the iterable is consumed."""
         if (not isinstance(exprs, Iterable)):
             raise PymzmValueIsNotExpression("exprs", exprs)
-        
-        exprs = list(exprs)
-        if (not len(exprs)):
+
+        args = tuple(_checked_terms(exprs))
+        if (not args):
             raise PymzmNoValues("exprs")
 
-        for expr in exprs:
-            if (not isinstance(expr, (Expression, int, float))):
-                raise PymzmValueIsNotExpression("exprs", exprs)
-            
-        return Expression._func("max", [exprs])
+        return Expression(func_symbol, _FUNC, (args,))
 
     @classmethod
     def _operator(cls, symbol: str, exprs):
-        exprs = [expr.name if isinstance(expr, Expression) else expr for expr in exprs]
-        out = f" {symbol} ".join(str(a) for a in exprs)
-        out = f"({out})"
-
-        return cls(out)
+        return cls(symbol, _OPERATOR, tuple(exprs))
 
     @classmethod
     def _func(cls, func_symbol: str, exprs):
-        exprs2 = []
-        for expr in exprs:
-            if (isinstance(expr, Expression)):
-                exprs2.append(expr.name)
-            else:
-                exprs2.append(expr)
-        out = f", ".join(str(a) for a in exprs2)
-        return cls(f"{func_symbol}({out})")
+        return cls(func_symbol, _FUNC, tuple(_freeze(expr) for expr in exprs))
+
+    @classmethod
+    def _index(cls, array_name: str, indices):
+        return cls(array_name, _INDEX, tuple(indices))
+
+    @classmethod
+    def _prefix(cls, symbol: str, expr):
+        return cls(symbol, _PREFIX, (expr,))
+
+    @classmethod
+    def _generator(cls, func_symbol: str, generators: str, expr):
+        # func(i in 1..n, j in 1..m)(expr)
+        return cls(func_symbol, _GENERATOR, (generators, expr))
+
+    @classmethod
+    def _let(cls, declarations: list, expr):
+        # let { header1 = value1; ... } in expr
+        args = []
+        for header, value in declarations:
+            args.append(header)
+            args.append(value)
+        args.append(expr)
+        return cls(None, _LET, tuple(args))
 
     @staticmethod
     def OR(exprs: List["ExpressionBool"]) -> "ExpressionBool":
@@ -180,6 +282,9 @@ class Expression:
         if (not isinstance(other, (int, float, Expression))):
             raise PymzmValueIsNotExpression("other", other)
 
+        if (isinstance(other, LinearExpression) and _is_linear(self)):
+            return LinearExpression._combine(self, other, 1)
+
         return Expression._operator("+", [self, other])
     
     def __radd__(self, other: "Expression") -> "Expression":
@@ -192,6 +297,9 @@ class Expression:
         if (not isinstance(other, (int, float, Expression))):
             raise PymzmValueIsNotExpression("other", other)
 
+        if (isinstance(other, LinearExpression) and _is_linear(self)):
+            return LinearExpression._combine(self, other, -1)
+
         return Expression._operator("-", [self, other])
     
     def __rsub__(self, other: "Expression") -> "Expression":
@@ -204,12 +312,18 @@ class Expression:
         if (not isinstance(other, (int, float, Expression))):
             raise PymzmValueIsNotExpression("other", other)
 
+        if (_is_number(other) and _is_linear(self)):
+            return LinearExpression._scaled(self, other)
+
         return Expression._operator("*", [self, other])
     
     def __rmul__(self, other: "Expression") -> "Expression":
         if (not isinstance(other, (int, float, Expression))):
             raise PymzmValueIsNotExpression("other", other)
 
+        if (_is_number(other) and _is_linear(self)):
+            return LinearExpression._scaled(self, other)
+
         return Expression._operator("*", [other, self])
     
     def __truediv__(self, other: "Expression") -> "Expression":
@@ -249,6 +363,8 @@ class Expression:
         return Expression._operator("mod", [other, self])
     
     def __neg__(self) -> "Expression":
+        if (_is_linear(self)):
+            return LinearExpression._scaled(self, -1)
         return 0 - self
     #def __pos__(self): return Expression._func("+", [self]) TODO: not allowed in minizinc example: +x == v
     
@@ -352,4 +468,483 @@ class Expression:
     # ..and more!
 
 class ExpressionBool(Expression):
-    pass
\ No newline at end of file
+    __slots__ = ()
+
+class LinearExpression(Expression):
+    """Weighted sum of variables plus a constant: c1 * x1 + c2 * x2 + ... + c0.
+
+    Terms are kept in a variable -> coefficient map, repeated variables are
+    merged into one term. Adding, scaling and summing cost O(terms) and the
+    expression is rendered as one flat weighted sum. Linear expressions are
+    immutable, `Expression.sum` is the fast way to build long sums.
+    """
+    __slots__ = ("_terms", "_constant")
+
+    def __init__(self, terms: dict=None, constant=0):
+        self._kind = _LINEAR
+        self._symbol = "+"
+        self._hash = None
+        self._terms = {} if terms is None else terms
+        self._constant = constant
+
+    @property
+    def _args(self):
+        args = []
+        for var, coef in self._terms.items():
+            args.append(var)
+            args.append(coef)
+        args.append(self._constant)
+        return tuple(args)
+
+    @property
+    def terms(self) -> dict:
+        return dict(self._terms)
+
+    @property
+    def constant(self):
+        return self._constant
+
+    @staticmethod
+    def _add_into(terms: dict, expr, scale) -> "int | float":
+        """Add `scale * expr` into the terms, returns the constant part."""
+        if (isinstance(expr, LinearExpression)):
+            for var, coef in expr._terms.items():
+                terms[var] = terms.get(var, 0) + coef * scale
+            return expr._constant * scale
+
+        if (isinstance(expr, Expression)):
+            terms[expr] = terms.get(expr, 0) + scale
+            return 0
+
+        return expr * scale
+
+    @staticmethod
+    def _scaled(expr, scale) -> "LinearExpression":
+        """scale * expr"""
+        if (scale == 0):
+            return LinearExpression()
+        if (isinstance(expr, LinearExpression)):
+            return LinearExpression({var: coef * scale for var, coef in expr._terms.items()}, expr._constant * scale)
+        return LinearExpression({expr: scale})
+
+    @staticmethod
+    def _combine(expr1, expr2, scale) -> "LinearExpression":
+        """expr1 + scale * expr2"""
+        terms = {}
+        constant = LinearExpression._add_into(terms, expr1, 1)
+        constant += LinearExpression._add_into(terms, expr2, scale)
+        return LinearExpression({var: coef for var, coef in terms.items() if coef != 0}, constant)
+
+    @staticmethod
+    def weighted_sum(exprs: List["Expression"], coefficients: List[float]) -> "LinearExpression":
+        """sum(c * x for x, c in zip(exprs, coefficients)), built in one pass
+        without intermediate expressions.
+
+        Args:
+            exprs (List[Expression]): variables or linear expressions
+            coefficients (List[float]): coefficient of each expression
+
+        Returns:
+            LinearExpression: the weighted sum
+        """
+        terms = {}
+        get = terms.get
+        constant = 0
+        for expr, coef in zip(exprs, coefficients):
+            if (not _is_linear(expr)):
+                raise PymzmValueIsNotExpression("exprs", expr)
+            if (not _is_number(coef)):
+                raise PymzmValueIsNotExpression("coefficients", coef)
+            if (isinstance(expr, Expression) and expr._kind == _LEAF):
+                terms[expr] = get(expr, 0) + coef
+            else:
+                constant += LinearExpression._add_into(terms, expr, coef)
+        return LinearExpression({var: coef for var, coef in terms.items() if coef != 0}, constant)
+
+    def __add__(self, other: "Expression") -> "Expression":
+        if (_is_linear(other)):
+            return LinearExpression._combine(self, other, 1)
+        return super().__add__(other)
+
+    def __radd__(self, other: "Expression") -> "Expression":
+        if (_is_linear(other)):
+            return LinearExpression._combine(other, self, 1)
+        return super().__radd__(other)
+
+    def __sub__(self, other: "Expression") -> "Expression":
+        if (_is_linear(other)):
+            return LinearExpression._combine(self, other, -1)
+        return super().__sub__(other)
+
+    def __rsub__(self, other: "Expression") -> "Expression":
+        if (_is_linear(other)):
+            return LinearExpression._combine(other, self, -1)
+        return super().__rsub__(other)
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _is_linear(value) -> bool:
+    """True for values that can be terms of a `LinearExpression`."""
+    if (isinstance(value, (LinearExpression, int, float))):
+        return not isinstance(value, bool)
+    return isinstance(value, Expression) and value._kind == _LEAF and getattr(value, "vtype", None) in _LINEAR_VTYPES
+
+
+def _checked_terms(exprs):
+    for expr in exprs:
+        if (not isinstance(expr, (Expression, int, float))):
+            raise PymzmValueIsNotExpression("exprs", exprs)
+        yield expr
+
+def _freeze(value):
+    """Snapshot array arguments so later changes to them don't leak into the tree."""
+    if (isinstance(value, (Expression, str)) or not isinstance(value, Iterable)):
+        return value
+    # N-d arrays (ExpressionArray, ndarray) are passed as their flat elements
+    flat = getattr(value, "flat", None)
+    if (flat is not None):
+        value = flat
+    return tuple(_freeze(v) for v in value)
+
+def _value_hash(value) -> int:
+    """Hash of a node argument, expressions inside must already be hashed."""
+    if (isinstance(value, Expression)):
+        return value._hash
+    if (isinstance(value, tuple)):
+        return hash(tuple(_value_hash(v) for v in value))
+    return hash((type(value).__name__, value))
+
+def _value_expressions(value):
+    """Expressions directly contained in a node argument."""
+    if (isinstance(value, Expression)):
+        yield value
+    elif (isinstance(value, tuple)):
+        for v in value:
+            yield from _value_expressions(v)
+
+def _refers_to_trace(expr) -> bool:
+    """True if the expression contains an index of a loop being traced."""
+    indices = {id(index) for trace in _traces for index in trace.indices}
+    stack = [expr]
+    while (stack):
+        node = stack.pop()
+        if (id(node) in indices):
+            return True
+        stack.extend(child for arg in node._args for child in _value_expressions(arg))
+    return False
+
+def _compute_hashes(expr):
+    """Fill in `_hash` for every node of the tree in post-order, without recursion."""
+    stack = [(expr, False)]
+    while (stack):
+        node, expanded = stack.pop()
+        if (node._hash is not None):
+            continue
+
+        if (not expanded):
+            stack.append((node, True))
+            for arg in node._args:
+                for child in _value_expressions(arg):
+                    if (child._hash is None):
+                        stack.append((child, False))
+            continue
+
+        node._hash = hash((
+            node._kind,
+            node._symbol,
+            isinstance(node, ExpressionBool),
+            tuple(_value_hash(arg) for arg in node._args),
+        ))
+
+def _interval_mul(a: tuple, b: tuple) -> tuple:
+    corners = (a[0] * b[0], a[0] * b[1], a[1] * b[0], a[1] * b[1])
+    return (min(corners), max(corners))
+
+def _div_trunc(x: int, y: int) -> int:
+    # MiniZinc div rounds towards zero
+    q = abs(x) // abs(y)
+    return q if (x < 0) == (y < 0) else -q
+
+def _interval_div(a: tuple, b: tuple, is_float: bool) -> "tuple | None":
+    # Split the divisor around 0, the quotient is monotonic on each side
+    if (is_float):
+        if (b[0] <= 0 <= b[1]):
+            return None
+        parts = [b]
+    else:
+        parts = [p for p in ((b[0], min(b[1], -1)), (max(b[0], 1), b[1])) if p[0] <= p[1]]
+        if (not parts):
+            return None
+
+    quotients = []
+    for lo, hi in parts:
+        for x in a:
+            for y in (lo, hi):
+                quotients.append(x / y if is_float else _div_trunc(x, y))
+    return (min(quotients), max(quotients))
+
+def _interval_mod(a: tuple, b: tuple) -> "tuple | None":
+    # The remainder has the sign of the dividend and is smaller than the divisor
+    m = max(abs(b[0]), abs(b[1])) - 1
+    if (m < 0):
+        return None
+    return (max(a[0], -m) if a[0] < 0 else 0, min(a[1], m) if a[1] > 0 else 0)
+
+def _interval_pow(a: tuple, b: tuple) -> "tuple | None":
+    if (b[0] != b[1] or not isinstance(b[0], int) or b[0] < 0):
+        return None
+    n = b[0]
+    lo, hi = a[0] ** n, a[1] ** n
+    if (n % 2 == 0 and a[0] < 0 < a[1]):
+        return (0, max(lo, hi))
+    return (min(lo, hi), max(lo, hi))
+
+def _interval_abs(a: tuple) -> tuple:
+    if (a[0] >= 0):
+        return a
+    if (a[1] <= 0):
+        return (-a[1], -a[0])
+    return (0, max(-a[0], a[1]))
+
+def _fold_intervals(symbol: str, intervals: list) -> "tuple | None":
+    if (None in intervals or not intervals):
+        return None
+    result = intervals[0]
+    for b in intervals[1:]:
+        a = result
+        if (symbol == "+"): result = (a[0] + b[0], a[1] + b[1])
+        elif (symbol == "-"): result = (a[0] - b[1], a[1] - b[0])
+        elif (symbol == "*"): result = _interval_mul(a, b)
+        elif (symbol == "min"): result = (min(a[0], b[0]), min(a[1], b[1]))
+        elif (symbol == "max"): result = (max(a[0], b[0]), max(a[1], b[1]))
+        elif (symbol == "div"): result = _interval_div(a, b, False)
+        elif (symbol == "/"): result = _interval_div(a, b, True)
+        elif (symbol == "mod"): result = _interval_mod(a, b)
+        elif (symbol == "pow"): result = _interval_pow(a, b)
+        else: return None
+        if (result is None):
+            return None
+    return result
+
+_AGGREGATE_OPERATORS = {"sum": "+", "product": "*", "min": "min", "max": "max"}
+
+def _leaf_bounds(node: Expression) -> "tuple | None":
+    vtype = getattr(node, "vtype", None)
+    if (vtype in _LINEAR_VTYPES):
+        domain = getattr(node, "domain", None)
+        if (isinstance(domain, Domain)):
+            return (domain.lower, domain.upper) if domain else None
+        if (domain):
+            return (min(domain), max(domain))
+        if (node.val_min is not None and node.val_max is not None):
+            return (node.val_min, node.val_max)
+        return None
+    if (vtype is None and isinstance(node._symbol, str) and node._symbol.lstrip("-").isdigit()):
+        value = int(node._symbol)
+        return (value, value)
+    return None
+
+def _value_bounds(value, memo: dict) -> "tuple | None":
+    if (isinstance(value, Expression)):
+        return memo[id(value)]
+    if (isinstance(value, bool)):
+        return (int(value), int(value))
+    if (isinstance(value, (int, float))):
+        return (value, value)
+    return None
+
+def _node_bounds(node: Expression, memo: dict) -> "tuple | None":
+    kind = node._kind
+    if (isinstance(node, ExpressionBool)):
+        return (0, 1)
+
+    if (kind == _LEAF):
+        return _leaf_bounds(node)
+
+    if (kind == _LINEAR):
+        lo = hi = node._constant
+        for var, coef in node._terms.items():
+            b = memo[id(var)]
+            if (b is None):
+                return None
+            b = _interval_mul(b, (coef, coef))
+            lo += b[0]
+            hi += b[1]
+        return (lo, hi)
+
+    args = node._args
+    if (kind == _OPERATOR):
+        return _fold_intervals(node._symbol, [_value_bounds(arg, memo) for arg in args])
+
+    if (kind == _PREFIX and node._symbol == "-"):
+        b = _value_bounds(args[0], memo)
+        return None if b is None else (-b[1], -b[0])
+
+    if (kind == _IFTHENELSE):
+        b1 = _value_bounds(args[1], memo)
+        b2 = _value_bounds(args[2], memo)
+        if (b1 is None or b2 is None):
+            return None
+        return (min(b1[0], b2[0]), max(b1[1], b2[1]))
+
+    if (kind == _FUNC):
+        symbol = node._symbol
+        if (symbol in _AGGREGATE_OPERATORS and len(args) == 1 and isinstance(args[0], tuple)):
+            return _fold_intervals(_AGGREGATE_OPERATORS[symbol], [_value_bounds(arg, memo) for arg in args[0]])
+        if (symbol == "abs" and len(args) == 1):
+            b = _value_bounds(args[0], memo)
+            return None if b is None else _interval_abs(b)
+        if (symbol == "pow" and len(args) == 2):
+            return _fold_intervals("pow", [_value_bounds(arg, memo) for arg in args])
+
+    return None
+
+def _compute_bounds(expr, memo: dict=None) -> "tuple | None":
+    """Interval bounds of `expr`, computed bottom-up without recursion.
+    `memo` (id(node) -> bounds) can be shared between calls on the same trees."""
+    if (not isinstance(expr, Expression)):
+        return _value_bounds(expr, {})
+    if (memo is None):
+        memo = {}
+
+    stack = [(expr, False)]
+    while (stack):
+        node, expanded = stack.pop()
+        if (id(node) in memo):
+            continue
+
+        if (not expanded and node._kind not in [_LEAF, _GENERATOR, _LET]):
+            stack.append((node, True))
+            for arg in node._args:
+                for child in _value_expressions(arg):
+                    if (id(child) not in memo):
+                        stack.append((child, False))
+            continue
+
+        memo[id(node)] = _node_bounds(node, memo)
+
+    return memo[id(expr)]
+
+def _render_value(value, out: list, stack: list):
+    """Render a non-expression value, pushing nested values onto the stack."""
+    if (isinstance(value, bool)):
+        out.append("true" if value else "false")
+    elif (isinstance(value, (int, float, str))):
+        out.append(str(value))
+    elif (isinstance(value, Iterable)):
+        # Arrays like [a, b, c]
+        stack.append("]")
+        items = list(value)
+        for i in range(len(items) - 1, -1, -1):
+            stack.append(items[i])
+            if (i):
+                stack.append(", ")
+        out.append("[")
+    else:
+        out.append(str(value))
+
+def _render(expr, aliases: dict=None) -> str:
+    """Render an expression tree to MiniZinc text.
+
+    The tree is walked with an explicit stack so that arbitrarily deep
+    expressions (e.g. long chains of `+`) cannot exceed the recursion limit.
+    Text pieces are pushed as `str` and subexpressions as nodes, in reverse
+    order so they are popped in output order. Nodes whose `id` is in `aliases`
+    (other than `expr` itself) are written as the aliased name instead.
+    """
+    out = []
+    stack = [expr]
+    while (stack):
+        item = stack.pop()
+        if (item.__class__ is str):
+            out.append(item)
+            continue
+
+        if (not isinstance(item, Expression)):
+            _render_value(item, out, stack)
+            continue
+
+        if (aliases and item is not expr and id(item) in aliases):
+            out.append(aliases[id(item)])
+            continue
+
+        kind = item._kind
+        args = item._args
+        if (kind == _LEAF):
+            out.append(str(item._symbol))
+
+        elif (kind == _OPERATOR):
+            # (a op b op c)
+            sep = f" {item._symbol} "
+            stack.append(")")
+            for i in range(len(args) - 1, -1, -1):
+                stack.append(args[i])
+                if (i):
+                    stack.append(sep)
+            out.append("(")
+
+        elif (kind == _FUNC):
+            # f(a, b)
+            stack.append(")")
+            for i in range(len(args) - 1, -1, -1):
+                stack.append(args[i])
+                if (i):
+                    stack.append(", ")
+            out.append(f"{item._symbol}(")
+
+        elif (kind == _INDEX):
+            # arr[a, b]
+            stack.append("]")
+            for i in range(len(args) - 1, -1, -1):
+                stack.append(args[i])
+                if (i):
+                    stack.append(", ")
+            out.append(f"{item._symbol}[")
+
+        elif (kind == _LINEAR):
+            # (c1 * x1 + c2 * x2 + c0)
+            if (not item._terms):
+                _render_value(item._constant, out, stack)
+                continue
+            pieces = []
+            for var, coef in item._terms.items():
+                if (pieces):
+                    pieces.append(" - " if coef < 0 else " + ")
+                elif (coef < 0):
+                    pieces.append("-")
+                if (abs(coef) != 1):
+                    pieces.append(f"{abs(coef)} * ")
+                pieces.append(var)
+            if (item._constant):
+                pieces.append(" - " if item._constant < 0 else " + ")
+                pieces.append(str(abs(item._constant)))
+            pieces.append(")")
+            stack.extend(reversed(pieces))
+            out.append("(")
+
+        elif (kind == _GENERATOR):
+            # f(i in 1..n)(a)
+            stack.extend((")", args[1], ")(", args[0]))
+            out.append(f"{item._symbol}(")
+
+        elif (kind == _LET):
+            # (let { h1 = v1; h2 = v2; } in a)
+            stack.append(")")
+            stack.append(args[-1])
+            stack.append("} in ")
+            for i in range(len(args) - 3, -1, -2):
+                stack.extend(("; ", args[i + 1], " = ", args[i]))
+            out.append("(let { ")
+
+        elif (kind == _PREFIX):
+            # (-a)
+            stack.extend((")", args[0]))
+            out.append(f"({item._symbol}")
+
+        elif (kind == _IFTHENELSE):
+            condition, expr1, expr2 = args
+            stack.extend((" endif)", expr2, " else ", expr1, " then ", condition))
+            out.append("(if ")
+
+    return "".join(out)
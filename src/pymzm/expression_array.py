@@ -0,0 +1,662 @@
+import operator
+import warnings
+from typing import List, Tuple
+
+import numpy as np
+
+from .exceptions import *
+from .expression import *
+from .expression import _traces, _compute_bounds
+
+# Operators of elementwise expressions: symbol -> python operator
+_OPERATORS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "div": operator.floordiv,
+    "mod": operator.mod,
+    "pow": operator.pow,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "/\\": operator.and_,
+    "\\/": operator.or_,
+    "xor": operator.xor,
+    "neg": operator.neg,
+    "abs": operator.abs,
+    "not": operator.invert,
+}
+
+# Reductions: name -> (MiniZinc generator function, materialised reduction)
+_REDUCTIONS = {
+    "sum": ("sum", lambda exprs: Expression.sum(exprs)),
+    "product": ("product", lambda exprs: Expression.product(exprs)),
+    "min": ("min", lambda exprs: Expression.min(exprs)),
+    "max": ("max", lambda exprs: Expression.max(exprs)),
+    "all": ("forall", lambda exprs: ExpressionBool._func("forall", [tuple(exprs)])),
+    "any": ("exists", lambda exprs: ExpressionBool._func("exists", [tuple(exprs)])),
+}
+
+_BASE = 0
+_ELEMENTWISE = 1
+_REDUCE = 2
+
+_MAX_NATIVE_DIMS = 6 # array1d..array6d
+
+def _to_python(value):
+    # numpy scalars are not expressions, use the python values
+    if (isinstance(value, np.generic)):
+        return value.item()
+    return value
+
+def _array_vtype(values: np.ndarray) -> str:
+    """MiniZinc element type of an array of expressions and constants."""
+    is_var = False
+    is_bool = True
+    is_float = False
+    for value in values.flat:
+        if (isinstance(value, Expression)):
+            is_var = True
+            if (not isinstance(value, ExpressionBool)):
+                is_bool = False
+                is_float = is_float or getattr(value, "vtype", None) == "float"
+        elif (not isinstance(value, bool)):
+            is_bool = False
+            is_float = is_float or isinstance(value, float)
+
+    vtype = "bool" if is_bool else ("float" if is_float else "int")
+    return f"var {vtype}" if is_var else vtype
+
+def _grid_positions(keys, argname: str):
+    """Position of each index in the grid spanned by the indices, each index
+    position is one dimension ordered by first appearance.
+
+    Returns:
+        Tuple[List[tuple], tuple]: the position of each key and the grid shape
+    """
+    keys = list(keys)
+    is_tuple = isinstance(keys[0], tuple)
+    ndim = len(keys[0]) if is_tuple else 1
+    positions = [{} for _ in range(ndim)]
+    cells = []
+    for key in keys:
+        key = key if is_tuple else (key,)
+        if (len(key) != ndim):
+            raise PymzmInvalidShape(argname, f"index {key!r} has {len(key)} dimensions, expected {ndim}")
+        cells.append(tuple(positions[d].setdefault(k, len(positions[d])) for d, k in enumerate(key)))
+
+    shape = tuple(len(p) for p in positions)
+    if (int(np.prod(shape)) != len(set(cells))):
+        raise PymzmInvalidShape(argname, f"{len(set(cells))} indices do not fill a {shape} grid")
+    return cells, shape
+
+class _FamilyCopies:
+    """Arrays over families of scalar variables indexed by comprehensions,
+    e.g. traced loops (see `Model.forall`) or constraints on whole arrays,
+    declared once per store, e.g.
+    `array[1..3] of var int: pymzm_f0 = array1d(1..3, [x_0, x_1, x_2]);`,
+    and shared by every comprehension over the same family.
+    """
+    def __init__(self, prefix: str="pymzm_f"):
+        self.prefix = prefix
+        self.copies = {}    # (first id, shape) -> (name, vtype, store, ids, shape)
+        self._rendered = {} # name -> (renames, text)
+
+    def __len__(self):
+        return len(self.copies)
+
+    def declare(self, array: "ExpressionArray") -> Tuple[str, str]:
+        """Name and element type of the copy of a store-backed array."""
+        store, ids = array._family
+        key = (ids.start, array.shape)
+        copy = self.copies.get(key)
+        if (copy is None):
+            vtype = store.handles[ids.start].vtype
+            vtype = "var set of int" if vtype == "set" else f"var {vtype}"
+            copy = (f"{self.prefix}{len(self.copies)}", vtype, store, ids, array.shape)
+            self.copies[key] = copy
+        return copy[0], copy[1]
+
+    def rollback(self, count: int):
+        """Forget the copies declared after the first `count`."""
+        for key in list(self.copies)[count:]:
+            del self.copies[key]
+
+    def ranges(self, names: set=None) -> List[range]:
+        """Variable ids of the copies, with `names` only of those named in it."""
+        return [ids for name, _, _, ids, _ in self.copies.values() if names is None or name in names]
+
+    def _iter_mz(self, names: set=None):
+        """Declarations of the copies, with `names` only of those named in it."""
+        for name, vtype, store, ids, shape in self.copies.values():
+            if (names is not None and name not in names):
+                continue
+            cached = self._rendered.get(name)
+            if (cached is None or cached[0] != store.renames):
+                index_sets = ", ".join(f"1..{d}" for d in shape)
+                values = ", ".join(store.name(i) for i in ids)
+                text = f"array[{index_sets}] of {vtype}: {name} = array{len(shape)}d({index_sets}, [{values}]);\n"
+                cached = self._rendered[name] = (store.renames, text)
+            yield cached[1]
+
+def _store_backed(cells: list, values: list, shape: tuple) -> "ExpressionArray":
+    """The values at the grid positions `cells` as a store-backed array if they
+    are consecutive variables in row-major order, None otherwise."""
+    store = getattr(values[0], "_store", None)
+    if (store is None):
+        return None
+    start = values[0]._id
+    for cell, value in zip(cells, values):
+        position = 0
+        for p, d in zip(cell, shape):
+            position = position * d + p
+        if (getattr(value, "_store", None) is not store or value._id != start + position):
+            return None
+    ids = range(start, start + len(values))
+    declared = store.families[store.family_ids[start]].array
+    if (declared is not None and declared.ids == ids and declared.cells != list(np.ndindex(*shape))):
+        # Declared as a MiniZinc array in another order
+        return None
+    return ExpressionArray._from_store(store, ids, shape)
+
+class _Comprehension:
+    """Translates an expression array into a MiniZinc comprehension over
+    local copies of its base arrays. Arrays of variables declared as one
+    MiniZinc array are referred to by its name, families of scalar variables
+    by their copy in the `family_copies` of their store."""
+    def __init__(self, prefix: str="pymzm_"):
+        self.prefix = prefix
+        self.declarations = []
+        self.aliases = {}
+        self.index_count = 0
+
+    def index(self) -> Expression:
+        name = f"{self.prefix}i{self.index_count}"
+        self.index_count += 1
+        return Expression(name)
+
+    def reference(self, array: "ExpressionArray", indices: list) -> Expression:
+        if (array._family is not None):
+            # Store-backed arrays are row-major over the ids of the family
+            store, ids = array._family
+            declared = store.families[store.family_ids[ids.start]].array
+            if (declared is not None and declared.ids == ids and declared.shape == array.shape):
+                cls = ExpressionBool if declared.vtype == "bool" else Expression
+                return cls._index(declared.name, indices)
+            alias, vtype = store.family_copies.declare(array)
+            cls = ExpressionBool if vtype == "var bool" else Expression
+            return cls._index(alias, indices)
+
+        alias = self.aliases.get(id(array))
+        if (alias is None):
+            alias = f"{self.prefix}a{len(self.declarations)}"
+            values = array.to_numpy()
+            vtype = _array_vtype(values)
+            index_sets = [f"1..{d}" for d in values.shape]
+            header = f"array[{', '.join(index_sets)}] of {vtype}: {alias}"
+            flat = tuple(_to_python(value) for value in values.flat)
+            value = Expression._func(f"array{values.ndim}d", [*index_sets, flat])
+            self.declarations.append((header, value))
+            self.aliases[id(array)] = (alias, vtype)
+        else:
+            alias, vtype = alias
+
+        cls = ExpressionBool if vtype.endswith("bool") else Expression
+        return cls._index(alias, indices)
+
+    def template(self, array: "ExpressionArray", indices: list):
+        """Element of `array` at the (symbolic) indices."""
+        if (array._kind == _BASE):
+            if (array.ndim == 0):
+                return _to_python(array.to_numpy()[()])
+            return self.reference(array, indices)
+
+        if (array._kind == _ELEMENTWISE):
+            operands = []
+            for operand in array._operands:
+                if (not isinstance(operand, ExpressionArray)):
+                    operands.append(operand)
+                    continue
+                # Broadcasting aligns the trailing dimensions
+                operand_indices = indices[len(indices) - operand.ndim:]
+                operand_indices = [1 if d == 1 else i for d, i in zip(operand.shape, operand_indices)]
+                operands.append(self.template(operand, operand_indices))
+            return _OPERATORS[array._symbol](*operands)
+
+        func, _ = _REDUCTIONS[array._symbol]
+        operand = array._operands[0]
+        axes = array._axes
+        new_indices = [self.index() for _ in axes]
+        operand_indices = list(indices)
+        for axis, index in zip(axes, new_indices):
+            operand_indices.insert(axis, index)
+        generators = ", ".join(f"{i} in 1..{operand.shape[axis]}" for axis, i in zip(axes, new_indices))
+        cls = ExpressionBool if func in ["forall", "exists"] else Expression
+        return cls._generator(func, generators, self.template(operand, operand_indices))
+
+    def can_translate(self, array: "ExpressionArray") -> bool:
+        stack = [array]
+        while (stack):
+            array = stack.pop()
+            if (array._kind == _BASE):
+                if (array.ndim > _MAX_NATIVE_DIMS or array.size == 0):
+                    return False
+            stack.extend(operand for operand in array._operands if isinstance(operand, ExpressionArray))
+        return True
+
+class _TraceIndex(Expression):
+    """Loop index of a traced loop body, an integer leaf with known bounds."""
+    __slots__ = ("val_min", "val_max")
+    vtype = "int"
+    domain = None
+
+    def __init__(self, name: str, val_min: int, val_max: int):
+        super().__init__(name)
+        self.val_min = val_min
+        self.val_max = val_max
+
+def _is_symbolic_key(key) -> bool:
+    if (isinstance(key, tuple)):
+        return any(isinstance(k, Expression) for k in key)
+    return isinstance(key, Expression)
+
+class _Trace:
+    """Loop body run once with symbolic indices. Elements of arrays and
+    variable families looked up with the indices become accesses to the
+    MiniZinc arrays of the families, to their copies declared once per model
+    or to local copies declared once for the whole loop (see `_Comprehension`).
+    Anything else the indices can't stand for raises `PymzmNotTraceable`.
+    """
+    def __init__(self):
+        self.comprehension = _Comprehension(f"pymzm_t{len(_traces)}")
+        self.indices = []
+        self.generators = []
+        self.families = {}
+
+    def index(self, values) -> Expression:
+        """Index ranging over a range with step 1 or an `IndexSet`."""
+        name = f"{self.comprehension.prefix}i{self.comprehension.index_count}"
+        self.comprehension.index_count += 1
+        if (isinstance(values, range)):
+            index = _TraceIndex(name, values.start, values.stop - 1)
+            self.generators.append(f"{name} in {values.start}..{values.stop - 1}")
+        else:
+            index = values.index(name)
+            self.generators.append(f"{name} in {values}")
+        self.indices.append(index)
+        return index
+
+    def run(self, ranges: list, body):
+        """The condition `body` returns for the symbolic indices, over all of them.
+
+        Returns:
+            Tuple[ExpressionBool, str]: the condition and the global constraint
+                type of its body, None for ordinary conditions
+        """
+        indices = [self.index(values) for values in ranges]
+        _traces.append(self)
+        try:
+            result = body(*indices)
+        finally:
+            _traces.pop()
+
+        ctype = getattr(result, "ctype", None)
+        if (ctype is not None):
+            result = result.cstr
+        if (isinstance(result, ExpressionArray)):
+            result = result.all()
+        if (not isinstance(result, ExpressionBool)):
+            raise PymzmNotTraceable(f"the body returned {result!r} instead of a condition")
+
+        expr = ExpressionBool._generator("forall", ", ".join(self.generators), result)
+        if (self.comprehension.declarations):
+            expr = ExpressionBool._let(self.comprehension.declarations, expr)
+        return expr, ctype
+
+    def family(self, values: dict) -> Tuple["ExpressionArray", list]:
+        """Dict of elements as an array, with the lowest index along each
+        dimension. The indices must be consecutive ints filling a grid."""
+        cached = self.families.get(id(values))
+        if (cached is None):
+            keys = [key if isinstance(key, tuple) else (key,) for key in values.keys()]
+            columns = [sorted(set(column)) for column in zip(*keys)]
+            for column in columns:
+                if (not all(isinstance(k, int) and not isinstance(k, bool) for k in column)
+                        or column[-1] - column[0] + 1 != len(column)):
+                    raise PymzmNotTraceable("the indices of the family are not consecutive ints")
+            lows = [column[0] for column in columns]
+            shape = tuple(len(column) for column in columns)
+            if (len(keys) != int(np.prod(shape))):
+                raise PymzmNotTraceable("the indices of the family do not fill a grid")
+            cells = [tuple(k - low for k, low in zip(key, lows)) for key in keys]
+            array = _store_backed(cells, list(values.values()), shape)
+            if (array is None):
+                grid = np.empty(shape, dtype=object)
+                for key, value in zip(keys, values.values()):
+                    grid[tuple(k - low for k, low in zip(key, lows))] = value
+                array = ExpressionArray(grid)
+            # Kept with the dict so the id stays valid while tracing
+            cached = (values, array, lows)
+            self.families[id(values)] = cached
+        return cached[1], cached[2]
+
+    def element(self, array: "ExpressionArray", key, lows: list=None):
+        """Element of `array` at a key with symbolic indices."""
+        key = key if isinstance(key, tuple) else (key,)
+        if (len(key) != array.ndim):
+            raise PymzmNotTraceable(f"{len(key)} indices for an array of {array.ndim} dimensions")
+        if (not self.comprehension.can_translate(array)):
+            raise PymzmNotTraceable("the array can't be copied into the model")
+        lows = lows or [0] * array.ndim
+        positions = []
+        for k, low, d in zip(key, lows, array.shape):
+            if (not isinstance(k, (int, Expression)) or isinstance(k, bool)):
+                raise PymzmNotTraceable(f"{k!r} is not an index")
+            bounds = (k, k) if isinstance(k, int) else _compute_bounds(k)
+            if (bounds is None or bounds[0] < low or bounds[1] > low + d - 1):
+                raise PymzmNotTraceable(f"the index {k} may be out of range")
+            positions.append(k + (1 - low) if low != 1 else k)
+        return self.comprehension.template(array, positions)
+
+def trace_forall(ranges: list, body):
+    """Trace `body` over the ranges, see `Model.forall`.
+
+    Returns:
+        Tuple[ExpressionBool, str]: the forall condition and the global
+            constraint type of the body, None for ordinary conditions
+
+    Raises:
+        PymzmNotTraceable: the body depends on the indices in a way that can't
+            be written as one comprehension
+    """
+    return _Trace().run(ranges, body)
+
+class ExpressionArray:
+    """N-dimensional array of expressions with NumPy style broadcasting.
+
+    Elementwise operators and reductions are recorded lazily. Used as a
+    constraint or reduced to a single expression, the whole family is emitted
+    as one MiniZinc comprehension instead of one expression per element,
+    e.g. `xs.sum(axis=1) == loads` becomes
+    `forall(i in 1..n)(sum(j in 1..m)(xs[i, j]) == loads[i])`.
+    """
+    # Let numpy defer to our reflected operators
+    __array_ufunc__ = None
+
+    def __init__(self, values):
+        if (isinstance(values, ExpressionArray)):
+            values = values.to_numpy()
+        elif (not isinstance(values, np.ndarray) or values.dtype != object):
+            values = np.array(values, dtype=object)
+
+        self._kind = _BASE
+        self._symbol = None
+        self._operands = ()
+        self._axes = ()
+        self._values = values
+        self._family = None
+        self.shape = values.shape
+
+    @classmethod
+    def _derived(cls, kind: int, symbol: str, operands: tuple, shape: tuple, axes: tuple=()):
+        array = cls.__new__(cls)
+        array._kind = kind
+        array._symbol = symbol
+        array._operands = operands
+        array._axes = axes
+        array._values = None
+        array._family = None
+        array.shape = shape
+        return array
+
+    @classmethod
+    def _from_store(cls, store, ids: range, shape: tuple) -> "ExpressionArray":
+        """Array of the variables `ids` of a `VariableStore` in row-major
+        order. The handles are only made for the elements that are used."""
+        array = cls._derived(_BASE, None, (), shape)
+        array._family = (store, ids)
+        return array
+
+    @staticmethod
+    def from_dict(values: dict) -> "ExpressionArray":
+        """Array of a family of variables keyed by index tuples, e.g. from
+        `Model.add_variables`. Each index position becomes one dimension, ordered
+        by first appearance, and every combination of indices must be present.
+
+        Args:
+            values (dict): index -> expression
+
+        Returns:
+            ExpressionArray: array of the values
+        """
+        if (not values):
+            return ExpressionArray(np.empty((0,), dtype=object))
+
+        cells, shape = _grid_positions(values.keys(), "values")
+        family = _store_backed(cells, list(values.values()), shape)
+        if (family is not None):
+            return family
+        array = np.empty(shape, dtype=object)
+        for cell, value in zip(cells, values.values()):
+            array[cell] = value
+        return ExpressionArray(array)
+
+    @staticmethod
+    def _wrap(value):
+        if (isinstance(value, ExpressionArray)):
+            return value
+        if (isinstance(value, dict)):
+            return ExpressionArray.from_dict(value)
+        if (isinstance(value, (np.ndarray, list, tuple))):
+            return ExpressionArray(np.asarray(value).astype(object) if isinstance(value, np.ndarray) else value)
+        value = _to_python(value)
+        if (not isinstance(value, (Expression, int, float, bool))):
+            raise PymzmValueIsNotExpression("other", value)
+        return value
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return f"ExpressionArray({self.to_numpy()!r})"
+
+    def to_numpy(self) -> np.ndarray:
+        """Materialise every element, returns an object ndarray."""
+        if (self._values is not None):
+            return self._values
+
+        if (self._kind == _BASE):
+            store, ids = self._family
+            values = np.empty(len(ids), dtype=object)
+            for i, variable in enumerate(store.handles[ids.start:ids.stop]):
+                values[i] = variable
+            values = values.reshape(self.shape)
+
+        elif (self._kind == _ELEMENTWISE):
+            func = np.frompyfunc(_OPERATORS[self._symbol], len(self._operands), 1)
+            operands = [o.to_numpy() if isinstance(o, ExpressionArray) else o for o in self._operands]
+            values = np.asarray(func(*operands), dtype=object).reshape(self.shape)
+
+        else:
+            _, reduction = _REDUCTIONS[self._symbol]
+            operand = self._operands[0].to_numpy()
+            kept = [d for d in range(operand.ndim) if d not in self._axes]
+            operand = operand.transpose(kept + list(self._axes)).reshape(self.shape + (-1,))
+            values = np.empty(self.shape, dtype=object)
+            for idx in np.ndindex(*self.shape):
+                values[idx] = reduction(list(operand[idx]))
+
+        self._values = values
+        return values
+
+    def tolist(self) -> list:
+        return self.to_numpy().tolist()
+
+    @property
+    def flat(self):
+        """Iterator over the elements in row-major order, e.g. the argument list
+        of a global constraint."""
+        return self.to_numpy().flat
+
+    @property
+    def T(self) -> "ExpressionArray":
+        return self.transpose()
+
+    def transpose(self, *axes) -> "ExpressionArray":
+        """View with the axes permuted, reversed by default."""
+        return ExpressionArray(self.to_numpy().transpose(*axes))
+
+    def reshape(self, *shape) -> "ExpressionArray":
+        """Array of the same elements with a new shape, a view where NumPy can
+        make one."""
+        return ExpressionArray(self.to_numpy().reshape(*shape))
+
+    def ravel(self) -> "ExpressionArray":
+        return ExpressionArray(self.to_numpy().ravel())
+
+    def blocks(self, *shape) -> "ExpressionArray":
+        """View of the array as a grid of equally sized blocks, e.g. the boxes of
+        a sudoku: `xs.blocks(3, 3)[i, j]` is the 3x3 box in box row i and box column j.
+
+        Args:
+            shape (int): size of a block along each axis
+
+        Returns:
+            ExpressionArray: array with shape (*grid_shape, *shape)
+        """
+        if (len(shape) != self.ndim):
+            raise PymzmInvalidShape("shape", f"{len(shape)} block dimensions for an array of {self.ndim}")
+        if (any(d % b != 0 for d, b in zip(self.shape, shape))):
+            raise PymzmInvalidShape("shape", f"blocks of {shape} do not tile the shape {self.shape}")
+
+        # (n0, n1) -> (n0 / b0, b0, n1 / b1, b1) -> (n0 / b0, n1 / b1, b0, b1)
+        split = [v for d, b in zip(self.shape, shape) for v in (d // b, b)]
+        order = list(range(0, 2 * self.ndim, 2)) + list(range(1, 2 * self.ndim, 2))
+        return ExpressionArray(self.to_numpy().reshape(split).transpose(order))
+
+    def __iter__(self):
+        for value in self.to_numpy():
+            yield ExpressionArray(value) if isinstance(value, np.ndarray) else value
+
+    def __getitem__(self, key):
+        if (_traces and _is_symbolic_key(key)):
+            return _traces[-1].element(self, key)
+        if (self._values is None and self._family is not None):
+            # Single elements of a variable family don't materialise the others
+            cell = key if isinstance(key, tuple) else (key,)
+            if (len(cell) == self.ndim and all(isinstance(k, (int, np.integer)) and not isinstance(k, bool) for k in cell)):
+                position = 0
+                for k, d in zip(cell, self.shape):
+                    if (not -d <= k < d):
+                        raise IndexError(f"index {k} is out of bounds for axis with size {d}")
+                    position = position * d + int(k) % d
+                store, ids = self._family
+                return store.handles[ids.start + position]
+        value = self.to_numpy()[key]
+        if (isinstance(value, np.ndarray)):
+            return ExpressionArray(value)
+        return value
+
+    def _elementwise(self, symbol: str, *others, reflected=False) -> "ExpressionArray":
+        operands = [self] + [ExpressionArray._wrap(other) for other in others]
+        if (reflected):
+            operands.reverse()
+        shape = np.broadcast_shapes(*(o.shape for o in operands if isinstance(o, ExpressionArray)))
+        return ExpressionArray._derived(_ELEMENTWISE, symbol, tuple(operands), shape)
+
+    def _reduce(self, symbol: str, axis=None):
+        if (axis is None):
+            axes = tuple(range(self.ndim))
+        else:
+            axes = tuple(sorted(a % self.ndim for a in (axis if isinstance(axis, tuple) else (axis,))))
+        shape = tuple(d for i, d in enumerate(self.shape) if i not in axes)
+        array = ExpressionArray._derived(_REDUCE, symbol, (self,), shape, axes)
+        if (shape):
+            return array
+        return array._expression()
+
+    def _expression(self):
+        """The array as one expression: scalars for 0-d arrays, otherwise the
+        conjunction of all elements. Arrays that can't be written as a
+        comprehension are unrolled with a `PymzmUnrolledArrayWarning`."""
+        comprehension = _Comprehension()
+        if (not comprehension.can_translate(self)):
+            values = self.to_numpy()
+            if (values.size):
+                warnings.warn(f"ExpressionArray of shape {self.shape} has operands of more than {_MAX_NATIVE_DIMS} dimensions or empty operands, its elements are unrolled", PymzmUnrolledArrayWarning)
+            if (not self.shape):
+                return values[()]
+            return _REDUCTIONS["all"][1](list(values.flat))
+
+        indices = [comprehension.index() for _ in self.shape]
+        expr = comprehension.template(self, indices)
+        if (self.shape):
+            generators = ", ".join(f"{i} in 1..{d}" for i, d in zip(indices, self.shape))
+            expr = ExpressionBool._generator("forall", generators, expr)
+        if (not comprehension.declarations):
+            return expr
+        return expr.__class__._let(comprehension.declarations, expr)
+
+    def sum(self, axis=None):
+        return self._reduce("sum", axis)
+
+    def product(self, axis=None):
+        return self._reduce("product", axis)
+
+    def min(self, axis=None):
+        return self._reduce("min", axis)
+
+    def max(self, axis=None):
+        return self._reduce("max", axis)
+
+    def all(self, axis=None) -> "ExpressionBool":
+        """Conjunction of the elements, with `axis` None this is the constraint
+        that every element holds."""
+        return self._reduce("all", axis)
+
+    def any(self, axis=None) -> "ExpressionBool":
+        return self._reduce("any", axis)
+
+    def __add__(self, other): return self._elementwise("+", other)
+    def __radd__(self, other): return self._elementwise("+", other, reflected=True)
+    def __sub__(self, other): return self._elementwise("-", other)
+    def __rsub__(self, other): return self._elementwise("-", other, reflected=True)
+    def __mul__(self, other): return self._elementwise("*", other)
+    def __rmul__(self, other): return self._elementwise("*", other, reflected=True)
+    def __truediv__(self, other): return self._elementwise("/", other)
+    def __rtruediv__(self, other): return self._elementwise("/", other, reflected=True)
+    def __floordiv__(self, other): return self._elementwise("div", other)
+    def __rfloordiv__(self, other): return self._elementwise("div", other, reflected=True)
+    def __mod__(self, other): return self._elementwise("mod", other)
+    def __rmod__(self, other): return self._elementwise("mod", other, reflected=True)
+    def __pow__(self, other): return self._elementwise("pow", other)
+    def __rpow__(self, other): return self._elementwise("pow", other, reflected=True)
+    def __neg__(self): return self._elementwise("neg")
+    def __abs__(self): return self._elementwise("abs")
+
+    def __eq__(self, other): return self._elementwise("==", other)
+    def __ne__(self, other): return self._elementwise("!=", other)
+    def __lt__(self, other): return self._elementwise("<", other)
+    def __le__(self, other): return self._elementwise("<=", other)
+    def __gt__(self, other): return self._elementwise(">", other)
+    def __ge__(self, other): return self._elementwise(">=", other)
+
+    def __and__(self, other): return self._elementwise("/\\", other)
+    def __rand__(self, other): return self._elementwise("/\\", other, reflected=True)
+    def __or__(self, other): return self._elementwise("\\/", other)
+    def __ror__(self, other): return self._elementwise("\\/", other, reflected=True)
+    def __xor__(self, other): return self._elementwise("xor", other)
+    def __rxor__(self, other): return self._elementwise("xor", other, reflected=True)
+    def __invert__(self): return self._elementwise("not")
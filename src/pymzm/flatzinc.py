@@ -0,0 +1,701 @@
+import os
+import re
+import subprocess
+from typing import List, Tuple
+
+import minizinc
+import numpy as np
+
+from .exceptions import *
+from .expression import *
+from .expression import _LEAF, _OPERATOR, _FUNC, _IFTHENELSE, _INDEX, _PREFIX, _LINEAR
+from .expression import _fold_intervals, _interval_abs, _interval_mul
+from .variable import *
+from .variable import _VTYPE_BOOL
+from .constraint import *
+from .optimize import _fold_operator
+from .misc import *
+
+FZN_PREFIX = "pymzm_fzn"
+
+# x op y as a linear comparison, x > y is y < x
+_COMPARISONS = ["==", "!=", "<", "<=", ">", ">="]
+_LINEAR_OPS = {"==": "eq", "!=": "ne", "<=": "le"}
+
+# Global constraint -> FlatZinc predicate and the kind of each argument
+_GLOBALS = {
+    "alldifferent": ("fzn_all_different_int", ["array"]),
+    "all_equal": ("fzn_all_equal_int", ["array"]),
+    "increasing": ("fzn_increasing_int", ["array"]),
+    "decreasing": ("fzn_decreasing_int", ["array"]),
+    "count": ("fzn_count_eq", ["array", "var", "var"]),
+    "among": ("fzn_among", ["var", "array", "set"]),
+    "disjunctive": ("fzn_disjunctive", ["array", "array"]),
+    "disjunctive_strict": ("fzn_disjunctive_strict", ["array", "array"]),
+    "diffn": ("fzn_diffn", ["array", "array", "array", "array"]),
+}
+_ARGUMENT_TYPES = {"array": "array [int] of var int", "var": "var int", "set": "set of int"}
+
+def _literal(term) -> str:
+    if (isinstance(term, bool)):
+        return "true" if term else "false"
+    return str(term)
+
+def _array(terms) -> str:
+    return f"[{','.join(map(_literal, terms))}]"
+
+def _is_int(value) -> bool:
+    return isinstance(value, (int, np.integer)) and not isinstance(value, (bool, np.bool_))
+
+class _Flattener:
+    """Flattens the constraints of a model into FlatZinc builtins.
+
+    Integer subexpressions become terms: an int or the name of a variable,
+    auxiliary variables are introduced for the nonlinear ones. Conditions are
+    posted directly at the top level and reified into auxiliary bool variables
+    below it. Shared subtrees are flattened once.
+    """
+    def __init__(self, model):
+        self.store = model.store
+        self.constants = {constant.name: constant for constant in model.constants}
+        self.names = self._variable_names()
+        self.ranges = {}        # name of an auxiliary variable -> (lower, upper) or None
+        self.ints = {}          # id(node) -> int term
+        self.bools = {}         # id(node) -> bool term
+        self.bool2ints = {}     # bool variable -> its 0..1 int
+        self.params = {}        # constant name -> declaration
+        self.arrays = {}        # constant name -> its value as an ndarray
+        self.predicates = {}    # global predicate -> declaration
+        self.declarations = []
+        self.constraints = []
+
+    def _variable_names(self) -> list:
+        # Elements of arrays are declared as scalars with their flat names,
+        # which are the names `VariableStore.lookup` resolves
+        store = self.store
+        names = []
+        for family in store.families:
+            if (family.array is None):
+                names.extend(store.name(i) for i in family.ids)
+            else:
+                names.extend(index_names(family.name, family.indices))
+        return names
+
+    def unsupported(self, what) -> PymzmUnsupportedFlatZinc:
+        what = str(what)
+        return PymzmUnsupportedFlatZinc(what if len(what) <= 80 else what[:77] + "...")
+
+    # Declarations
+
+    def declare_variables(self) -> List[str]:
+        store = self.store
+        lines = []
+        for i, name in enumerate(self.names):
+            vtype = store.vtypes[i]
+            array = store.families[store.family_ids[i]].array
+            output = "" if array is not None else " :: output_var"
+            if (vtype == _VTYPE_BOOL):
+                lines.append(f"var bool: {name}{output};\n")
+                continue
+            if (Variable.VTYPES[vtype] != Variable.VTYPE_INTEGER):
+                raise self.unsupported(f"{Variable.VTYPES[vtype]} variable {name}")
+            domain = store.domains.get(i)
+            if (domain is None):
+                val_min, val_max = store.bounds(i)
+                domain = f"{val_min}..{val_max}"
+            elif (len(domain.intervals) > 1):
+                # FlatZinc has no unions, the values are listed
+                domain = "{" + ",".join(map(str, domain)) + "}"
+            lines.append(f"var {domain}: {name}{output};\n")
+
+        for array in store.arrays.values():
+            order = sorted(range(len(array.cells)), key=array.cells.__getitem__)
+            elements = [self.names[array.ids[i]] for i in order]
+            index_sets = ",".join(f"1..{d}" for d in array.shape)
+            lines.append(f"array [1..{len(elements)}] of var {'bool' if array.vtype == Variable.VTYPE_BOOL else 'int'}: "
+                         f"{array.name} :: output_array([{index_sets}]) = {_array(elements)};\n")
+        return lines
+
+    def new_variable(self, vtype: str, bounds: tuple=None, is_defined: bool=True) -> str:
+        name = f"{FZN_PREFIX}{len(self.declarations)}"
+        if (vtype == Variable.VTYPE_BOOL):
+            domain = "bool"
+        else:
+            domain = "int" if bounds is None else f"{bounds[0]}..{bounds[1]}"
+            self.ranges[name] = bounds
+        annotations = " :: var_is_introduced :: is_defined_var" if is_defined else " :: var_is_introduced"
+        self.declarations.append(f"var {domain}: {name}{annotations};\n")
+        return name
+
+    def post(self, predicate: str, *args, defines: str=None):
+        annotation = "" if defines is None else f" :: defines_var({defines})"
+        self.constraints.append(f"constraint {predicate}({','.join(args)}){annotation};\n")
+
+    def range(self, term) -> "tuple | None":
+        if (isinstance(term, int)):
+            return (int(term), int(term))
+        return self.ranges.get(term)
+
+    # Integer expressions
+
+    def variable(self, var: Variable) -> str:
+        name = self.names[var._id]
+        if (name not in self.ranges):
+            domain = var.domain
+            if (isinstance(var, VariableBool)):
+                self.ranges[name] = (0, 1)
+            elif (domain is not None):
+                self.ranges[name] = (domain.lower, domain.upper)
+            else:
+                self.ranges[name] = self.store.bounds(var._id)
+        return name
+
+    def linear(self, items: list) -> Tuple[dict, int]:
+        """sum(scale * value for value, scale in items) as name -> coefficient and a constant."""
+        terms = {}
+        constant = 0
+        # Pushed in reverse, so the terms keep the order of the expression
+        stack = list(reversed(items))
+        while (stack):
+            value, scale = stack.pop()
+            if (isinstance(value, (int, np.integer))):
+                # bools count as 0 and 1
+                constant += scale * int(value)
+                continue
+            if (isinstance(value, Expression) and not isinstance(value, ExpressionBool)):
+                kind, symbol, args = value._kind, value._symbol, value._args
+                if (kind == _LINEAR):
+                    stack.append((value._constant, scale))
+                    stack.extend((var, scale * coef) for var, coef in reversed(value._terms.items()))
+                    continue
+                if (kind == _OPERATOR and symbol in ["+", "-"]):
+                    stack.extend((arg, scale if symbol == "+" else -scale) for arg in reversed(args[1:]))
+                    stack.append((args[0], scale))
+                    continue
+                if (kind == _OPERATOR and symbol == "*" and self.scaled(args) is not None):
+                    factor, arg = self.scaled(args)
+                    stack.append((arg, scale * factor))
+                    continue
+                if (kind == _PREFIX and symbol == "-"):
+                    stack.append((args[0], -scale))
+                    continue
+                if (kind == _FUNC and symbol == "sum" and len(args) == 1 and isinstance(args[0], tuple)):
+                    stack.extend((arg, scale) for arg in reversed(args[0]))
+                    continue
+
+            term = self.int(value)
+            if (isinstance(term, int)):
+                constant += scale * term
+            else:
+                terms[term] = terms.get(term, 0) + scale
+        if (not all(isinstance(coef, int) for coef in terms.values()) or not isinstance(constant, int)):
+            raise self.unsupported(f"non-integer coefficient in {items[0][0]}")
+        return {name: coef for name, coef in terms.items() if coef != 0}, constant
+
+    def scaled(self, args: tuple) -> "tuple | None":
+        """(factor, expr) of `factor * expr` or `expr * factor`, None for other
+        products. Factors are ints or elements of int constants at literal
+        indices, e.g. `c[3] * x`."""
+        if (len(args) != 2):
+            return None
+        for factor, expr in [(args[0], args[1]), (args[1], args[0])]:
+            factor = self.constant_int(factor)
+            if (factor is not None):
+                return factor, expr
+        return None
+
+    def constant_int(self, value) -> "int | None":
+        """Value of an int or of an element of an int constant at literal
+        indices, None for anything else."""
+        if (_is_int(value)):
+            return int(value)
+        if (not isinstance(value, Expression) or isinstance(value, ExpressionBool) or value._kind != _INDEX):
+            return None
+        constant = self.constants.get(value._symbol)
+        if (constant is None or constant.shape is None or constant.vtype != Variable.VTYPE_INTEGER):
+            return None
+        indices = value._args
+        if (len(indices) != len(constant.shape)
+                or not all(_is_int(i) and 1 <= i <= d for i, d in zip(indices, constant.shape))):
+            return None
+        return int(self.values(constant)[tuple(int(i) - 1 for i in indices)])
+
+    def values(self, constant) -> np.ndarray:
+        values = self.arrays.get(constant.name)
+        if (values is None):
+            values = self.arrays[constant.name] = np.asarray(constant.value)
+        return values
+
+    def linear_range(self, terms: dict, constant: int) -> "tuple | None":
+        lo = hi = constant
+        for name, coef in terms.items():
+            b = self.range(name)
+            if (b is None):
+                return None
+            b = _interval_mul(b, (coef, coef))
+            lo += b[0]
+            hi += b[1]
+        return (lo, hi)
+
+    def define(self, terms: dict, constant: int) -> "int | str":
+        """Term of `sum(coef * name) + constant`, an auxiliary variable unless trivial."""
+        if (not terms):
+            return constant
+        if (constant == 0 and len(terms) == 1):
+            name, coef = next(iter(terms.items()))
+            if (coef == 1):
+                return name
+
+        z = self.new_variable(Variable.VTYPE_INTEGER, self.linear_range(terms, constant))
+        self.post("int_lin_eq", _array([*terms.values(), -1]), _array([*terms, z]), str(-constant), defines=z)
+        return z
+
+    def function(self, predicate: str, bounds: tuple, *args) -> str:
+        """z with predicate(*args, z)"""
+        z = self.new_variable(Variable.VTYPE_INTEGER, bounds)
+        self.post(predicate, *args, z, defines=z)
+        return z
+
+    def binary(self, symbol: str, a, b) -> "int | str":
+        predicate = {"*": "int_times", "div": "int_div", "mod": "int_mod", "pow": "int_pow", "min": "int_min", "max": "int_max"}.get(symbol)
+        if (predicate is None):
+            raise self.unsupported(f"operator {symbol}")
+        # Undefined results (x div 0, negative powers) fail the enclosing condition
+        # in MiniZinc, but would fail the whole model here
+        rb = self.range(b)
+        if ((symbol in ["div", "mod"] and (rb is None or rb[0] <= 0 <= rb[1])) or (symbol == "pow" and (rb is None or rb[0] < 0))):
+            raise self.unsupported(f"{symbol} by {b}, which may be undefined")
+        bounds = _fold_intervals(symbol, [self.range(a), rb])
+        return self.function(predicate, bounds, _literal(a), _literal(b))
+
+    def int(self, value) -> "int | str":
+        """Term of an integer expression."""
+        if (isinstance(value, (bool, np.bool_))):
+            return int(value)
+        if (isinstance(value, (int, np.integer))):
+            return int(value)
+        if (not isinstance(value, Expression)):
+            raise self.unsupported(value)
+        term = self.ints.get(id(value))
+        if (term is None):
+            term = self._int(value)
+            self.ints[id(value)] = term
+        return term
+
+    def _int(self, value: Expression) -> "int | str":
+        if (isinstance(value, ExpressionBool)):
+            return self.bool2int(self.bool(value))
+
+        kind, symbol, args = value._kind, value._symbol, value._args
+        if (kind == _LEAF):
+            if (isinstance(value, Variable)):
+                return self.variable(value)
+            if (isinstance(symbol, str) and symbol.lstrip("-").isdigit()):
+                return int(symbol)
+            raise self.unsupported(value)
+
+        if (kind == _LINEAR or (kind == _OPERATOR and symbol in ["+", "-"]) or (kind == _PREFIX and symbol == "-")
+                or (kind == _FUNC and symbol == "sum") or (kind == _OPERATOR and symbol == "*" and self.scaled(args) is not None)):
+            return self.define(*self.linear([(value, 1)]))
+
+        if (kind == _OPERATOR):
+            return self.fold(symbol, [self.int(arg) for arg in args])
+
+        if (kind == _FUNC):
+            if (symbol == "abs" and len(args) == 1):
+                a = self.int(args[0])
+                if (isinstance(a, int)):
+                    return abs(a)
+                bounds = self.range(a)
+                return self.function("int_abs", None if bounds is None else _interval_abs(bounds), a)
+            if (symbol == "pow" and len(args) == 2):
+                return self.fold("pow", [self.int(arg) for arg in args])
+            if (symbol in ["product", "min", "max"] and len(args) == 1 and isinstance(args[0], tuple)):
+                terms = [self.int(arg) for arg in args[0]]
+                if (symbol == "product" or len(terms) <= 2):
+                    return self.fold("*" if symbol == "product" else symbol, terms)
+                bounds = _fold_intervals(symbol, [self.range(t) for t in terms])
+                z = self.new_variable(Variable.VTYPE_INTEGER, bounds)
+                self.post(f"array_int_{'minimum' if symbol == 'min' else 'maximum'}", z, _array(terms), defines=z)
+                return z
+            raise self.unsupported(f"function {symbol}")
+
+        if (kind == _IFTHENELSE):
+            condition = self.bool(args[0])
+            a, b = self.int(args[1]), self.int(args[2])
+            if (isinstance(condition, bool)):
+                return a if condition else b
+            # [a, b][2 - condition]
+            index = self.define({self.bool2int(condition): -1}, 2)
+            ra, rb = self.range(a), self.range(b)
+            bounds = None if ra is None or rb is None else (min(ra[0], rb[0]), max(ra[1], rb[1]))
+            return self.function("array_var_int_element", bounds, _literal(index), _array([a, b]))
+
+        if (kind == _INDEX):
+            return self.element(value, Variable.VTYPE_INTEGER)
+
+        raise self.unsupported(value)
+
+    def fold(self, symbol: str, terms: list) -> "int | str":
+        result = terms[0]
+        for term in terms[1:]:
+            value = None
+            if (isinstance(result, int) and isinstance(term, int)):
+                if (symbol in ["min", "max"]):
+                    value = min(result, term) if symbol == "min" else max(result, term)
+                elif (symbol == "pow"):
+                    value = result ** term if term >= 0 else None
+                else:
+                    value = _fold_operator(symbol, result, term)
+            result = self.binary(symbol, result, term) if value is None else value
+        return result
+
+    def element(self, value: Expression, vtype: str) -> "int | bool | str":
+        # constant[i, j, ...], with variable indices an element constraint on the flat array
+        constant = self.constants.get(value._symbol)
+        if (constant is None or constant.shape is None):
+            raise self.unsupported(value)
+        values = self.values(constant)
+        indices = value._args
+        if (all(isinstance(i, (int, np.integer)) and 1 <= i <= d for i, d in zip(indices, constant.shape))):
+            item = values[tuple(int(i) - 1 for i in indices)].item()
+            return bool(item) if vtype == Variable.VTYPE_BOOL else int(item)
+
+        # Position in the flat array. An index out of range makes the access
+        # undefined in MiniZinc, which the flat position can't express
+        terms, offset = {}, 1
+        for k, index in enumerate(indices):
+            stride = int(np.prod(constant.shape[k + 1:]))
+            index_terms, index_constant = self.linear([(index, 1)])
+            bounds = self.linear_range(index_terms, index_constant)
+            if (bounds is None or bounds[0] < 1 or bounds[1] > constant.shape[k]):
+                raise self.unsupported(f"{value} with an index that may be out of range")
+            for name, coef in index_terms.items():
+                terms[name] = terms.get(name, 0) + coef * stride
+            offset += (index_constant - 1) * stride
+        index = self.define({name: coef for name, coef in terms.items() if coef != 0}, offset)
+        if (constant.name not in self.params):
+            item_type = "bool" if constant.vtype == Variable.VTYPE_BOOL else "int"
+            self.params[constant.name] = f"array [1..{values.size}] of {item_type}: {constant.name} = {array_to_mz(values.reshape(-1))};\n"
+        if (vtype == Variable.VTYPE_BOOL):
+            r = self.new_variable(Variable.VTYPE_BOOL)
+            self.post("array_bool_element", _literal(index), constant.name, r, defines=r)
+            return r
+        return self.function("array_int_element", (int(values.min()), int(values.max())), _literal(index), constant.name)
+
+    def bool2int(self, b) -> "int | str":
+        if (isinstance(b, bool)):
+            return int(b)
+        z = self.bool2ints.get(b)
+        if (z is None):
+            z = self.new_variable(Variable.VTYPE_INTEGER, (0, 1))
+            self.post("bool2int", b, z, defines=z)
+            self.bool2ints[b] = z
+        return z
+
+    # Conditions
+
+    def comparison(self, symbol: str, lhs, rhs):
+        """(predicate suffix, coefficients, names, bound) of lhs op rhs, or its
+        truth value if it has no variables."""
+        if (symbol in [">", ">="]):
+            symbol = "<" if symbol == ">" else "<="
+            lhs, rhs = rhs, lhs
+        terms, constant = self.linear([(lhs, 1), (rhs, -1)])
+        bound = -constant
+        if (symbol == "<"):
+            symbol = "<="
+            bound -= 1
+        if (not terms):
+            return {"==": 0 == bound, "!=": 0 != bound, "<=": 0 <= bound}[symbol]
+        return _LINEAR_OPS[symbol], _array(terms.values()), _array(terms), str(bound)
+
+    def is_condition(self, value) -> bool:
+        return isinstance(value, (ExpressionBool, bool, np.bool_))
+
+    def gather(self, value, symbols: list) -> list:
+        """Arguments of nested /\\ (or \\/) nodes, without recursion."""
+        args = []
+        stack = [value]
+        while (stack):
+            node = stack.pop()
+            if (isinstance(node, ExpressionBool) and node._kind == _OPERATOR and node._symbol == symbols[0]):
+                stack.extend(reversed(node._args))
+            elif (isinstance(node, ExpressionBool) and node._kind == _FUNC and node._symbol == symbols[1]
+                    and len(node._args) == 1 and isinstance(node._args[0], tuple)):
+                stack.extend(reversed(node._args[0]))
+            else:
+                args.append(node)
+        return args
+
+    def bool(self, value) -> "bool | str":
+        """Term of a condition: a bool or the name of a bool variable."""
+        if (isinstance(value, (bool, np.bool_))):
+            return bool(value)
+        if (not isinstance(value, ExpressionBool)):
+            raise self.unsupported(f"{value} as a condition")
+        term = self.bools.get(id(value))
+        if (term is None):
+            term = self._bool(value)
+            self.bools[id(value)] = term
+        return term
+
+    def reified(self, predicate: str, *args) -> str:
+        r = self.new_variable(Variable.VTYPE_BOOL)
+        self.post(predicate, *args, r, defines=r)
+        return r
+
+    def _bool(self, value: ExpressionBool) -> "bool | str":
+        kind, symbol, args = value._kind, value._symbol, value._args
+        if (kind == _LEAF):
+            if (isinstance(value, Variable)):
+                return self.variable(value)
+            raise self.unsupported(value)
+
+        if (kind == _OPERATOR and symbol in _COMPARISONS):
+            if (len(args) != 2):
+                raise self.unsupported(value)
+            if (symbol in ["==", "!="] and self.is_condition(args[0]) and self.is_condition(args[1])):
+                a, b = self.bool(args[0]), self.bool(args[1])
+                if (isinstance(a, bool) and isinstance(b, bool)):
+                    return (a == b) == (symbol == "==")
+                return self.reified("bool_eq_reif" if symbol == "==" else "bool_xor", _literal(a), _literal(b))
+            comparison = self.comparison(symbol, *args)
+            if (isinstance(comparison, bool)):
+                return comparison
+            op, coefs, names, bound = comparison
+            return self.reified(f"int_lin_{op}_reif", coefs, names, bound)
+
+        if ((kind == _OPERATOR and symbol in ["/\\", "\\/"]) or (kind == _FUNC and symbol in ["forall", "exists"])):
+            is_and = symbol in ["/\\", "forall"]
+            terms = [self.bool(arg) for arg in self.gather(value, ["/\\", "forall"] if is_and else ["\\/", "exists"])]
+            if ((False if is_and else True) in terms):
+                return not is_and
+            terms = [t for t in terms if not isinstance(t, bool)]
+            if (not terms):
+                return is_and
+            if (len(terms) == 1):
+                return terms[0]
+            return self.reified("array_bool_and" if is_and else "array_bool_or", _array(terms))
+
+        if (kind == _OPERATOR and symbol in ["->", "<-", "<->", "xor"]):
+            terms = [self.bool(arg) for arg in args]
+            if (symbol == "->"):
+                # a -> b -> c is a -> (b -> c)
+                result = terms[-1]
+                for a in reversed(terms[:-1]):
+                    result = self.logical("->", a, result)
+                return result
+            result = terms[0]
+            for b in terms[1:]:
+                result = self.logical(symbol, result, b)
+            return result
+
+        if (kind == _FUNC and symbol == "not" and len(args) == 1):
+            a = self.bool(args[0])
+            if (isinstance(a, bool)):
+                return not a
+            return self.reified("bool_not", a)
+
+        if (kind == _INDEX):
+            return self.element(value, Variable.VTYPE_BOOL)
+
+        raise self.unsupported(value)
+
+    def logical(self, symbol: str, a, b) -> "bool | str":
+        if (symbol == "<-"):
+            symbol, a, b = "->", b, a
+        if (isinstance(a, bool) and isinstance(b, bool)):
+            return {"->": not a or b, "<->": a == b, "xor": a != b}[symbol]
+        predicate = {"->": "bool_le_reif", "<->": "bool_eq_reif", "xor": "bool_xor"}[symbol]
+        return self.reified(predicate, _literal(a), _literal(b))
+
+    def post_condition(self, cstr):
+        """Post a top-level condition without reifying it."""
+        stack = [cstr]
+        while (stack):
+            value = stack.pop()
+            if (isinstance(value, (bool, np.bool_))):
+                if (not value):
+                    self.post("bool_eq", "false", "true")
+                continue
+            if (not isinstance(value, ExpressionBool)):
+                raise self.unsupported(f"{value} as a constraint")
+
+            kind, symbol, args = value._kind, value._symbol, value._args
+            if ((kind == _OPERATOR and symbol == "/\\") or (kind == _FUNC and symbol == "forall")):
+                stack.extend(reversed(self.gather(value, ["/\\", "forall"])))
+
+            elif (kind == _OPERATOR and symbol in ["==", "!="] and len(args) == 2
+                    and self.is_condition(args[0]) and self.is_condition(args[1])):
+                a, b = self.bool(args[0]), self.bool(args[1])
+                if (isinstance(a, bool) and isinstance(b, bool)):
+                    stack.append((a == b) == (symbol == "=="))
+                else:
+                    self.post("bool_eq" if symbol == "==" else "bool_not", _literal(a), _literal(b))
+
+            elif (kind == _OPERATOR and symbol in _COMPARISONS and len(args) == 2):
+                comparison = self.comparison(symbol, *args)
+                if (isinstance(comparison, bool)):
+                    stack.append(comparison)
+                else:
+                    op, coefs, names, bound = comparison
+                    self.post(f"int_lin_{op}", coefs, names, bound)
+
+            elif ((kind == _OPERATOR and symbol in ["\\/", "->"]) or (kind == _FUNC and symbol == "exists")):
+                # Clause of the positive and negative literals
+                if (symbol == "->"):
+                    if (len(args) != 2):
+                        self.post("bool_eq", self.bool(value), "true")
+                        continue
+                    positive, negative = [self.bool(args[1])], [self.bool(args[0])]
+                else:
+                    positive, negative = [self.bool(arg) for arg in self.gather(value, ["\\/", "exists"])], []
+                if (True in positive or False in negative):
+                    continue
+                positive = [t for t in positive if not isinstance(t, bool)]
+                negative = [t for t in negative if not isinstance(t, bool)]
+                self.post("bool_clause", _array(positive), _array(negative))
+
+            elif (kind == _FUNC and symbol in _GLOBALS):
+                self.post_global(value)
+
+            else:
+                b = self.bool(value)
+                if (isinstance(b, bool)):
+                    stack.append(b)
+                else:
+                    self.post("bool_eq", b, "true")
+
+    def post_global(self, value: ExpressionBool):
+        predicate, kinds = _GLOBALS[value._symbol]
+        if (len(value._args) != len(kinds)):
+            raise self.unsupported(value)
+        args = []
+        for kind, arg in zip(kinds, value._args):
+            if (kind == "array"):
+                args.append(_array(self.int(v) for v in arg))
+            elif (kind == "set"):
+                args.append("{" + ",".join(str(int(v)) for v in sorted(set(arg))) + "}")
+            else:
+                args.append(_literal(self.int(arg)))
+        if (predicate not in self.predicates):
+            parameters = ", ".join(f"{_ARGUMENT_TYPES[kind]}: a{i}" for i, kind in enumerate(kinds))
+            self.predicates[predicate] = f"predicate {predicate}({parameters});\n"
+        self.post(predicate, *args)
+
+    # Search
+
+    def search(self, method) -> str:
+        annotations = getattr(method, "search_annotations", None)
+        if (annotations is not None):
+            return f"seq_search([{','.join(self.search(sa) for sa in annotations)}])"
+        if (method.search_type not in ["int_search", "bool_search"]):
+            raise self.unsupported(method.search_type)
+        variables = _array(self.variable(v) for v in method.variables)
+        return f"{method.search_type}({variables},{method.varchoice},{method.valchoice},complete)"
+
+def iter_fzn(model):
+    """FlatZinc text of the model in pieces, see `Model.write_fzn`."""
+    if (model.solve_criteria is None):
+        raise PymzmUnsupportedFlatZinc("model without solve criteria")
+    if (model.parameters or model.parametric_arrays):
+        raise PymzmUnsupportedFlatZinc("parametric model")
+    flattener = _Flattener(model)
+    variables = flattener.declare_variables()
+    for constraint in model.constraints:
+        if (not isinstance(constraint.cstr, (ExpressionBool, bool))):
+            raise flattener.unsupported(f"constraint {constraint.cstr}")
+        flattener.post_condition(constraint.cstr)
+
+    solve = model.solve_criteria
+    if (model.solve_expression is not None):
+        objective = flattener.int(model.solve_expression)
+        if (isinstance(objective, int)):
+            # The objective must be a variable
+            objective = flattener.new_variable(Variable.VTYPE_INTEGER, (objective, objective), is_defined=False)
+        solve += f" {objective}"
+    annotations = ""
+    if (model.solve_method is not None):
+        annotations += f" :: {flattener.search(model.solve_method)}"
+        restart = getattr(model, "restart_strategy", None)
+        if (restart is not None):
+            annotations += f" :: {restart}"
+
+    model.generate_stats = {
+        "fzn_variables": len(flattener.names) + len(flattener.declarations),
+        "fzn_introduced": len(flattener.declarations),
+        "fzn_constraints": len(flattener.constraints),
+    }
+    yield from flattener.predicates.values()
+    yield from flattener.params.values()
+    yield from variables
+    yield from flattener.declarations
+    yield from flattener.constraints
+    yield f"solve{annotations} {solve};\n"
+
+_ARRAY_VALUE = re.compile(r"array\d+d\((.*)\[(.*)\]\)$", re.S)
+
+def _parse_value(text: str):
+    text = text.strip()
+    if (text in ["true", "false"]):
+        return text == "true"
+    match = _ARRAY_VALUE.match(text)
+    if (match is not None):
+        shape = [int(hi) - int(lo) + 1 for lo, hi in re.findall(r"(-?\d+)\.\.(-?\d+)", match.group(1))]
+        values = [_parse_value(v) for v in match.group(2).split(",") if v.strip()]
+        return np.array(values, dtype=object).reshape(shape).tolist()
+    if (text.startswith("[")):
+        return [_parse_value(v) for v in text[1:-1].split(",") if v.strip()]
+    return int(text)
+
+def read_fzn_solutions(text: str) -> List[dict]:
+    """Solutions in the output of a FlatZinc solver, as name -> value. Arrays
+    are nested lists, `VariableStore.decode` groups the values by family.
+
+    Args:
+        text (str): solver output, each solution ends with `----------`
+
+    Returns:
+        List[dict]: the solutions in order, the best one last when optimizing
+    """
+    solutions = []
+    values = {}
+    for statement in text.replace("\n", " ").split(";"):
+        statement = statement.strip()
+        while (statement.startswith("----------")):
+            solutions.append(values)
+            values = {}
+            statement = statement[len("----------"):].strip()
+        if ("=" in statement and not statement.startswith("=")):
+            name, value = statement.split("=", 1)
+            values[name.strip()] = _parse_value(value)
+    return solutions
+
+def solve_fzn(fzn: str, solver: minizinc.Solver, all_solutions: bool=False, timeout: float=None, ozn: str=None) -> List[dict]:
+    """Run a FlatZinc file written by `Model.write_fzn` or `Model.compile`
+    without compiling it.
+
+    Args:
+        fzn (str): path of the FlatZinc file
+        solver (minizinc.Solver): solver to run it with, it must support the
+            global constraints of the model natively
+        all_solutions (bool): report every solution, for satisfaction problems
+        timeout (float): time limit in seconds
+        ozn (str): output model written by `Model.compile`, the solver output
+            is passed through it to get the values of the model's variables
+
+    Returns:
+        List[dict]: the solutions as by `read_fzn_solutions`
+    """
+    driver = minizinc.default_driver
+    if (driver is None):
+        raise Exception("No compatible driver provided")
+    args = [str(driver.executable), "--solver", solver.id, os.fspath(fzn)]
+    if (all_solutions):
+        args.append("--all-solutions")
+    output = subprocess.run(args, capture_output=True, text=True, timeout=timeout, check=True)
+    if (ozn is not None):
+        args = [str(driver.executable), "--ozn-file", os.fspath(ozn)]
+        output = subprocess.run(args, input=output.stdout, capture_output=True, text=True, check=True)
+    return read_fzn_solutions(output.stdout)
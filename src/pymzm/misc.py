@@ -1,3 +1,9 @@
+import multiprocessing
+import numbers
+import os
+import re
+
+import numpy as np
 
 from .expression import *
     
@@ -5,6 +11,187 @@ def variableIterable2Str(variables) -> str:
     return str([v.name if isinstance(v, Expression) else v for v in variables]).replace("'", "")
 
 def array_py2mz(arr, shape):
-    assert len(shape) <= 2
+    return array_to_mz(np.reshape(arr, shape))
+
+# Elements formatted per block, bounds the temporary buffers
+_CHUNK_SIZE = 1 << 16
+_POWERS_OF_10 = 10 ** np.arange(1, 20, dtype=np.uint64)
+_BOOL_TOKENS = np.frombuffer(b"false true", dtype=np.uint8).reshape(2, 5)
+
+def _format_block(values: np.ndarray, row_ends: np.ndarray) -> bytes:
+    """Elements of a 1-d int or bool block, each followed by ", " or by "|" where
+    `row_ends` is set, without going through Python objects.
+
+    Every element is written right-aligned into a fixed-width row of a byte
+    matrix, the padding is then dropped in one pass.
+    """
+    if (values.dtype == np.bool_):
+        flags = values.astype(np.intp)
+        width = 5 - flags
+        columns = 5
+        cells = np.empty((len(values), columns + 2), dtype=np.uint8)
+        cells[:, :columns] = _BOOL_TOKENS[flags]
+    else:
+        negative = values < 0
+        magnitude = values.astype(np.uint64)
+        magnitude[negative] = ~magnitude[negative] + np.uint64(1)
+        digits = 1 + np.searchsorted(_POWERS_OF_10, magnitude, side="right")
+        width = digits + negative
+        columns = int(width.max())
+        cells = np.empty((len(values), columns + 2), dtype=np.uint8)
+        for k in range(int(digits.max())):
+            cells[:, columns - 1 - k] = ord("0") + (magnitude % np.uint64(10)).astype(np.uint8)
+            magnitude //= np.uint64(10)
+        cells[negative, columns - 1 - digits[negative]] = ord("-")
+
+    cells[:, columns] = np.where(row_ends, ord("|"), ord(","))
+    cells[:, columns + 1] = ord(" ")
+    keep = np.empty(cells.shape, dtype=bool)
+    keep[:, :columns] = np.arange(columns) >= (columns - width)[:, None]
+    keep[:, columns] = True
+    keep[:, columns + 1] = ~row_ends
+    return cells[keep].tobytes()
+
+def array_to_mz_chunks(values, chunk_size: int=_CHUNK_SIZE):
+    """MiniZinc literal of an int or bool array of any rank, in pieces.
+
+    1-d arrays are written as `[1, 2]`, non-empty 2-d arrays as `[|1, 2|3, 4|]`
+    and the others as `arrayNd(1..n, ..., [...])`. Integer and boolean arrays
+    are formatted from the NumPy buffer `chunk_size` elements at a time,
+    other element types by their `str`.
+
+    Args:
+        values (array_like): the array
+        chunk_size (int): elements per piece
+
+    Yields:
+        str: consecutive pieces of the literal
+    """
+    values = np.asarray(values)
+    native_2d = values.ndim == 2 and values.size > 0
+    if (values.ndim == 1):
+        yield "["
+    elif (native_2d):
+        yield "[|"
+    else:
+        yield f"array{values.ndim}d({', '.join(f'1..{d}' for d in values.shape)}, ["
+
+    # Blocks are taken from the array as it is, a memory-mapped array is only
+    # read one block at a time
+    flat = values.reshape(-1) if values.flags.c_contiguous else values.flat
+    formatted = values.dtype == np.bool_ or values.dtype.kind in "iu"
+    row_length = values.shape[1] if native_2d else None
+    for start in range(0, values.size, chunk_size):
+        block = np.asarray(flat[start:start + chunk_size])
+        last = start + len(block) == values.size
+        if (not formatted):
+            text = ", ".join(str(v) for v in block.tolist())
+            yield text if last else text + ", "
+            continue
+
+        if (block.dtype.kind in "iu"):
+            if (block.dtype == np.uint64 and block.max() > np.iinfo(np.int64).max):
+                raise OverflowError(f"{block.max()} is out of the 64-bit integer range of MiniZinc")
+            block = block.astype(np.int64, copy=False)
+        if (row_length is None):
+            row_ends = np.zeros(len(block), dtype=bool)
+        else:
+            row_ends = (np.arange(start + 1, start + len(block) + 1) % row_length) == 0
+        text = _format_block(block, row_ends).decode("ascii")
+        # The last element has no ", " after it, in 2-d its "|" closes the literal
+        yield text[:-2] if last and row_length is None else text
+
+    yield "]" if values.ndim == 1 or native_2d else "])"
+
+def array_to_mz(values) -> str:
+    """MiniZinc literal of an int or bool array of any rank, see `array_to_mz_chunks`."""
+    return "".join(array_to_mz_chunks(values))
+
+# Index values written as they are, the other values are escaped. Together the
+# tokens are unambiguous: digits (non-negative int), n + digits (negative int),
+# X + hex (escaped str), Y + hex (other values) or a plain word.
+_PLAIN_TOKEN = re.compile(r"[A-Za-z][A-Za-z0-9]*")
+_RESERVED_TOKEN = re.compile(r"n[0-9]+|[XY].*")
+
+def index_token(value) -> str:
+    """Identifier-safe token of one index value, distinct values get distinct tokens."""
+    if (isinstance(value, (numbers.Integral, np.integer)) and not isinstance(value, (bool, np.bool_))):
+        value = int(value) # NumPy integers
+        return str(value) if value >= 0 else f"n{-value}"
+    if (isinstance(value, str)):
+        if (_PLAIN_TOKEN.fullmatch(value) and not _RESERVED_TOKEN.fullmatch(value)):
+            return value
+        return "X" + value.encode().hex()
+    return "Y" + f"{type(value).__name__}:{value!r}".encode().hex()
+
+def index_names(name: str, indices):
+    """Names of the variables of family `name`, e.g. `x_3_n1` for index (3, -1).
+
+    Each distinct index value is converted once, the names of a whole index set
+    are then only joins of cached tokens. Distinct indices never share a name.
+
+    Args:
+        name (str): family name
+        indices (Iterable): index values or tuples of index values
+
+    Yields:
+        str: the name of each index
+    """
+    tokens = {}
+    token = tokens.__getitem__
+    prefix = f"{name}_"
+    for idx in indices:
+        parts = idx if isinstance(idx, tuple) else (idx,)
+        try:
+            joined = "_".join(map(token, parts))
+        except KeyError:
+            # Equal values (e.g. 1 and True) share the token of the first one
+            for value in parts:
+                if (value not in tokens):
+                    tokens[value] = index_token(value)
+            joined = "_".join(map(token, parts))
+        yield prefix + joined
+
+# Parallel rendering. The workers are forked, so they see the model as it is
+# when the pool starts and only the rendered text is sent back
+_MIN_SHARD = 1000
+_render_job = None
+
+def _shards(count: int, workers: int) -> list:
+    """(start, stop) of consecutive shards of `count` items, a few per worker and
+    at least `_MIN_SHARD` items each. A single shard is rendered in process."""
+    if (workers is not None):
+        workers = min(workers, os.cpu_count() or 1)
+    if (workers is None or workers <= 1 or "fork" not in multiprocessing.get_all_start_methods()):
+        return [(0, count)]
+    n = max(1, min(4 * workers, count // _MIN_SHARD))
+    bounds = [count * k // n for k in range(n + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def _run_render_job(shard: tuple):
+    return _render_job(*shard)
+
+def render_parallel(render, count: int, workers: int) -> list:
+    """`render(start, stop)` over shards of `count` items, in a pool of `workers`
+    forked processes when there is enough work, results in shard order.
+
+    Args:
+        render (Callable): renders the items start..stop-1, it is not pickled
+        count (int): number of items
+        workers (int): number of processes, at most one per CPU. None or 1
+            renders in process
+
+    Returns:
+        list: the result of each shard
+    """
+    global _render_job
+    shards = _shards(count, workers)
+    if (len(shards) == 1):
+        return [render(*shards[0])]
 
-    return str(arr).replace("], [", "|").replace("[[", "[|").replace("]]", "|]")
\ No newline at end of file
+    _render_job = render
+    try:
+        with multiprocessing.get_context("fork").Pool(min(workers, len(shards))) as pool:
+            return pool.map(_run_render_job, shards, chunksize=1)
+    finally:
+        _render_job = None
@@ -1,12 +1,32 @@
 
+import itertools
+import json
+import operator
+import os
+import shutil
+import tempfile
+import warnings
+
 import minizinc
+import numpy as np
+from minizinc.json import MZNJSONEncoder
+from minizinc.model import UnknownExpression
 from typing import List, Tuple
 
 from .exceptions import *
 from .variable import *
+from .solution import *
 from .constraint import *
 from .expression import *
+from .expression import _render
+from .variable import _GridIndices
+from .expression_array import *
 from .constant import *
+from .optimize import *
+from .flatzinc import *
+from .misc import *
+from .cache import *
+from .parameter import *
 
 SOLVE_MAXIMIZE = "maximize"
 SOLVE_MINIMIZE = "minimize"
@@ -139,20 +159,83 @@ class AnnotationValueChoice:
     ]
 
 
+class _RenderCache:
+    """Rendered text of the items of the last `generate`, keyed by the item.
+    An entry is reused while the item still refers to the same objects, entries
+    of items that are gone are dropped at the next round."""
+    def __init__(self):
+        self.entries = {}   # id(item) -> (item, key, text)
+        self.fresh = {}
+        self.renames = 0
+        self.rendered = 0
+        self.reused = 0
+
+    def start(self, renames: int):
+        if (renames != self.renames):
+            self.entries = {}
+            self.renames = renames
+        self.fresh = {}
+        self.rendered = self.reused = 0
+
+    def finish(self):
+        self.entries = self.fresh
+        self.fresh = {}
+
+    def has(self, item, key: tuple) -> bool:
+        entry = self.entries.get(id(item))
+        return entry is not None and entry[0] is item and all(map(operator.is_, entry[1], key))
+
+    def text(self, item, key: tuple, render) -> str:
+        if (self.has(item, key)):
+            self.reused += 1
+            entry = self.entries[id(item)]
+        else:
+            self.rendered += 1
+            entry = (item, key, render())
+        self.fresh[id(item)] = entry
+        return entry[2]
+
 class Model(minizinc.Model):
     def __init__(self):
         self.constants = []
-        self.variables = []
+        self.store = VariableStore()
         self.constraints = []
         self.solve_criteria = None
         self.solve_expression = None
         self.solve_method = None
         self.model_mzn_str = None
+        self.generate_stats = {}
+        self.data_files = []
+        self._render_cache = _RenderCache()
+        self._generated = None      # text or path given to minizinc.Model
+        self._instance_data = set() # names of the constants passed as instance data
+        self.parameters = []        # Parameter, IndexSet and ParameterArray declarations
+        self.parametric_arrays = []
 
         self.global_constraints = set()
 
         super().__init__()
 
+    @property
+    def family_copies(self):
+        """Copies of the variable families indexed by comprehensions, declared
+        once per model, see `VariableStore.family_copies`."""
+        return self.store.family_copies
+
+    @property
+    def variables(self) -> List[Variable]:
+        """Variables of the model in order of creation."""
+        return self.store.handles
+
+    def lookup(self, name: str) -> Tuple[str, tuple]:
+        """Family and index of the variable named `name` in the solver output,
+        see `VariableStore.lookup`."""
+        return self.store.lookup(name)
+
+    def decode_solution(self, solution) -> dict:
+        """Values of a solution grouped by family, see `VariableStore.decode`."""
+        return self.store.decode(vars(solution))
+
     def set_solve_criteria(self, criteria: str, expr: Expression=None):
         self.solve_criteria = criteria
         self.solve_expression = expr
@@ -172,21 +255,146 @@ class Model(minizinc.Model):
         self.restart_strategy = restart_strategy
 
     def add_constant(self, name: str, value, vtype=Variable.VTYPE_INTEGER):
+        """Add a named constant, a single value or an array of any rank.
+
+        NumPy arrays, including `np.memmap` and `np.load(..., mmap_mode="r")`
+        arrays, are kept by reference. With `generate(data="*.dzn")` they are
+        streamed to the data file in blocks.
+
+        Args:
+            name (str): name of the constant
+            value: value or array of values
+            vtype (str): Variable.VTYPE_INTEGER or Variable.VTYPE_BOOL
+
+        Returns:
+            Constant: the constant, index it to use its elements in expressions
+        """
         constant = Constant(name, value, vtype)
         self.constants.append(constant)
         return constant
 
+    def add_parameter(self, name: str, shape=None, vtype=Variable.VTYPE_INTEGER):
+        """Add an instance parameter, declared without a value and assigned per
+        instance by `instance_data` or `instantiate`. The generated model is a
+        template that is built once and solved for any number of data sets.
+
+        Args:
+            name (str): name of the parameter
+            shape (IndexSet | Tuple[IndexSet]): index sets of an array parameter,
+                None for a single value
+            vtype (str): Variable.VTYPE_INTEGER or Variable.VTYPE_BOOL
+
+        Returns:
+            Parameter | ParameterArray: the parameter, index an array with ints,
+                `Index` objects or expressions
+        """
+        if (shape is None):
+            parameter = (ParameterBool if vtype == Variable.VTYPE_BOOL else Parameter)(name, vtype)
+        else:
+            parameter = ParameterArray(name, self._index_sets(shape, "shape"), vtype)
+        self.parameters.append(parameter)
+        return parameter
+
+    def add_index_set(self, name: str, size) -> IndexSet:
+        """Add the index set `0..size-1`, usable as the shape of parameter and
+        variable arrays and as loop range (see `IndexSet.index`).
+
+        Args:
+            name (str): name of the set
+            size (int | Expression): number of elements, usually a `Parameter`
+
+        Returns:
+            IndexSet: the index set
+        """
+        index_set = IndexSet(name, size)
+        self.parameters.append(index_set)
+        return index_set
+
+    @staticmethod
+    def _index_sets(shape, argname: str) -> "Tuple[IndexSet] | None":
+        # Index sets of a parametric shape, None for a shape of sizes or indices
+        if (isinstance(shape, IndexSet)):
+            return (shape,)
+        if (isinstance(shape, tuple) and any(isinstance(d, IndexSet) for d in shape)):
+            if (not all(isinstance(d, IndexSet) for d in shape)):
+                raise PymzmInvalidShape(argname, "index sets and sizes can't be mixed")
+            return shape
+        return None
+
+    def _add_parametric_array(self, name: str, index_sets: tuple, vtype: int, val_min, val_max, domains) -> ParametricVariableArray:
+        if (domains is not None and not (type(domains) is set or isinstance(domains, Domain))):
+            raise PymzmInvalidVariableError("domains", "parametric arrays have a single domain")
+        array = ParametricVariableArray(name, index_sets, vtype, val_min, val_max, domains)
+        self.parametric_arrays.append(array)
+        return array
+
     def add_variable(self, name: str, vtype: int=Variable.VTYPE_INTEGER, val_min: int=None, val_max: int=None, domain: set=None):
-        variable = Variable(name, vtype, val_min, val_max, domain)
-        self.variables.append(variable)
-        return variable
+        return self.store.add(name, vtype, val_min, val_max, domain)
     
-    def add_variables(self, name: str, indices: List[Tuple[int]], vtype: int=Variable.VTYPE_INTEGER, val_min: int=None, val_max: int=None, domains: set=None) -> ValueDict:
-
+    def add_variables(self, name: str, indices: List[Tuple[int]], vtype: int=Variable.VTYPE_INTEGER, val_min: int=None, val_max: int=None, domains: set=None, as_array: bool=False) -> ValueDict:
+        """Add a family of variables, one per index.
+
+        Args:
+            name (str): name of the family, the variables are named by `index_names`,
+                e.g. `x_3_n1` for index (3, -1)
+            indices (List[Tuple[int]]): index of each variable
+            vtype (int): variable type
+            val_min (int): lower bound of every variable
+            val_max (int): upper bound of every variable
+            domains (set | Domain): domain of every variable, or a list or dict of per-index domains
+            as_array (bool): declare the family as a single MiniZinc array, the indices
+                must form a full grid. Solution values are still available by the
+                `{name}_{index}` names
+
+        With an `IndexSet` or a tuple of them as `indices` the family is a
+        `ParametricVariableArray` whose size is given by the instance data, the
+        bounds can then be parameters as well.
+
+        Returns:
+            ValueDict: index -> variable
+        """
+        index_sets = self._index_sets(indices, "indices")
+        if (index_sets is not None):
+            return self._add_parametric_array(name, index_sets, vtype, val_min, val_max, domains)
+        indices = list(indices)
+        ids = self._add_family(name, indices, vtype, val_min, val_max, domains, as_array)
+        return ValueDict(zip(indices, self.store.handles[ids.start:ids.stop]))
+
+    def add_variable_array(self, name: str, shape, vtype: int=Variable.VTYPE_INTEGER, val_min: int=None, val_max: int=None, domains: set=None, as_array: bool=False) -> ExpressionArray:
+        """Add a dense N-dimensional family of variables, indexed from 0.
+
+        The result supports NumPy style indexing, slices and the views of
+        `ExpressionArray`, e.g. `xs[i, :]`, `xs[:, j]`, `xs.T` or `xs.blocks(3, 3)`,
+        without copying the variables. Global constraints accept it directly.
+
+        Args:
+            name (str): name of the family, the variables are named as by
+                `add_variables`, e.g. `x_2_0`
+            shape (int | Tuple[int]): size of each dimension, or the index sets
+                of a `ParametricVariableArray` (see `add_variables`)
+            vtype (int): variable type
+            val_min (int): lower bound of every variable
+            val_max (int): upper bound of every variable
+            domains (set | Domain): domain of every variable, or a list of per-element domains in row-major order
+            as_array (bool): declare the family as a single MiniZinc array
+
+        Returns:
+            ExpressionArray: array of the variables
+        """
+        index_sets = self._index_sets(shape, "shape")
+        if (index_sets is not None):
+            return self._add_parametric_array(name, index_sets, vtype, val_min, val_max, domains)
+        shape = (shape,) if isinstance(shape, int) else tuple(shape)
+        # Neither the indices nor the variable handles are stored per element
+        indices = range(shape[0]) if len(shape) == 1 else _GridIndices(shape)
+        ids = self._add_family(name, indices, vtype, val_min, val_max, domains, as_array)
+        return ExpressionArray._from_store(self.store, ids, shape)
+
+    def _add_family(self, name: str, indices: list, vtype: int, val_min: int, val_max: int, domains, as_array: bool) -> range:
         # Domain
         if (domains is None):
             domains = {}
-        elif (type(domains) is set):
+        elif (type(domains) is set or isinstance(domains, Domain)):
             domains = {idx: domains for idx in indices}
         elif (type(domains) is list):
             assert len(domains) == len(indices)
@@ -196,14 +404,12 @@ class Model(minizinc.Model):
             assert set(domains.keys()) == set(indices)
             domains = {idx: domains[idx] for idx in indices}
 
-        variables = ValueDict()
-        for idx in indices:
-            idx_str = str(idx).replace(", ", "_").replace("(", "").replace(")", "").replace("'", "").replace("-", "_")
-            variable = Variable(f"{name}_{idx_str}", vtype, val_min, val_max, domains.get(idx, None))
-            self.variables.append(variable)
-            variables[idx] = variable
+        if (as_array):
+            return VariableArray(name, indices, vtype, val_min, val_max, domains, store=self.store).ids
 
-        return variables
+        names = index_names(name, indices)
+        domains = None if not domains else [domains.get(idx, None) for idx in indices]
+        return self.store._add(names, vtype, val_min, val_max, domains, family=name, indices=indices)
 
     def add_constraint(self, constraint: ExpressionBool, is_redundant=False):
         if (isinstance(constraint, Constraint)):
@@ -212,7 +418,11 @@ class Model(minizinc.Model):
                 self.global_constraints.add(constraint.ctype)
 
         elif (isinstance(constraint, ExpressionBool)):
-            constraint = Constraint(constraint.name, is_redundant=is_redundant)
+            constraint = Constraint(constraint, is_redundant=is_redundant)
+
+        elif (isinstance(constraint, ExpressionArray)):
+            # Every element must hold, emitted as a single forall
+            constraint = Constraint(constraint.all(), is_redundant=is_redundant)
 
         else:
             raise Exception("invalid constraint type")
@@ -222,17 +432,236 @@ class Model(minizinc.Model):
 
     def add_constraints(self, constraints: List[Constraint], is_redundant=False):
         constraints = list(constraints)
-        assert all(isinstance(constraint, (Constraint, Expression, str, bool)) for constraint in constraints)
+        assert all(isinstance(constraint, (Constraint, Expression, ExpressionArray, str, bool)) for constraint in constraints)
         for constraint in constraints:
             self.add_constraint(constraint, is_redundant=is_redundant)
 
-    def generate(self, debug=False):
-        self.model_mzn_str = ""
-        for gconst in self.global_constraints:
-            self.model_mzn_str += f'include \"{gconst}.mzn\";\n'
+    def forall(self, ranges, body, is_redundant=False) -> List[Constraint]:
+        """Add the constraints `body(i)` for every `i` in `ranges`, e.g.
+        `model.forall(range(n), lambda i: xs[i] <= xs[i + 1] + d[i])`.
+
+        The body is called once with symbolic indices and the result is added
+        as a single `forall(...)` constraint, which keeps the Python work and
+        the model text independent of the number of iterations. Families
+        declared as MiniZinc arrays and constants indexed with the symbolic
+        indices are referred to by name, other variable families through a copy
+        declared once per model (`family_copies`) and other `ExpressionArray`s
+        through a copy local to the constraint. When the body can't be traced,
+        e.g. it branches on an index, indexes a Python list with it or adds
+        constraints itself, it is called for every index instead (unrolled).
+
+        Args:
+            ranges (range | IndexSet | list): one range per argument of `body`.
+                Ranges with a step other than 1 are always unrolled, index sets
+                of a parametric model are never unrolled
+            body: function of the indices returning a condition, a global
+                constraint or an `ExpressionArray` of conditions
+            is_redundant (bool): mark the constraints as redundant
+
+        Returns:
+            List[Constraint]: the constraints added, one if the body was traced
+        """
+        ranges = list(ranges) if isinstance(ranges, (list, tuple)) else [ranges]
+        symbolic = any(isinstance(values, IndexSet) for values in ranges)
+        if (symbolic or all(isinstance(values, range) and values.step == 1 for values in ranges)):
+            if (not all(len(values) for values in ranges if isinstance(values, range))):
+                return []
+            count = len(self.constraints)
+            copies = len(self.family_copies)
+            global_constraints = set(self.global_constraints)
+            try:
+                condition, ctype = trace_forall(ranges, body)
+                if (len(self.constraints) != count):
+                    raise PymzmNotTraceable("the body adds constraints")
+            except Exception:
+                del self.constraints[count:]
+                self.family_copies.rollback(copies)
+                self.global_constraints = global_constraints
+                if (symbolic):
+                    raise
+            else:
+                constraint = Constraint(condition, ctype or Constraint.CTYPE_NORMAL)
+                return [self.add_constraint(constraint, is_redundant)]
+
+        return [self.add_constraint(body(*indices), is_redundant) for indices in itertools.product(*ranges)]
+
+    def generate(self, debug=False, simplify=False, cse=False, check_overflow=False, prune=False, data: str=None, dedup=False, out: str=None, workers: int=None):
+        """Generate the MiniZinc model text and add it to the model.
+
+        A compound objective is declared as an auxiliary variable with the domain
+        inferred by `Expression.bounds`, as are the variables added by `cse`.
+
+        Args:
+            debug (bool): print the generated model
+            simplify (bool): fold constants and remove identity terms, the number
+                of removed nodes is reported in `generate_stats["simplify_removed_nodes"]`
+            cse (bool): define repeated subexpressions once as auxiliary variables
+                and drop duplicate constraints
+            check_overflow (bool): warn (`PymzmOverflowWarning`) about constraints
+                whose intermediate values may exceed the 32 bit range of the solvers,
+                they are listed in `generate_stats["overflows"]`
+            prune (bool): leave out the variables and constants that no constraint,
+                objective or search annotation refers to, their number is reported in
+                `generate_stats["pruned_variables"]` and `generate_stats["pruned_constants"]`.
+                Pruned variables are not part of the solution
+            data (str): where the values of the constants go. None writes them into
+                the model text. Otherwise the model only declares the constants, so its
+                text is the same for every instance: "instance" passes the values as
+                `minizinc.Instance` data, a path ending in ".dzn" or ".json" writes them
+                to that data file (see `write_data`) and adds it to the model
+            dedup (bool): write constants with the same content as an earlier one
+                as a copy of it, e.g. `array[1..3] of int: b = a;`, their values are
+                also left out of the data. The bytes saved by this and by the named
+                domains are reported in `generate_stats["dedup_constant_bytes"]` and
+                `generate_stats["dedup_domain_bytes"]`, their sum in
+                `generate_stats["dedup_bytes_saved"]`
+            out (str): stream the model text to this file and add the file to the
+                model instead of the text, `model_mzn_str` is then None. The text is
+                never held in memory as a whole
+            workers (int): render the constraints and variable declarations in this
+                many processes. The lists are split into shards of at least 1000
+                items, rendered by forked workers and joined in order, so the text
+                is the same as without workers. Where processes can't be forked
+                (Windows, see `multiprocessing`) it is rendered in process
+        """
+        options = dict(simplify=simplify, cse=cse, check_overflow=check_overflow, prune=prune, data=data, dedup=dedup, workers=workers)
+        if (out is not None):
+            self.model_mzn_str = None
+            with open(out, "w") as f:
+                f.writelines(self.iter_mzn(**options))
+        else:
+            self.model_mzn_str = "".join(self.iter_mzn(**options))
+        self._replace_generated(out)
+
+        if (debug):
+            if (self.model_mzn_str is not None):
+                print(self.model_mzn_str)
+            if (self.generate_stats):
+                print(self.generate_stats)
+
+    def _replace_generated(self, out: str=None):
+        # The text of an earlier generate is replaced, not added a second time
+        with self._lock:
+            if (isinstance(self._generated, str)):
+                for i, fragment in enumerate(self._code_fragments):
+                    if (fragment is self._generated):
+                        del self._code_fragments[i]
+                        break
+            elif (self._generated is not None and self._generated in self._includes):
+                self._includes.remove(self._generated)
+
+        if (out is not None):
+            self.add_file(out, parse_data=False)
+            self._generated = self._includes[-1]
+        else:
+            self.add_string(self.model_mzn_str)
+            self._generated = self.model_mzn_str
+
+    def iter_mzn(self, simplify=False, cse=False, check_overflow=False, prune=False, data: str=None, dedup=False, workers: int=None):
+        """Generate the MiniZinc model text in chunks, one per declaration or
+        constraint, without adding it to the model. The options are those of
+        `generate`, `generate_stats` is complete once the generator is exhausted.
+
+        The text of constants, variable declarations and constraints is cached
+        between calls and only re-rendered for items that were added or changed,
+        e.g. a constraint whose expression was replaced. Renaming a variable
+        renders everything again. The numbers of rendered and reused items are
+        reported in `generate_stats["rendered"]` and `generate_stats["reused"]`.
+
+        Yields:
+            str: consecutive pieces of the model text
+        """
+        self.generate_stats = {}
+        cache = self._render_cache
+        cache.start(self.store.renames)
+        for gconst in sorted(self.global_constraints):
+            yield f'include \"{gconst}.mzn\";\n'
+        for parameter in self.parameters:
+            yield parameter._declaration()
+
+        constraints = self.constraints
+        solve_expression = self.solve_expression
+        definitions = []
+        aliases = None
+        if (simplify):
+            constraints, solve_expression, removed = simplify_constraints(constraints, solve_expression)
+            self.generate_stats["simplify_removed_nodes"] = removed
+
+        if (cse):
+            constraints, definitions, aliases = eliminate_common_subexpressions(constraints, solve_expression)
+
+        objective = bound_objective(solve_expression)
+        if (objective is not None):
+            definitions = definitions + [objective]
+            solve_expression = Expression(objective.name)
+
+        if (check_overflow):
+            overflows = find_overflows([c.cstr for c in constraints] + [solve_expression] + [d.expr for d in definitions])
+            self.generate_stats["overflows"] = overflows
+            for expr, bounds in overflows:
+                warnings.warn(f"{expr} may take values in {bounds[0]}..{bounds[1]}", PymzmOverflowWarning)
+
+        # The flat names of array elements are resolved by a Solution class,
+        # an output type set by the user is kept unless it is a Solution
+        output_type = self.output_type
+        is_solution = isinstance(output_type, type) and issubclass(output_type, Solution)
+        if (self.store.arrays):
+            if (output_type is None or (is_solution and output_type._store is not self.store)):
+                self.output_type = (output_type or Solution)._for_store(self.store)
+        elif (is_solution and output_type._store is not None):
+            base = output_type.__mro__[1]
+            self.output_type = None if base is Solution else base
+
+        constants = self.constants
+        keep = None
+        names = None
+        if (prune):
+            keep, names = find_references(
+                [constraints, definitions, solve_expression, self.solve_method], self.store)
+            for ids in self.family_copies.ranges(names):
+                keep[ids.start:ids.stop] = b"\x01" * len(ids)
+            constants = [c for c in self.constants if c.name in names]
+            self.generate_stats["pruned_variables"] = keep.count(0)
+            self.generate_stats["pruned_constants"] = len(self.constants) - len(constants)
+
+        duplicates = find_duplicate_constants(constants) if dedup else {}
+        for constant in constants:
+            original = duplicates.get(constant)
+            if (original is not None):
+                yield constant._alias(original)
+            elif (data is None):
+                yield cache.text(constant, (constant.name, constant.value, constant.vtype), constant._to_mz)
+            else:
+                yield constant._declaration()
+        if (data is not None):
+            self._add_data([c for c in constants if c not in duplicates], data)
+
+        stats = {}
+        yield from self.store._iter_mz(keep, stats, workers)
+        for array in self.parametric_arrays:
+            yield array._declaration()
+        yield from self.family_copies._iter_mz(names)
+        if (dedup):
+            value_lengths = {}
+            constant_bytes = 0
+            for constant, original in duplicates.items():
+                if (original not in value_lengths):
+                    value_lengths[original] = sum(map(len, original._value_chunks()))
+                constant_bytes += value_lengths[original] - len(original.name)
+            self.generate_stats["dedup_constants"] = len(duplicates)
+            self.generate_stats["dedup_constant_bytes"] = constant_bytes
+            self.generate_stats["dedup_domain_bytes"] = stats["domain_bytes_saved"]
+            self.generate_stats["dedup_bytes_saved"] = constant_bytes + stats["domain_bytes_saved"]
+        items = definitions + constraints
+        if (workers is not None and workers > 1):
+            yield from self._render_parallel(items, aliases, workers)
+        else:
+            for item in items:
+                if (aliases is None and isinstance(item, Constraint)):
+                    yield cache.text(item, (item.cstr, item.is_redundant), item._to_mz)
+                else:
+                    yield item._to_mz(aliases)
 
-        self.model_mzn_str += "".join(a._to_mz() for a in self.constants + self.variables + self.constraints)
-        
         assert self.solve_criteria is not None
         _solve_method_str = ""
         if (self.solve_method is not None):
@@ -243,17 +672,215 @@ class Model(minizinc.Model):
 
         _solve_method_str += f"{self.solve_criteria}"
 
-        if (self.solve_expression is not None):
-            _solve_method_str += f" {self.solve_expression}"
+        if (solve_expression is not None):
+            _solve_method_str += f" {_render(solve_expression, aliases)}"
             
-        self.model_mzn_str += f"solve {_solve_method_str};\n"
-
-        self.add_string(self.model_mzn_str)
-        if (debug):
-            print(self.model_mzn_str)
+        yield f"solve {_solve_method_str};\n"
+
+        cache.finish()
+        self.generate_stats["rendered"] = cache.rendered
+        self.generate_stats["reused"] = cache.reused
+
+    def _render_parallel(self, items: list, aliases: dict, workers: int) -> List[str]:
+        # Only the items without cached text are sent to the workers
+        cache = self._render_cache
+        cached = aliases is None
+        keys = [(item.cstr, item.is_redundant) if cached and isinstance(item, Constraint) else None for item in items]
+        missing = [i for i, key in enumerate(keys) if key is None or not cache.has(items[i], key)]
+
+        def render(start: int, stop: int) -> List[str]:
+            return [items[i]._to_mz(aliases) for i in missing[start:stop]]
+
+        rendered = dict(zip(missing, (text for shard in render_parallel(render, len(missing), workers) for text in shard)))
+        texts = []
+        for i, (item, key) in enumerate(zip(items, keys)):
+            if (key is None):
+                texts.append(rendered[i])
+            else:
+                texts.append(cache.text(item, key, lambda: rendered[i]))
+        return texts
+
+    def _add_data(self, constants: List[Constant], data: str):
+        if (data == "instance"):
+            # Values of an earlier generate are replaced
+            with self._lock:
+                for name in self._instance_data:
+                    self._data.pop(name, None)
+            self._instance_data = {constant.name for constant in constants}
+            for constant in constants:
+                self[constant.name] = constant._data_value()
+            return
+
+        self.write_data(data, constants)
+        if (data not in self.data_files):
+            self.add_file(data, parse_data=False)
+            self.data_files.append(data)
+
+    def write_data(self, fn: str, constants: List[Constant]=None):
+        """Write the values of the constants to a MiniZinc data file, JSON if `fn`
+        ends in ".json", otherwise dzn. Arrays are streamed to dzn files in blocks,
+        so memory-mapped constants are never loaded as a whole.
+
+        Args:
+            fn (str): path of the data file
+            constants (List[Constant]): constants to write, all by default
+        """
+        if (constants is None):
+            constants = self.constants
+        with open(fn, "w") as f:
+            if (str(fn).endswith(".json")):
+                json.dump({constant.name: constant._data_value() for constant in constants}, f)
+            else:
+                # Written piece by piece, large arrays are never held as one string
+                for constant in constants:
+                    f.writelines(constant._to_dzn_chunks())
+
+    def instance_data(self, **values) -> str:
+        """Data of one instance of a parametric model (see `add_parameter`) as
+        dzn assignments. Index set sizes that are parameters may be left out
+        when an array over the set is given.
+
+        Args:
+            values: parameter name -> value, arrays as nested lists or NumPy arrays
+
+        Returns:
+            str: the assignments
+
+        Raises:
+            PymzmParameterError: a parameter is missing, unknown or has the wrong shape
+        """
+        return parameter_data(self.parameters, values)
+
+    def instantiate(self, solver: minizinc.Solver, **values) -> minizinc.Instance:
+        """Instance of the generated parametric model for one data set, the
+        model itself is not changed or generated again.
+
+        Args:
+            solver (minizinc.Solver): solver of the instance
+            values: parameter name -> value, see `instance_data`
+
+        Returns:
+            minizinc.Instance: the instance, ready to solve
+        """
+        data = self.instance_data(**values)
+        instance = minizinc.Instance(solver, self)
+        instance.add_string(data)
+        return instance
+
+    def write(self, fp):
+        """Write the model text to a path or a writable text stream, e.g. a pipe
+        or `gzip.open(..., "wt")`. Without a generated text it is streamed from
+        `iter_mzn` with the default options.
+
+        Args:
+            fp (str | TextIO): path or stream
+        """
+        if (isinstance(fp, (str, os.PathLike))):
+            with open(fp, "w") as f:
+                self.write(f)
+            return
+
+        if (self.model_mzn_str is not None):
+            fp.write(self.model_mzn_str)
+        else:
+            fp.writelines(self.iter_mzn())
+
+    def write_fzn(self, fp):
+        """Write the model as FlatZinc, which solvers run without the MiniZinc
+        compilation step (see `solve_fzn`).
+
+        The expressions are flattened by pymzm itself: linear constraints become
+        `int_lin_*` constraints, nonlinear terms, element lookups in constants
+        and reified conditions get auxiliary variables, and global constraints
+        are passed to the solver's `fzn_*` predicates. Variables are output
+        under the names of their solution values (`output_var`, `output_array`).
+        Only integer and bool variables and the operators above are supported,
+        anything else raises `PymzmUnsupportedFlatZinc` before anything is written.
+        The sizes of the result are reported in `generate_stats`.
+
+        Args:
+            fp (str | TextIO): path or stream
+        """
+        pieces = list(iter_fzn(self))
+        if (isinstance(fp, (str, os.PathLike))):
+            with open(fp, "w") as f:
+                f.writelines(pieces)
+        else:
+            fp.writelines(pieces)
 
-    def write(self, fn: str):
-        if (self.model_mzn_str is None):
+    def _compile_inputs(self, parameters: dict=None) -> Tuple[str, str, List[str]]:
+        # Model fragments, instance data as JSON and included files, as minizinc.Instance passes them
+        if (self._generated is None):
             self.generate()
-        with open(fn, "w") as f:
-            f.write(self.model_mzn_str)
\ No newline at end of file
+        fragments = [] if parameters is None else [self.instance_data(**parameters)]
+        data = {}
+        for name, value in self._data.items():
+            if (isinstance(value, UnknownExpression)):
+                fragments.append(f"{name} = {value};\n")
+            else:
+                data[name] = value
+        fragments.extend(self._code_fragments)
+        data_json = json.dumps(data, cls=MZNJSONEncoder, ensure_ascii=False, sort_keys=True) if (data) else ""
+        return "".join(fragments), data_json, list(self._includes)
+
+    def fingerprint(self, solver: minizinc.Solver, options: List[str]=(), parameters: dict=None) -> str:
+        """Content hash identifying the compiled model: the generated text, the
+        data files and instance data, the solver with its version and the
+        compiler options. It changes whenever `minizinc -c` could produce
+        something different, so it keys `CompileCache`. The model is generated
+        with the default options if it wasn't yet.
+
+        Args:
+            solver (minizinc.Solver): solver the model is compiled for
+            options (List[str]): extra `minizinc -c` command line options
+            parameters (dict): values of the parameters, see `instance_data`
+
+        Returns:
+            str: hex digest
+        """
+        text, data_json, files = self._compile_inputs(parameters)
+        return fingerprint([text, data_json], files, solver, options)
+
+    def compile(self, solver: minizinc.Solver, cache: CompileCache=None, options: List[str]=(), parameters: dict=None) -> Tuple[str, str]:
+        """Compile the generated model to FlatZinc with `minizinc -c`, skipping
+        the compiler when `cache` holds the same model (see `fingerprint`).
+        Run the result with `solve_fzn(fzn, solver, ozn=ozn)`.
+
+        Args:
+            solver (minizinc.Solver): solver the model is compiled for
+            cache (CompileCache): cache to look up and store the result in,
+                without it the files are left in a new temporary directory
+            options (List[str]): extra `minizinc -c` command line options
+            parameters (dict): values of the parameters of a parametric model,
+                see `instance_data`
+
+        Returns:
+            Tuple[str, str]: paths of the `.fzn` and `.ozn` files
+        """
+        text, data_json, files = self._compile_inputs(parameters)
+        key = fingerprint([text, data_json], files, solver, options)
+        if (cache is not None):
+            paths = cache.get(key)
+            if (paths is not None):
+                return paths
+
+        directory = tempfile.mkdtemp(prefix="pymzm_compile")
+        inputs = list(files)
+        for contents, suffix in [(text, ".mzn"), (data_json, ".json")]:
+            if (contents):
+                path = os.path.join(directory, "model" + suffix)
+                with open(path, "w") as f:
+                    f.write(contents)
+                inputs.append(path)
+        fzn, ozn = os.path.join(directory, CACHE_FZN), os.path.join(directory, CACHE_OZN)
+        try:
+            compile_mzn(inputs, solver, fzn, ozn, options)
+        except BaseException:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        if (cache is None):
+            return fzn, ozn
+        try:
+            return cache.put(key, fzn, ozn)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,661 @@
+
+import copy
+import re
+from typing import List, Tuple
+
+from .expression import *
+from .expression import _LEAF, _OPERATOR, _FUNC, _IFTHENELSE, _PREFIX, _LINEAR, _GENERATOR, _LET, _INDEX, _render, _compute_bounds, _value_expressions
+from .variable import *
+from .constraint import *
+
+CSE_PREFIX = "pymzm_cse"
+OBJECTIVE_NAME = "pymzm_objective"
+
+# Integer domains of Gecode and most CP solvers are 32 bit
+INT_LIMIT = 2 ** 31 - 1
+
+# Operators whose result is a set, these can't be declared as int/bool variables
+_SET_OPERATORS = ["intersect", "union", "diff", "symdiff"]
+_ARRAY_ND = re.compile(r"array\dd")
+
+class _Interner:
+    """Hash-consing of expression trees.
+
+    Every structurally distinct subtree gets a small integer id, so identical
+    subexpressions built separately share the same id. Ids are assigned in
+    post-order, children always have a smaller id than their parents.
+    """
+    def __init__(self):
+        self.ids = {}       # structural key -> id
+        self.memo = {}      # id(node) -> id
+        self.nodes = []     # id -> first node seen with that structure
+        self.is_float = []  # id -> True if the subtree has a float value
+
+    def _value_key(self, value):
+        if (isinstance(value, Expression)):
+            return self.memo[id(value)]
+        if (isinstance(value, tuple)):
+            return ("array", tuple(self._value_key(v) for v in value))
+        return (type(value).__name__, value)
+
+    def _value_is_float(self, value) -> bool:
+        if (isinstance(value, Expression)):
+            return self.is_float[self.memo[id(value)]]
+        if (isinstance(value, tuple)):
+            return any(self._value_is_float(v) for v in value)
+        return isinstance(value, float)
+
+    def intern(self, expr: Expression) -> int:
+        stack = [(expr, False)]
+        while (stack):
+            node, expanded = stack.pop()
+            if (id(node) in self.memo):
+                continue
+
+            if (not expanded):
+                stack.append((node, True))
+                for arg in node._args:
+                    for child in _value_expressions(arg):
+                        if (id(child) not in self.memo):
+                            stack.append((child, False))
+                continue
+
+            key = (
+                node._kind,
+                node._symbol,
+                isinstance(node, ExpressionBool),
+                tuple(self._value_key(arg) for arg in node._args),
+            )
+            i = self.ids.get(key)
+            if (i is None):
+                i = len(self.nodes)
+                self.ids[key] = i
+                self.nodes.append(node)
+                self.is_float.append(
+                    (isinstance(node, Variable) and node.vtype == Variable.VTYPE_FLOAT)
+                    or node._symbol == "/"
+                    or any(self._value_is_float(arg) for arg in node._args)
+                )
+            self.memo[id(node)] = i
+
+        return self.memo[id(expr)]
+
+class SharedExpression:
+    """Auxiliary variable defined by a subexpression that occurs several times."""
+    def __init__(self, name: str, expr: Expression, vtype: str, bounds: tuple=None):
+        self.name = name
+        self.expr = expr
+        self.vtype = vtype
+        self.bounds = bounds
+
+    def __str__(self):
+        return self.name
+
+    def _to_mz(self, aliases: dict=None):
+        return f"var {_domain_str(self.vtype, self.bounds)}: {self.name} = {_render(self.expr, aliases)};\n"
+
+def _domain_str(vtype: str, bounds: tuple=None) -> str:
+    """Declared domain of an auxiliary variable, `lo..hi` when the bounds are known."""
+    if (bounds is None or vtype == Variable.VTYPE_BOOL):
+        return vtype
+    if (vtype == Variable.VTYPE_FLOAT):
+        return f"{float(bounds[0])}..{float(bounds[1])}"
+    if (isinstance(bounds[0], float) or isinstance(bounds[1], float)):
+        return vtype
+    return f"{bounds[0]}..{bounds[1]}"
+
+# Partial operations, undefined for some arguments (division by 0, index out of
+# range). Defined at the root they would constrain the arguments everywhere.
+_PARTIAL_OPERATORS = ["div", "mod", "/", "pow"]
+
+def _is_shareable(node: Expression) -> bool:
+    if (node._kind in [_LEAF, _GENERATOR, _INDEX]):
+        return False
+    if (node._symbol in _PARTIAL_OPERATORS):
+        return False
+    if (node._symbol in _SET_OPERATORS):
+        return False
+    if (node._kind == _FUNC and node._symbol in Constraint.CTYPES):
+        # Global constraints would become reified
+        return False
+    if (node._kind == _FUNC and _ARRAY_ND.fullmatch(node._symbol)):
+        # Arrays can't be declared as int/bool variables
+        return False
+    return True
+
+def _root_children(node: Expression) -> list:
+    """Children of a node in root context that are evaluated whenever the node
+    is: the conjuncts of /\\ and the numeric operands of other nodes, except
+    for the guarded branches of if-then-else."""
+    if (node._kind == _IFTHENELSE):
+        return []
+    is_conjunction = node._kind == _OPERATOR and node._symbol == "/\\"
+    return [
+        child for arg in node._args for child in _value_expressions(arg)
+        if is_conjunction or not isinstance(child, ExpressionBool)
+    ]
+
+def eliminate_common_subexpressions(constraints: List[Constraint], objective: Expression=None, prefix: str=CSE_PREFIX):
+    """Find subexpressions occurring more than once across the constraints and
+    the objective and define each of them once as an auxiliary variable.
+    Exact duplicate constraints are dropped.
+
+    Args:
+        constraints (List[Constraint]): constraints of the model
+        objective (Expression): solve expression of the model, if any
+        prefix (str): name prefix of the auxiliary variables
+
+    Returns:
+        Tuple[List[Constraint], List[SharedExpression], dict]: the remaining constraints,
+            the auxiliary variable definitions and the aliases to render with
+    """
+    interner = _Interner()
+    kept = []
+    seen_constraints = set()
+    for constraint in constraints:
+        if (isinstance(constraint.cstr, Expression)):
+            key = (constraint.ctype, constraint.is_redundant, interner.intern(constraint.cstr))
+        else:
+            key = (constraint.ctype, constraint.is_redundant, str(constraint.cstr))
+        if (key in seen_constraints):
+            continue
+        seen_constraints.add(key)
+        kept.append(constraint)
+
+    if (isinstance(objective, Expression)):
+        interner.intern(objective)
+
+    # Count occurrences in root context, the subtree of a repeated node is only
+    # visited once. Subexpressions that are only evaluated under a condition
+    # (if-then-else, the operands of \/, ->, not, ...) are not shared, a root
+    # definition would not be guarded by the condition.
+    counts = [0] * len(interner.nodes)
+    first = {}
+    visited = []
+    stack = []
+    for constraint in kept:
+        if (isinstance(constraint.cstr, Expression)):
+            stack.extend(_root_children(constraint.cstr))
+    if (isinstance(objective, Expression)):
+        stack.extend(_root_children(objective))
+
+    while (stack):
+        node = stack.pop()
+        if (node._kind == _LEAF):
+            continue
+        i = interner.memo[id(node)]
+        counts[i] += 1
+        visited.append(node)
+        if (counts[i] == 1):
+            first[i] = node
+            if (node._kind in [_GENERATOR, _LET]):
+                # The body refers to local names of the comprehension
+                continue
+            stack.extend(_root_children(node))
+
+    shared = {}
+    definitions = []
+    bounds = {}
+    for i in sorted(first):
+        node = first[i]
+        if (counts[i] < 2 or not _is_shareable(node)):
+            continue
+        if (isinstance(node, ExpressionBool)):
+            vtype = Variable.VTYPE_BOOL
+        elif (interner.is_float[i]):
+            vtype = Variable.VTYPE_FLOAT
+        else:
+            vtype = Variable.VTYPE_INTEGER
+        shared[i] = f"{prefix}_{len(definitions)}"
+        definitions.append(SharedExpression(shared[i], node, vtype, _compute_bounds(node, bounds)))
+
+    aliases = {}
+    for node in visited:
+        i = interner.memo[id(node)]
+        if (i in shared):
+            aliases[id(node)] = shared[i]
+
+    return kept, definitions, aliases
+
+
+def bound_objective(objective: Expression, name: str=OBJECTIVE_NAME) -> "SharedExpression | None":
+    """Declare a compound objective as an auxiliary variable whose domain is
+    the inferred bounds of the objective.
+
+    Args:
+        objective (Expression): solve expression of the model
+        name (str): name of the auxiliary variable
+
+    Returns:
+        SharedExpression: the definition, None if the bounds are unknown
+    """
+    if (not isinstance(objective, Expression) or objective._kind == _LEAF):
+        return None
+    bounds = _compute_bounds(objective)
+    if (bounds is None):
+        return None
+    is_float = isinstance(bounds[0], float) or isinstance(bounds[1], float)
+    return SharedExpression(name, objective, Variable.VTYPE_FLOAT if is_float else Variable.VTYPE_INTEGER, bounds)
+
+def find_overflows(exprs: list, limit: int=INT_LIMIT) -> list:
+    """Expressions with a subexpression whose inferred bounds exceed +-limit.
+
+    Args:
+        exprs (list): expressions to check, other values are ignored
+        limit (int): largest magnitude supported by the solver
+
+    Returns:
+        List[Tuple[Expression, tuple]]: the expressions with the widest
+            overflowing bounds found in them
+    """
+    overflows = []
+    for expr in exprs:
+        if (not isinstance(expr, Expression)):
+            continue
+        memo = {}
+        _compute_bounds(expr, memo)
+        widest = None
+        for bounds in memo.values():
+            if (bounds is not None and (bounds[0] < -limit or bounds[1] > limit)):
+                if (widest is None or max(-bounds[0], bounds[1]) > max(-widest[0], widest[1])):
+                    widest = bounds
+        if (widest is not None):
+            overflows.append((expr, widest))
+    return overflows
+
+
+_IDENTIFIER = re.compile(r"[A-Za-z][A-Za-z0-9_]*")
+
+def find_references(values: list, store: VariableStore) -> Tuple[bytearray, set]:
+    """Variables and names referred to by constraints, objectives, definitions
+    and search annotations.
+
+    Args:
+        values (list): expressions, constraints, definitions, search annotations,
+            raw MiniZinc text or collections of them
+        store (VariableStore): store of the variables
+
+    Returns:
+        Tuple[bytearray, set]: 1 for each variable id that is referred to, all
+            elements of an array if one of them is, and the other names referred
+            to (constants and arrays)
+    """
+    marks = bytearray(len(store))
+    names = set()
+    has_text = False
+    seen = set()
+    stack = list(values)
+    while (stack):
+        value = stack.pop()
+        if (isinstance(value, Expression)):
+            if (id(value) in seen):
+                continue
+            seen.add(id(value))
+            if (isinstance(value, Variable)):
+                if (value._store is store):
+                    marks[value._id] = 1
+                continue
+            if (value._kind == _INDEX):
+                names.add(value._symbol)
+            stack.extend(child for arg in value._args for child in _value_expressions(arg))
+
+        elif (isinstance(value, Constraint)):
+            stack.append(value.cstr)
+        elif (isinstance(value, SharedExpression)):
+            stack.append(value.expr)
+        elif (isinstance(value, str)):
+            has_text = True
+            names.update(_IDENTIFIER.findall(value))
+        elif (isinstance(value, dict)):
+            stack.extend(value.values())
+        elif (isinstance(value, (tuple, list))):
+            stack.extend(value)
+        elif (hasattr(value, "search_annotations")):
+            stack.extend(value.search_annotations)
+        elif (hasattr(value, "variables")):
+            stack.extend(value.variables)
+
+    # Arrays indexed by name, e.g. in traced loops, and variables named in
+    # raw MiniZinc text
+    index = store._name_index() if has_text else {}
+    for name in names:
+        array = store.arrays.get(name)
+        if (array is not None):
+            marks[array.ids.start:array.ids.stop] = b"\x01" * len(array.ids)
+        elif (name in index):
+            marks[index[name]] = 1
+
+    # Arrays are declared whole
+    for array in store.arrays.values():
+        ids = array.ids
+        if (any(marks[ids.start:ids.stop])):
+            marks[ids.start:ids.stop] = b"\x01" * len(ids)
+    return marks, names
+
+_AND = "/\\"
+_OR = "\\/"
+_ARITHMETIC = ["+", "-", "*", "/", "div", "mod"]
+_COMPARISONS = {"==": "==", "!=": "!=", "<": ">", "<=": ">=", ">": "<", ">=": "<="}
+_INT_MAX = 2 ** 63 - 1
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _is_constant(value) -> bool:
+    return isinstance(value, (int, float, bool))
+
+def _fold_operator(symbol: str, a, b):
+    """Evaluate a binary operator on two constants the way MiniZinc does,
+    None if it can't be evaluated at generate time."""
+    if (symbol in _COMPARISONS):
+        if (symbol == "=="): return a == b
+        if (symbol == "!="): return a != b
+        if (isinstance(a, bool) or isinstance(b, bool)): return None
+        if (symbol == "<"): return a < b
+        if (symbol == "<="): return a <= b
+        if (symbol == ">"): return a > b
+        if (symbol == ">="): return a >= b
+
+    if (not _is_number(a) or not _is_number(b)):
+        return None
+    if (symbol == "+"): return a + b
+    if (symbol == "-"): return a - b
+    if (symbol == "*"): return a * b
+    if (symbol == "/"):
+        if (b == 0 or not isinstance(a, float) or not isinstance(b, float)):
+            return None
+        return a / b
+    if (not isinstance(a, int) or not isinstance(b, int) or b == 0):
+        return None
+    if (symbol == "div"):
+        # MiniZinc rounds towards zero
+        q = abs(a) // abs(b)
+        return q if (a < 0) == (b < 0) else -q
+    if (symbol == "mod"):
+        # MiniZinc takes the sign of the dividend
+        r = abs(a) % abs(b)
+        return r if a >= 0 else -r
+    return None
+
+def _rebuild(node: Expression, args: tuple) -> Expression:
+    """Copy of `node` with new arguments, `node` itself if nothing changed."""
+    if (len(args) == len(node._args) and all(a is b for a, b in zip(args, node._args))):
+        return node
+    return node.__class__(node._symbol, node._kind, args)
+
+def _same(a, b) -> bool:
+    if (isinstance(a, Expression)):
+        return a.is_same(b)
+    return not isinstance(b, Expression) and type(a) is type(b) and a == b
+
+def _simplify_operator(node: Expression, args: tuple):
+    symbol = node._symbol
+    if (len(args) == 2):
+        a, b = args
+        if (_is_constant(a) and _is_constant(b)):
+            folded = _fold_operator(symbol, a, b)
+            if (folded is not None):
+                return folded
+
+        if (symbol == "+"):
+            if (_is_number(a) and a == 0): return b
+            if (_is_number(b) and b == 0): return a
+            # (e + c1) + c2 -> e + (c1 + c2)
+            if (_is_number(b) and isinstance(a, Expression) and a._kind == _OPERATOR
+                    and a._symbol == "+" and len(a._args) == 2 and _is_number(a._args[1])):
+                c = a._args[1] + b
+                return a._args[0] if c == 0 else node.__class__("+", _OPERATOR, (a._args[0], c))
+
+        elif (symbol == "-"):
+            if (_is_number(b) and b == 0): return a
+            if (_is_number(a) and a == 0):
+                if (isinstance(b, Expression) and b._kind == _PREFIX and b._symbol == "-"):
+                    return b._args[0]
+                return Expression._prefix("-", b)
+            if (_same(a, b) and isinstance(a, Expression)): return 0
+
+        elif (symbol == "*"):
+            if (_is_number(a) and a == 1): return b
+            if (_is_number(b) and b == 1): return a
+            if ((_is_number(a) and a == 0) or (_is_number(b) and b == 0)): return 0
+
+        elif (symbol == "div"):
+            if (_is_number(b) and b == 1): return a
+
+        elif (symbol in _COMPARISONS):
+            if (_same(a, b)):
+                return symbol in ["==", "<=", ">="]
+            # Constants on the right hand side: 5 < x -> x > 5
+            if (_is_constant(a) and isinstance(b, Expression)):
+                a, b = b, a
+                symbol = _COMPARISONS[symbol]
+            # Move constants of the left hand side over: x + 3 == 5 -> x == 2
+            if (_is_number(b) and isinstance(a, Expression) and a._kind == _OPERATOR
+                    and a._symbol in ["+", "-"] and len(a._args) == 2 and _is_number(a._args[1])):
+                c = a._args[1]
+                a, b = a._args[0], (b - c if a._symbol == "+" else b + c)
+            elif (_is_number(b) and isinstance(a, LinearExpression) and a._constant != 0):
+                a, b = LinearExpression(a._terms, 0), b - a._constant
+            if (symbol != node._symbol):
+                return node.__class__(symbol, _OPERATOR, (a, b))
+            return _rebuild(node, (a, b))
+
+        elif (symbol == "->"):
+            if (a is False or b is True): return True
+            if (a is True): return b
+
+        elif (symbol == "<-"):
+            if (a is True or b is False): return True
+            if (b is True): return a
+
+        elif (symbol == "<->"):
+            if (a is True): return b
+            if (b is True): return a
+
+        elif (symbol == "xor"):
+            if (a is False): return b
+            if (b is False): return a
+
+    if (symbol == _AND or symbol == _OR):
+        absorbing = symbol == _OR
+        items = []
+        for arg in args:
+            if (arg is absorbing):
+                return absorbing
+            if (arg is (not absorbing)):
+                continue
+            # Flatten nested conjunctions/disjunctions
+            if (isinstance(arg, Expression) and arg._kind == _OPERATOR and arg._symbol == symbol):
+                items.extend(arg._args)
+            else:
+                items.append(arg)
+        if (not items):
+            return not absorbing
+        if (len(items) == 1):
+            return items[0]
+        return _rebuild(node, tuple(items))
+
+    return _rebuild(node, args)
+
+def _simplify_func(node: Expression, args: tuple):
+    symbol = node._symbol
+    if (symbol in ["sum", "product"] and len(args) == 1 and isinstance(args[0], tuple)):
+        identity = 0 if symbol == "sum" else 1
+        total = identity
+        exprs = []
+        for arg in args[0]:
+            if (_is_number(arg)):
+                total = total + arg if symbol == "sum" else total * arg
+            else:
+                exprs.append(arg)
+        if (not exprs or (symbol == "product" and total == 0)):
+            return total
+        if (total == identity and len(exprs) == 1):
+            return exprs[0]
+        if (total != identity):
+            exprs.append(total)
+        return _rebuild(node, (tuple(exprs),))
+
+    if (symbol in ["min", "max"] and len(args) == 1 and isinstance(args[0], tuple)):
+        if (all(_is_number(arg) for arg in args[0])):
+            return min(args[0]) if symbol == "min" else max(args[0])
+        if (len(args[0]) == 1):
+            return args[0][0]
+
+    elif (symbol == "not" and len(args) == 1):
+        arg = args[0]
+        if (isinstance(arg, bool)):
+            return not arg
+        if (isinstance(arg, Expression) and arg._kind == _FUNC and arg._symbol == "not"):
+            return arg._args[0]
+
+    elif (symbol == "abs" and len(args) == 1):
+        arg = args[0]
+        if (_is_number(arg)):
+            return abs(arg)
+        if (isinstance(arg, Expression) and arg._kind == _FUNC and arg._symbol == "abs"):
+            return arg
+
+    elif (symbol == "pow" and len(args) == 2):
+        a, b = args
+        if (isinstance(b, int) and not isinstance(b, bool)):
+            if (b == 0): return 1
+            if (b == 1): return a
+            if (isinstance(a, int) and not isinstance(a, bool) and b > 0
+                    and abs(a).bit_length() * b <= _INT_MAX.bit_length()):
+                return a ** b
+
+    return _rebuild(node, args)
+
+def _simplify_node(node: Expression, args: tuple):
+    kind = node._kind
+    if (kind == _LINEAR):
+        # Terms are variables, only trivial sums can be reduced
+        if (not node._terms):
+            return node._constant
+        if (node._constant == 0 and len(node._terms) == 1):
+            var, coef = next(iter(node._terms.items()))
+            if (coef == 1):
+                return var
+        return node
+    if (kind == _OPERATOR):
+        return _simplify_operator(node, args)
+
+    if (kind == _FUNC):
+        return _simplify_func(node, args)
+
+    if (kind == _IFTHENELSE):
+        condition, expr1, expr2 = args
+        if (condition is True): return expr1
+        if (condition is False): return expr2
+        if (_same(expr1, expr2)): return expr1
+
+    elif (kind == _PREFIX and node._symbol == "-"):
+        arg = args[0]
+        if (_is_number(arg)):
+            return -arg
+        if (isinstance(arg, Expression) and arg._kind == _PREFIX and arg._symbol == "-"):
+            return arg._args[0]
+
+    return _rebuild(node, args)
+
+def _simplify_leaf(node: Expression):
+    # Raw integer text such as the "0" of an empty sum
+    if (not isinstance(node, Variable) and isinstance(node._symbol, str)):
+        text = node._symbol
+        if (text.isdigit() or (text[:1] == "-" and text[1:].isdigit())):
+            return int(text)
+    return node
+
+def _substitute(value, memo: dict):
+    if (isinstance(value, Expression)):
+        return memo[id(value)]
+    if (isinstance(value, tuple)):
+        return tuple(_substitute(v, memo) for v in value)
+    return value
+
+def _count_nodes(value) -> int:
+    count = 0
+    stack = [value]
+    while (stack):
+        item = stack.pop()
+        if (isinstance(item, Expression)):
+            stack.extend(item._args)
+        elif (isinstance(item, tuple)):
+            stack.extend(item)
+            continue
+        count += 1
+    return count
+
+def simplify(expr):
+    """Fold constants and remove identity terms of an expression tree.
+
+    The given tree is left untouched, changed nodes are copied. The result can
+    be a plain constant, e.g. `x * 0` becomes `0`.
+
+    Args:
+        expr (Expression): expression to simplify
+
+    Returns:
+        Expression: the simplified expression or constant
+    """
+    if (not isinstance(expr, Expression)):
+        return expr
+
+    memo = {}
+    stack = [(expr, False)]
+    while (stack):
+        node, expanded = stack.pop()
+        if (id(node) in memo):
+            continue
+
+        if (node._kind == _LEAF):
+            memo[id(node)] = _simplify_leaf(node)
+            continue
+
+        if (not expanded):
+            stack.append((node, True))
+            for arg in node._args:
+                for child in _value_expressions(arg):
+                    if (id(child) not in memo):
+                        stack.append((child, False))
+            continue
+
+        args = tuple(_substitute(arg, memo) for arg in node._args)
+        memo[id(node)] = _simplify_node(node, args)
+
+    return memo[id(expr)]
+
+def simplify_constraints(constraints: List[Constraint], objective: Expression=None):
+    """Simplify all constraints and the objective, constraints that become
+    `true` are dropped.
+
+    Args:
+        constraints (List[Constraint]): constraints of the model
+        objective (Expression): solve expression of the model, if any
+
+    Returns:
+        Tuple[List[Constraint], Expression, int]: the simplified constraints and objective,
+            and the number of removed nodes
+    """
+    removed = 0
+    simplified = []
+    for constraint in constraints:
+        cstr = simplify(constraint.cstr)
+        if (cstr is not constraint.cstr):
+            removed += _count_nodes(constraint.cstr) - _count_nodes(cstr)
+        if (cstr is True):
+            removed += 1
+            continue
+        if (cstr is not constraint.cstr):
+            constraint = copy.copy(constraint)
+            constraint.cstr = cstr
+        simplified.append(constraint)
+
+    if (objective is not None):
+        simplified_objective = simplify(objective)
+        if (simplified_objective is not objective):
+            removed += _count_nodes(objective) - _count_nodes(simplified_objective)
+        objective = simplified_objective
+
+    return simplified, objective, removed
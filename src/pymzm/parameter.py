@@ -0,0 +1,236 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .exceptions import *
+from .expression import *
+from .expression import _render
+from .variable import *
+from .misc import *
+
+class Parameter(Expression):
+    """Instance parameter: declared in the model without a value, e.g.
+    `int: n;`, and assigned per instance (see `Model.instance_data`). Use it in
+    expressions, as a variable bound or as the size of an `IndexSet`.
+    """
+    __slots__ = ("ptype",)
+
+    def __init__(self, name: str, ptype: str=Variable.VTYPE_INTEGER):
+        super().__init__(name)
+        if (ptype not in [Variable.VTYPE_INTEGER, Variable.VTYPE_BOOL]):
+            raise Exception("Invalid type for parameter. Currently only integer and boolean types are supported")
+        self.ptype = ptype
+
+    def _declaration(self) -> str:
+        return f"{self.ptype}: {self._symbol};\n"
+
+class ParameterBool(Parameter, ExpressionBool):
+    __slots__ = ()
+
+class IndexSet(Expression):
+    """Index set `0..size-1` of parametric arrays, declared as a named set,
+    e.g. `set of int: ITEMS = 0..(n - 1);`. Arrays over it are indexed from 0
+    like the other pymzm arrays, loops over it use its `index` objects.
+
+    Args:
+        name (str): name of the set
+        size (int | Expression): number of elements, usually a `Parameter`
+    """
+    __slots__ = ("size",)
+
+    def __init__(self, name: str, size):
+        super().__init__(name)
+        if (not isinstance(size, (int, Expression)) or isinstance(size, bool)):
+            raise PymzmValueIsNotExpression("size", size)
+        self.size = size
+
+    def index(self, name: str) -> "Index":
+        """Loop index ranging over the set, see `forall`, `exists` and `sum_over`."""
+        return Index(name, self)
+
+    def _declaration(self) -> str:
+        return f"set of int: {self._symbol} = 0..{_render(self.size - 1)};\n"
+
+class Index(Expression):
+    """Symbolic loop index over an `IndexSet`, only valid inside the
+    comprehension that binds it."""
+    __slots__ = ("index_set",)
+
+    def __init__(self, name: str, index_set: IndexSet):
+        super().__init__(name)
+        self.index_set = index_set
+
+class _ParametricArray(Expression):
+    """Array whose dimensions are index sets, referred to by name. Indexing
+    with ints, `Index` objects or expressions gives the element."""
+    __slots__ = ("index_sets", "element_class")
+
+    def __init__(self, name: str, index_sets: Tuple[IndexSet], element_class: type):
+        super().__init__(name)
+        self.index_sets = index_sets
+        self.element_class = element_class
+
+    @property
+    def ndim(self) -> int:
+        return len(self.index_sets)
+
+    def __getitem__(self, key):
+        key = key if isinstance(key, tuple) else (key,)
+        if (len(key) != self.ndim):
+            raise PymzmInvalidShape("key", f"{len(key)} indices for an array of {self.ndim} dimensions")
+        for index in key:
+            if (not isinstance(index, (int, Expression)) or isinstance(index, bool)):
+                raise PymzmValueIsNotExpression("key", index)
+        return self.element_class._index(self._symbol, [int(i) if isinstance(i, int) else i for i in key])
+
+    def __iter__(self):
+        raise TypeError(f"The size of \"{self._symbol}\" is given by the instance data, loop over it with an Index")
+
+    def _index_sets(self) -> str:
+        return ", ".join(str(index_set) for index_set in self.index_sets)
+
+class ParameterArray(_ParametricArray):
+    """Array of instance data over index sets, e.g. `array[ITEMS] of int: sizes;`."""
+    __slots__ = ("ptype",)
+
+    def __init__(self, name: str, index_sets: Tuple[IndexSet], ptype: str=Variable.VTYPE_INTEGER):
+        if (ptype not in [Variable.VTYPE_INTEGER, Variable.VTYPE_BOOL]):
+            raise Exception("Invalid type for parameter. Currently only integer and boolean types are supported")
+        super().__init__(name, index_sets, ExpressionBool if ptype == Variable.VTYPE_BOOL else Expression)
+        self.ptype = ptype
+
+    def _declaration(self) -> str:
+        return f"array[{self._index_sets()}] of {self.ptype}: {self._symbol};\n"
+
+class ParametricVariableArray(_ParametricArray):
+    """Array of decision variables over index sets, declared as one MiniZinc
+    array, e.g. `array[ITEMS] of var 0..cap: load;`. The bounds can be
+    parameters. Its solution value is the nested list of the element values.
+    """
+    __slots__ = ("vtype", "val_min", "val_max", "domain")
+
+    def __init__(self, name: str, index_sets: Tuple[IndexSet], vtype: str=Variable.VTYPE_INTEGER, val_min=None, val_max=None, domain=None):
+        if (vtype not in [Variable.VTYPE_INTEGER, Variable.VTYPE_BOOL]):
+            raise PymzmInvalidVariableError(name, "parametric arrays are integer or boolean")
+        super().__init__(name, index_sets, ExpressionBool if vtype == Variable.VTYPE_BOOL else Expression)
+        self.vtype = vtype
+        self.val_min = val_min
+        self.val_max = val_max
+        self.domain = None if domain is None else Domain(domain)
+
+    def _element_type(self) -> str:
+        if (self.vtype == Variable.VTYPE_BOOL):
+            return "var bool"
+        if (self.domain is not None):
+            return f"var {self.domain}"
+        if (self.val_min is not None and self.val_max is not None):
+            return f"var {_render(self.val_min)}..{_render(self.val_max)}"
+        return "var int"
+
+    def _declaration(self) -> str:
+        mz = f"array[{self._index_sets()}] of {self._element_type()}: {self._symbol};\n"
+        if (self.domain is None and (self.val_min is None) != (self.val_max is None)):
+            # One-sided bound on every element
+            indices = [index_set.index(f"pymzm_i{d}") for d, index_set in enumerate(self.index_sets)]
+            bound = self[tuple(indices)] >= self.val_min if self.val_min is not None else self[tuple(indices)] <= self.val_max
+            mz += f"constraint {_render(forall(indices, bound))};\n"
+        return mz
+
+def _comprehension(func: str, cls: type, indices, expr):
+    indices = [indices] if isinstance(indices, Index) else list(indices)
+    if (not indices or not all(isinstance(index, Index) for index in indices)):
+        raise PymzmValueIsNotExpression("indices", indices)
+    generators = ", ".join(f"{index} in {index.index_set}" for index in indices)
+    return cls._generator(func, generators, expr)
+
+def forall(indices, condition: ExpressionBool) -> ExpressionBool:
+    """The condition holds for every value of the indices, e.g.
+    `forall(i, load[i] <= cap)` is `forall(i in ITEMS)(load[i] <= cap)`.
+
+    Args:
+        indices (Index | List[Index]): loop indices, see `IndexSet.index`
+        condition (ExpressionBool): condition in terms of the indices
+
+    Returns:
+        ExpressionBool: the conjunction over the index sets
+    """
+    if (not isinstance(condition, ExpressionBool)):
+        raise PymzmValueIsNotCondition("condition", condition)
+    return _comprehension("forall", ExpressionBool, indices, condition)
+
+def exists(indices, condition: ExpressionBool) -> ExpressionBool:
+    """The condition holds for some value of the indices, see `forall`."""
+    if (not isinstance(condition, ExpressionBool)):
+        raise PymzmValueIsNotCondition("condition", condition)
+    return _comprehension("exists", ExpressionBool, indices, condition)
+
+def sum_over(indices, expr: Expression) -> Expression:
+    """Sum of the expression over every value of the indices, e.g.
+    `sum_over(j, x[i, j] * sizes[j])` is `sum(j in ITEMS)(x[i, j] * sizes[j])`.
+
+    Args:
+        indices (Index | List[Index]): loop indices, see `IndexSet.index`
+        expr (Expression): term in terms of the indices
+
+    Returns:
+        Expression: the sum over the index sets
+    """
+    if (not isinstance(expr, (Expression, int, float))):
+        raise PymzmValueIsNotExpression("expr", expr)
+    return _comprehension("sum", Expression, indices, expr)
+
+def _size_value(size, values: dict):
+    if (isinstance(size, int)):
+        return size
+    if (isinstance(size, Parameter)):
+        return values.get(size._symbol)
+    return None
+
+def parameter_data(parameters: list, values: dict) -> str:
+    """dzn assignments of the parameters. Index set sizes that are parameters
+    can be left out when an array over the set is given, they are taken from
+    its shape.
+
+    Args:
+        parameters (list): `Parameter`, `IndexSet` and `ParameterArray` declarations
+        values (dict): parameter name -> value
+
+    Returns:
+        str: the assignments
+
+    Raises:
+        PymzmParameterError: a parameter is missing, unknown or has the wrong shape
+    """
+    values = dict(values)
+    declared = {p._symbol: p for p in parameters if isinstance(p, (Parameter, ParameterArray))}
+    for name in values:
+        if (name not in declared):
+            raise PymzmParameterError(name, "is not a parameter of the model")
+
+    # Sizes of the index sets from the array shapes
+    arrays = {}
+    for name, parameter in declared.items():
+        if (isinstance(parameter, ParameterArray) and name in values):
+            arrays[name] = np.asarray(values[name])
+            if (arrays[name].ndim != parameter.ndim):
+                raise PymzmParameterError(name, f"has {arrays[name].ndim} dimensions, expected {parameter.ndim}")
+            for index_set, d in zip(parameter.index_sets, arrays[name].shape):
+                if (isinstance(index_set.size, Parameter)):
+                    values.setdefault(index_set.size._symbol, d)
+
+    lines = []
+    for name, parameter in declared.items():
+        if (name not in values):
+            raise PymzmParameterError(name, "has no value")
+        if (isinstance(parameter, Parameter)):
+            value = values[name]
+            lines.append(f"{name} = {str(value).lower() if isinstance(value, (bool, np.bool_)) else int(value)};\n")
+            continue
+
+        array = arrays[name]
+        sizes = [_size_value(index_set.size, values) for index_set in parameter.index_sets]
+        if (any(size is not None and size != d for size, d in zip(sizes, array.shape))):
+            raise PymzmParameterError(name, f"has shape {array.shape}, expected {tuple(sizes)}")
+        ranges = ", ".join(f"0..{d - 1}" for d in array.shape)
+        lines.append(f"{name} = array{array.ndim}d({ranges}, {array_to_mz(array.reshape(-1))});\n")
+    return "".join(lines)
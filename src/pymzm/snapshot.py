@@ -0,0 +1,460 @@
+import json
+import numbers
+import operator
+import os
+import struct
+from array import array
+
+import numpy as np
+
+from .exceptions import *
+from .expression import *
+from .expression import _LINEAR
+from .variable import *
+from .variable import _Family
+from .expression_array import _grid_positions
+from .constraint import *
+from .constant import *
+from .model import *
+
+# Snapshot layout: magic, version, number of blocks, then each block as its
+# length followed by its bytes. Block 0 is the JSON metadata, the others are
+# raw typed arrays read with `frombytes`.
+SNAPSHOT_MAGIC = b"PYMZMSNP"
+SNAPSHOT_VERSION = 2
+_HEADER = struct.Struct("<8sHI")
+_LENGTH = struct.Struct("<Q")
+
+# Tokens of node arguments: (tag, payload) pairs in one int64 array
+_T_NODE, _T_VAR, _T_INT, _T_FLOAT, _T_BOOL, _T_STR, _T_NONE, _T_TUPLE, _T_BIGINT = range(9)
+_INT64 = (-2 ** 63, 2 ** 63 - 1)
+
+# Node classes
+_NODE_CLASSES = [Expression, ExpressionBool, LinearExpression]
+
+_STORE_ARRAYS = ["vtypes", "val_min", "val_max", "bounded", "name_offsets", "family_ids"]
+
+class _Strings:
+    """Table of the distinct strings of a snapshot."""
+    def __init__(self, strings: list=None):
+        self.strings = [] if strings is None else strings
+        self.ids = {}
+
+    def id(self, value: str) -> int:
+        i = self.ids.get(value)
+        if (i is None):
+            i = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return i
+
+class _TreeWriter:
+    """Flattens expression trees into a node table. Nodes are numbered when
+    first reached from their parent, so a node comes before its children and
+    the table is rebuilt back to front. Shared subtrees are written once."""
+    def __init__(self, store: VariableStore, strings: _Strings):
+        self.store = store
+        self.strings = strings
+        self.ids = {}   # id(node) -> position
+        self.nodes = [] # in order of position, keeps the ids valid
+        self.kinds = array("b")
+        self.classes = array("b")
+        self.symbols = array("q")
+        self.offsets = array("q")
+        self.tokens = array("q")
+        self.values = array("q") # tokens of the values outside the table, e.g. constraints
+        self.written = 0
+
+    def value(self, value):
+        """Append the tokens of a value, e.g. a constraint, to `values`."""
+        self._encode(value, self.values)
+        # Write the nodes reached, their children are numbered on the way
+        nodes = self.nodes
+        while (self.written < len(nodes)):
+            node = nodes[self.written]
+            self.written += 1
+            self.kinds.append(node._kind)
+            self.classes.append(2 if isinstance(node, LinearExpression) else int(isinstance(node, ExpressionBool)))
+            self.symbols.append(-1 if node._symbol is None else self.strings.id(node._symbol))
+            self.offsets.append(len(self.tokens))
+            self._encode(node._args, self.tokens)
+
+    def _encode(self, value, tokens: array):
+        cls = type(value)
+        if (cls is Variable or cls is VariableBool):
+            if (value._store is not self.store):
+                raise PymzmSnapshotError(f"variable {value.name} belongs to another model")
+            tokens.extend((_T_VAR, value._id))
+        elif (cls is int):
+            if (_INT64[0] <= value <= _INT64[1]):
+                tokens.extend((_T_INT, value))
+            else:
+                tokens.extend((_T_BIGINT, self.strings.id(str(value))))
+        elif (cls is tuple):
+            tokens.extend((_T_TUPLE, len(value)))
+            for v in value:
+                self._encode(v, tokens)
+        elif (isinstance(value, Expression)):
+            if (isinstance(value, Variable)):
+                raise PymzmSnapshotError(f"variable class {cls.__name__} can't be written")
+            i = self.ids.get(id(value))
+            if (i is None):
+                i = self.ids[id(value)] = len(self.nodes)
+                self.nodes.append(value)
+            tokens.extend((_T_NODE, i))
+        elif (cls is float):
+            tokens.extend((_T_FLOAT, struct.unpack("<q", struct.pack("<d", value))[0]))
+        elif (cls is str):
+            tokens.extend((_T_STR, self.strings.id(value)))
+        elif (cls is bool):
+            tokens.extend((_T_BOOL, int(value)))
+        elif (value is None):
+            tokens.extend((_T_NONE, 0))
+        else:
+            raise PymzmSnapshotError(f"{value!r} (type={cls}) can't be written")
+
+class _TreeReader:
+    """Rebuilds the nodes written by `_TreeWriter`, children before their parents."""
+    def __init__(self, handles: list, strings: list, kinds, classes, symbols, offsets, tokens, values):
+        self.handles = handles
+        self.strings = strings
+        count = len(kinds)
+        new = Expression.__new__
+        self.nodes = [new(_NODE_CLASSES[c]) for c in classes]
+        self.values = values
+        self.position = 0
+        if (not count):
+            return
+
+        # Python value of every (tag, payload) pair, filled per tag with bulk copies
+        pairs = np.frombuffer(tokens, dtype=np.int64).reshape(-1, 2)
+        tags, payloads = pairs[:, 0], pairs[:, 1]
+        items = np.empty(len(pairs), dtype=object)
+        mask = tags == _T_VAR
+        if (mask.any()):
+            # Only the variables referred to get a handle
+            ids, positions = np.unique(payloads[mask], return_inverse=True)
+            variables = np.empty(len(ids), dtype=object)
+            for k, i in enumerate(ids.tolist()):
+                variables[k] = handles[i]
+            items[mask] = variables[positions]
+        for tag, table in [(_T_NODE, self.nodes), (_T_STR, strings)]:
+            mask = tags == tag
+            if (mask.any()):
+                items[mask] = np.fromiter(table, dtype=object, count=len(table))[payloads[mask]]
+        for tag, convert in [(_T_INT, lambda p: p), (_T_FLOAT, lambda p: p.view(np.float64)), (_T_BOOL, lambda p: p != 0)]:
+            mask = tags == tag
+            items[mask] = convert(payloads[mask]).tolist()
+        mask = tags == _T_BIGINT
+        items[mask] = [int(strings[p]) for p in payloads[mask]]
+
+        # Nodes whose arguments hold no nested tuple are sliced out directly,
+        # the others are decoded token by token
+        starts = np.frombuffer(offsets, dtype=np.int64) // 2
+        ends = np.append(starts[1:], len(pairs))
+        tuples = np.concatenate(([0], np.cumsum(tags == _T_TUPLE)))
+        flat = ((tuples[ends] - tuples[starts]) == 1).tolist()
+        nodes = self.nodes
+        items = items.tolist()
+        for i, start, end in zip(reversed(range(count)), reversed(starts.tolist()), reversed(ends.tolist())):
+            if (flat[i]):
+                args = tuple(items[start + 1:end])
+            else:
+                args, _ = self._decode(tokens, 2 * start)
+            node = nodes[i]
+            node._hash = None
+            if (classes[i] == 2):
+                # args: var1, coef1, var2, coef2, ..., constant
+                node._kind = _LINEAR
+                node._symbol = "+"
+                node._terms = dict(zip(args[0:-1:2], args[1:-1:2]))
+                node._constant = args[-1]
+            else:
+                node._kind = kinds[i]
+                node._symbol = None if symbols[i] == -1 else strings[symbols[i]]
+                node._args = args
+
+    def value(self):
+        """Next value of `values`."""
+        value, self.position = self._decode(self.values, self.position)
+        return value
+
+    def _decode(self, tokens, i: int):
+        tag = tokens[i]
+        payload = tokens[i + 1]
+        i += 2
+        if (tag == _T_VAR):
+            return self.handles[payload], i
+        if (tag == _T_INT):
+            return payload, i
+        if (tag == _T_TUPLE):
+            values = []
+            for _ in range(payload):
+                value, i = self._decode(tokens, i)
+                values.append(value)
+            return tuple(values), i
+        if (tag == _T_NODE):
+            return self.nodes[payload], i
+        if (tag == _T_FLOAT):
+            return struct.unpack("<d", struct.pack("<q", payload))[0], i
+        if (tag == _T_STR):
+            return self.strings[payload], i
+        if (tag == _T_BOOL):
+            return bool(payload), i
+        if (tag == _T_BIGINT):
+            return int(self.strings[payload]), i
+        return None, i
+
+def _plain(value):
+    """Index value as JSON, tuples are tagged to tell them from lists."""
+    if (isinstance(value, tuple)):
+        return {"t": [_plain(v) for v in value]}
+    if (isinstance(value, (numbers.Integral, np.integer)) and not isinstance(value, (bool, np.bool_))):
+        return operator.index(value) # NumPy integers
+    if (value is None or isinstance(value, (bool, float, str))):
+        return value
+    raise PymzmSnapshotError(f"index {value!r} (type={type(value)}) can't be written")
+
+def _unplain(value):
+    if (isinstance(value, dict)):
+        return tuple(_unplain(v) for v in value["t"])
+    return value
+
+def _search_meta(method, store: VariableStore):
+    if (method is None):
+        return None
+    if (isinstance(method, SeqSearch)):
+        return {"seq": [_search_meta(sa, store) for sa in method.search_annotations]}
+    return {
+        "cls": type(method).__name__,
+        "search_type": method.search_type,
+        "variables": [v._id for v in method.variables],
+        "varchoice": method.varchoice,
+        "valchoice": method.valchoice,
+    }
+
+def _search_load(meta, handles: list):
+    if (meta is None):
+        return None
+    if ("seq" in meta):
+        method = SeqSearch.__new__(SeqSearch)
+        method.search_annotations = [_search_load(sa, handles) for sa in meta["seq"]]
+        return method
+    cls = {c.__name__: c for c in [SearchAnnotation, IntSearch, BoolSearch, SetSearch]}[meta["cls"]]
+    method = cls.__new__(cls)
+    method.search_type = meta["search_type"]
+    method.variables = [handles[i] for i in meta["variables"]]
+    method.varchoice = meta["varchoice"]
+    method.valchoice = meta["valchoice"]
+    return method
+
+def _restart_meta(strategy):
+    if (strategy is None):
+        return None
+    return {"cls": type(strategy).__name__, **vars(strategy)}
+
+def _restart_load(meta):
+    if (meta is None):
+        return None
+    classes = [RestartStrategy, RestartConstant, RestartLinear, RestartGeometric, RestartLuby]
+    cls = {c.__name__: c for c in classes}[meta.pop("cls")]
+    strategy = cls.__new__(cls)
+    strategy.__dict__.update(meta)
+    return strategy
+
+def save_snapshot(model: Model, fp):
+    """Write the model as a versioned binary snapshot: the variables, constants,
+    constraint trees and solve settings. Generated text, instance data and files
+    added to the underlying `minizinc.Model` are not part of it.
+
+    Args:
+        model (Model): the model
+        fp (str | BinaryIO): path or binary stream
+    """
+    if (isinstance(fp, (str, os.PathLike))):
+        with open(fp, "wb") as f:
+            return save_snapshot(model, f)
+
+    if (model.parameters or model.parametric_arrays):
+        raise PymzmSnapshotError("parametric models can't be saved")
+    store = model.store
+    strings = _Strings()
+    trees = _TreeWriter(store, strings)
+    blocks = []
+
+    # Domains are written once, each variable refers to its domain by position
+    domain_ids = {}
+    domain_of = array("q")
+    for i, domain in store.domains.items():
+        domain_of.extend((i, domain_ids.setdefault(domain, len(domain_ids))))
+
+    constants = []
+    for constant in model.constants:
+        meta = {"name": constant.name, "vtype": constant.vtype, "shape": constant.shape}
+        if (constant.shape is None):
+            meta["value"] = constant._data_value()
+        else:
+            values = np.ascontiguousarray(constant.value)
+            meta["dtype"] = values.dtype.str
+            meta["block"] = len(blocks) + 1
+            blocks.append(values.tobytes())
+        constants.append(meta)
+
+    constraints = []
+    for c in model.constraints:
+        trees.value(c.cstr)
+        constraints.append([c.ctype, c.annotation, c.is_redundant])
+    if (model.solve_expression is not None):
+        trees.value(model.solve_expression)
+
+    meta = {
+        "store": {
+            "renamed": [[i, name] for i, name in store.renamed.items()],
+            "renames": store.renames,
+            "domains": [[list(interval) for interval in domain.intervals] for domain in domain_ids],
+            "float_bounds": [[i, lo, hi] for i, (lo, hi) in store.float_bounds.items()],
+            "families": [
+                [f.name, f.ids.start, f.ids.stop, None if f.indices is None else [_plain(idx) for idx in f.indices],
+                 None if f.array is None else f.array.name]
+                for f in store.families
+            ],
+            "declarations": [
+                [d.start, d.stop] if isinstance(d, range) else d.name
+                for d in store.declarations
+            ],
+            "arrays": [
+                [a.name, a.vtype, a.val_min, a.val_max, None if a.domain is None else domain_ids[a.domain]]
+                for a in store.arrays.values()
+            ],
+        },
+        "family_copies": [
+            [name, vtype, ids.start, ids.stop, list(shape)]
+            for name, vtype, _, ids, shape in model.family_copies.copies.values()
+        ],
+        "constants": constants,
+        "constraints": constraints,
+        "global_constraints": sorted(model.global_constraints),
+        "solve": {
+            "criteria": model.solve_criteria,
+            "expression": model.solve_expression is not None,
+            "method": _search_meta(model.solve_method, store),
+            "restart": _restart_meta(getattr(model, "restart_strategy", None)),
+        },
+    }
+    # The string table is complete once every tree is written
+    meta["strings"] = strings.strings
+
+    raw = [getattr(store, name).tobytes() for name in _STORE_ARRAYS]
+    raw += [bytes(store.names), domain_of.tobytes()]
+    raw += [table.tobytes() for table in [trees.kinds, trees.classes, trees.symbols, trees.offsets, trees.tokens, trees.values]]
+    meta["raw"] = len(blocks) + 1
+    blocks = [json.dumps(meta).encode()] + blocks + raw
+
+    fp.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(blocks)))
+    for block in blocks:
+        fp.write(_LENGTH.pack(len(block)))
+        fp.write(block)
+
+def load_snapshot(fp) -> Model:
+    """Read a model written by `save_snapshot`. The file is read at once and the
+    variable arrays, node table and constant arrays are restored by bulk copies.
+
+    Args:
+        fp (str | BinaryIO): path or binary stream
+
+    Returns:
+        Model: the model, ready to `generate`
+    """
+    if (isinstance(fp, (str, os.PathLike))):
+        with open(fp, "rb") as f:
+            return load_snapshot(f)
+
+    data = memoryview(fp.read())
+    if (len(data) < _HEADER.size):
+        raise PymzmSnapshotError("not a pymzm snapshot")
+    magic, version, count = _HEADER.unpack_from(data)
+    if (magic != SNAPSHOT_MAGIC):
+        raise PymzmSnapshotError("not a pymzm snapshot")
+    if (version != SNAPSHOT_VERSION):
+        raise PymzmSnapshotError(f"snapshot version {version} is not supported, expected {SNAPSHOT_VERSION}")
+
+    blocks = []
+    offset = _HEADER.size
+    for _ in range(count):
+        (length,) = _LENGTH.unpack_from(data, offset)
+        offset += _LENGTH.size
+        blocks.append(data[offset:offset + length])
+        offset += length
+
+    meta = json.loads(bytes(blocks[0]))
+    raw = iter(blocks[meta["raw"]:])
+    model = Model()
+    store = model.store
+
+    # Variables
+    for name in _STORE_ARRAYS:
+        values = array(getattr(store, name).typecode)
+        values.frombytes(next(raw))
+        setattr(store, name, values)
+    store.names = bytearray(next(raw))
+    domain_of = array("q")
+    domain_of.frombytes(next(raw))
+    domains = [Domain.from_intervals(intervals) for intervals in meta["store"]["domains"]]
+    store.shared_domains = {domain: domain for domain in domains}
+    store.domains = {i: domains[d] for i, d in zip(domain_of[0::2], domain_of[1::2])}
+    store.renamed = {i: name for i, name in meta["store"]["renamed"]}
+    store.renames = meta["store"]["renames"]
+    store.float_bounds = {i: (lo, hi) for i, lo, hi in meta["store"]["float_bounds"]}
+
+    arrays = {}
+    for name, vtype, val_min, val_max, domain in meta["store"]["arrays"]:
+        array_ = VariableArray.__new__(VariableArray)
+        array_.name, array_.vtype, array_.val_min, array_.val_max = name, vtype, val_min, val_max
+        array_.domain = None if domain is None else domains[domain]
+        array_.store = store
+        array_._variables = None
+        array_._rendered = None
+        arrays[name] = array_
+    for name, start, stop, indices, array_name in meta["store"]["families"]:
+        indices = None if indices is None else [_unplain(idx) for idx in indices]
+        family_array = None if array_name is None else arrays[array_name]
+        store.families.append(_Family(name, range(start, stop), indices, family_array))
+        if (family_array is not None):
+            family_array.indices = indices
+            family_array.cells, family_array.shape = _grid_positions(indices, "indices")
+            family_array.ids = range(start, stop)
+            store.arrays[array_name] = family_array
+    store.declarations = [
+        range(*d) if isinstance(d, list) else arrays[d]
+        for d in meta["store"]["declarations"]
+    ]
+
+    # Expression trees
+    tables = []
+    for typecode in ["b", "b", "q", "q", "q", "q"]:
+        table = array(typecode)
+        table.frombytes(next(raw))
+        tables.append(table)
+    trees = _TreeReader(store.handles, meta["strings"], *tables)
+
+    # Constants
+    for constant in meta["constants"]:
+        if (constant["shape"] is None):
+            value = constant["value"]
+        else:
+            value = np.frombuffer(blocks[constant["block"]], dtype=np.dtype(constant["dtype"])).reshape(constant["shape"]).copy()
+        model.add_constant(constant["name"], value, constant["vtype"])
+
+    for name, vtype, start, stop, shape in meta["family_copies"]:
+        key = (start, tuple(shape))
+        model.family_copies.copies[key] = (name, vtype, store, range(start, stop), tuple(shape))
+
+    for ctype, annotation, is_redundant in meta["constraints"]:
+        model.constraints.append(Constraint(trees.value(), ctype, annotation, is_redundant))
+    model.global_constraints = set(meta["global_constraints"])
+
+    solve = meta["solve"]
+    model.solve_criteria = solve["criteria"]
+    model.solve_expression = trees.value() if solve["expression"] else None
+    model.solve_method = _search_load(solve["method"], store.handles)
+    model.restart_strategy = _restart_load(solve["restart"])
+    return model
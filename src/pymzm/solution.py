@@ -0,0 +1,38 @@
+class Solution:
+    """Solution values of a model, used as the `output_type` of models with
+    array families.
+
+    MiniZinc reports an array family as one nested list, the values of its
+    elements are also available by their flat names, e.g. `solution.x_1_2`
+    for `x[2, 3]`.
+    """
+    _store = None # VariableStore resolving the flat names
+
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+    @classmethod
+    def _for_store(cls, store) -> type:
+        """Solution class resolving the flat names of the arrays in `store`."""
+        return type(cls.__name__, (cls,), {"_store": store})
+
+    def __getattr__(self, name):
+        store = type(self)._store
+        i = None if store is None else store._name_index().get(name)
+        if (i is None):
+            raise AttributeError(name)
+        family = store.families[store.family_ids[i]]
+        if (family.array is None):
+            raise AttributeError(name)
+
+        value = self.__dict__[family.array.name]
+        for p in family.array.cells[i - family.ids.start]:
+            value = value[p]
+        return value
+
+    def __repr__(self):
+        values = ", ".join(f"{k}={v!r}" for k, v in self.__dict__.items() if not k.startswith("_"))
+        return f"Solution({values})"
+
+    def __str__(self):
+        return self.__dict__.get("_output_item") or repr(self)
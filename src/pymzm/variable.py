@@ -1,13 +1,35 @@
 
+import operator
+from array import array
+from itertools import repeat
+from typing import List, Tuple
+
+import numpy as np
+
 from .expression import *
+from .expression import _LEAF, _traces
 from .exceptions import *
 from .misc import *
+from .domain import *
+from .expression_array import *
+from .expression_array import _grid_positions, _is_symbolic_key, _FamilyCopies
 
 class ValueDict(dict):
     def __iter__(self):
         for v in self.values():
             yield v
 
+    def __missing__(self, key):
+        # Symbolic indices of a traced loop body (see `Model.forall`)
+        if (_traces and _is_symbolic_key(key)):
+            array, lows = _traces[-1].family(self)
+            return _traces[-1].element(array, key, lows)
+        raise KeyError(key)
+
+    def to_array(self) -> ExpressionArray:
+        """Values as an `ExpressionArray` with one dimension per index position."""
+        return ExpressionArray.from_dict(self)
+
     def __str__(self):
         return variableIterable2Str(self)
     
@@ -64,6 +86,13 @@ class ValueDict(dict):
         return [s >= other for s in self]
     
 class Variable(Expression):
+    """Handle of a variable in a `VariableStore`.
+
+    The name, type, bounds and domain live in the typed arrays of the store,
+    the handle itself only holds the store and its position in it.
+    """
+    __slots__ = ("_store", "_id")
+
     VTYPES = [
         VTYPE_INTEGER,
         VTYPE_FLOAT,
@@ -77,62 +106,62 @@ class Variable(Expression):
         "string",
         "set"
     ]
-    def __init__(self, name: str, vtype: int=VTYPE_INTEGER, val_min: int=None, val_max: int=None, domain=None):
-        self.name = name
-        self.vtype = vtype
-        self.val_min = val_min
-        self.val_max = val_max
-        self.domain = domain
+    def __new__(cls, name: str=None, vtype: int=VTYPE_INTEGER, *args, **kwargs):
+        # Boolean variables are `ExpressionBool`s
+        return Expression.__new__(VariableBool if vtype == Variable.VTYPE_BOOL else cls)
 
-        if (vtype == Variable.VTYPE_INTEGER or vtype == Variable.VTYPE_SET):
-            if (domain is None):
-                assert self.val_min is not None
-                assert self.val_max is not None
+    def __init__(self, name: str, vtype: int=VTYPE_INTEGER, val_min: int=None, val_max: int=None, domain=None, store: "VariableStore"=None):
+        if (store is None):
+            store = VariableStore()
+        ids = store._add([name], vtype, val_min, val_max, None if domain is None else [domain], family=name)
+        self._bind(store, ids.start)
+        store.handles.created[ids.start] = self
 
-            else:
-                assert self.val_min is None
-                assert self.val_max is None
-                #assert isinstance(domain, set)
-                self.domain = set(domain)
-                assert len(self.domain) > 0
+    def _bind(self, store: "VariableStore", i: int):
+        self._kind = _LEAF
+        self._args = ()
+        self._hash = None
+        self._store = store
+        self._id = i
 
-        elif (vtype == Variable.VTYPE_FLOAT):
-            assert self.domain is None
-            assert self.val_min is not None
-            assert self.val_max is not None
+    # Every variable is a distinct leaf, hashing by identity keeps the
+    # coefficient maps of linear expressions fast
+    __hash__ = object.__hash__
+
+    @property
+    def _symbol(self):
+        return self._store.name(self._id)
+
+    @property
+    def name(self) -> str:
+        return self._store.name(self._id)
+
+    @name.setter
+    def name(self, name: str):
+        self._store.rename(self._id, name)
+        self._hash = None
+
+    @property
+    def vtype(self) -> str:
+        return Variable.VTYPES[self._store.vtypes[self._id]]
+
+    @property
+    def val_min(self):
+        return self._store.bounds(self._id)[0]
+
+    @property
+    def val_max(self):
+        return self._store.bounds(self._id)[1]
+
+    @property
+    def domain(self) -> Domain:
+        return self._store.domains.get(self._id)
 
-        elif (vtype == Variable.VTYPE_BOOL):
-            assert self.val_min is None or self.val_min == 0
-            assert self.val_max is None or self.val_max == 1
-            self.val_min = 0
-            self.val_max = 1
-            self.__class__ = VariableBool
-        elif (vtype == Variable.VTYPE_STRING):
-            raise NotImplementedError()
-        else:
-            raise Exception(f"Invalid variable type vtype={vtype}")
-    
     def __str__(self):
         return self.name
 
     def _to_mz(self):
-        if (self.vtype == Variable.VTYPE_BOOL):
-            return f"var bool: {self.name};\n"
-        
-        elif (self.vtype == Variable.VTYPE_INTEGER):
-            if (self.domain is None):
-                return f"var {self.val_min}..{self.val_max}: {self.name};\n"
-            else:
-                return f"var {self.domain}: {self.name};\n"
-            
-        elif (self.vtype == Variable.VTYPE_FLOAT):
-            return f"var {self.val_min}..{self.val_max}: {self.name};\n"
-            
-        elif (self.vtype == Variable.VTYPE_SET):
-            if (self.domain is None):
-                return f"var set of {self.val_min}..{self.val_max}: {self.name};\n"
-            else:
-                return f"var set of {self.domain}: {self.name};\n"
+        return self._store._declaration(self._id)
 
     def __len__(self):
         assert self.vtype == Variable.VTYPE_SET
@@ -150,13 +179,510 @@ class Variable(Expression):
     
     def contains(self, content):
         assert self.vtype == Variable.VTYPE_SET
-        return ExpressionBool(f"({content} in {self})")
+        return ExpressionBool._operator("in", [content, self])
     
     @staticmethod
     def intersection_length(v1, v2):
         assert v1.vtype == Variable.VTYPE_SET
         assert v2.vtype == Variable.VTYPE_SET
-        return Expression(f"(card({v1} intersect {v2}))")
+        return Expression._func("card", [Expression._operator("intersect", [v1, v2])])
     
-class VariableBool(ExpressionBool, Variable):
-    pass
\ No newline at end of file
+class VariableBool(Variable, ExpressionBool):
+    __slots__ = ()
+
+class VariableStore:
+    """Struct-of-arrays storage of the variables of a model.
+
+    Types, bounds and name offsets are kept in contiguous typed arrays indexed
+    by the variable id, names in one byte buffer. Domains, float bounds and
+    renamed variables are rare and kept in dicts. Whole families are added in
+    bulk with `add_family`.
+
+    `lookup` maps the names in solver output back to the family and index of
+    a variable through a name -> id index built on first use. The `Variable`
+    handles are only made when a variable is used, see `_Handles`.
+    """
+    def __init__(self):
+        self.vtypes = array("b")
+        self.val_min = array("q")
+        self.val_max = array("q")
+        self.bounded = array("b")    # id -> _HAS_MIN | _HAS_MAX
+        self.name_offsets = array("q", [0])
+        self.names = bytearray()
+        self.renamed = {}       # id -> name
+        self.renames = 0        # number of renames, invalidates rendered text
+        self.domains = {}       # id -> Domain
+        self.shared_domains = {} # Domain -> the equal Domain all variables refer to
+        self.float_bounds = {}  # id -> (val_min, val_max)
+        self.handles = _Handles(self) # id -> Variable
+        self.declarations = []  # range of scalar variables or VariableArray, in order
+        self.families = []      # _Family records, in order
+        self.family_ids = array("q") # id -> position in families
+        self.arrays = {}        # name -> VariableArray
+        self.family_copies = _FamilyCopies() # families indexed by comprehensions
+        self._index = {}        # name -> id, up to id _indexed
+        self._indexed = 0
+        self._rendered = {}     # first id of a declaration -> (stop, domain names, renames, text)
+
+    def __len__(self):
+        return len(self.vtypes)
+
+    @staticmethod
+    def _check(vtype: str, val_min, val_max, domain):
+        if (vtype == Variable.VTYPE_INTEGER or vtype == Variable.VTYPE_SET):
+            if (domain is None):
+                assert val_min is not None
+                assert val_max is not None
+
+            else:
+                assert val_min is None
+                assert val_max is None
+                assert len(domain) > 0
+
+        elif (vtype == Variable.VTYPE_FLOAT):
+            assert domain is None
+            assert val_min is not None
+            assert val_max is not None
+
+        elif (vtype == Variable.VTYPE_BOOL):
+            assert val_min is None or val_min == 0
+            assert val_max is None or val_max == 1
+        elif (vtype == Variable.VTYPE_STRING):
+            raise NotImplementedError()
+        else:
+            raise Exception(f"Invalid variable type vtype={vtype}")
+
+    @staticmethod
+    def _int_bound(argname: str, bound):
+        # Integer bounds are stored in int64 slots, checked before anything is added
+        if (bound is None):
+            return None
+        try:
+            bound = operator.index(bound)
+        except TypeError:
+            raise PymzmInvalidVariableError(argname, f"{bound!r} is not an integer") from None
+        if (not _INT64_MIN <= bound <= _INT64_MAX):
+            raise PymzmInvalidVariableError(argname, f"{bound} is out of the 64-bit integer range")
+        return bound
+
+    def add(self, name: str, vtype: str=Variable.VTYPE_INTEGER, val_min=None, val_max=None, domain=None) -> Variable:
+        """Add a single variable."""
+        return self.add_family([name], vtype, val_min, val_max, None if domain is None else [domain], family=name)[0]
+
+    def add_family(self, names: Iterable, vtype: str=Variable.VTYPE_INTEGER, val_min=None, val_max=None, domains: list=None, family: str=None, indices: list=None, array: "VariableArray"=None) -> List[Variable]:
+        """Add variables sharing the type and bounds, one per name.
+
+        Args:
+            names (Iterable): variable names
+            vtype (str): variable type
+            val_min: lower bound of every variable
+            val_max: upper bound of every variable
+            domains (list): domain of each variable, None for none
+            family (str): name of the family, for `lookup`
+            indices (list): index of each variable in the family, None for a
+                single variable
+            array (VariableArray): array declaring the variables, they are
+                declared as scalars if None
+
+        Returns:
+            List[Variable]: the new variables
+        """
+        ids = self._add(names, vtype, val_min, val_max, domains, family, indices, array)
+        return self.handles[ids.start:ids.stop]
+
+    def _add(self, names: Iterable, vtype: str, val_min, val_max, domains: list=None, family: str=None, indices: list=None, array: "VariableArray"=None) -> range:
+        # Fill in the arrays, the handles are made on first use. The arguments
+        # are checked before the store is changed, a failed call leaves it as
+        # it was. The names are streamed into the buffer without an
+        # intermediate list
+        converted = {}
+        if (domains is None):
+            self._check(vtype, val_min, val_max, None)
+        else:
+            for domain in domains:
+                if (domain is not None and id(domain) not in converted):
+                    converted[id(domain)] = domain if isinstance(domain, Domain) else Domain(domain)
+                self._check(vtype, val_min, val_max, None if domain is None else converted[id(domain)])
+        if (vtype == Variable.VTYPE_BOOL):
+            val_min, val_max = 0, 1
+        elif (vtype != Variable.VTYPE_FLOAT):
+            val_min = self._int_bound("val_min", val_min)
+            val_max = self._int_bound("val_max", val_max)
+
+        start = len(self.vtypes)
+        buffer = self.names
+        size = len(buffer)
+        append = self.name_offsets.append
+        try:
+            for name in names:
+                buffer += name.encode()
+                append(len(buffer))
+        except BaseException:
+            del buffer[size:]
+            del self.name_offsets[start + 1:]
+            raise
+        count = len(self.name_offsets) - 1 - start
+        ids = range(start, start + count)
+
+        self.vtypes.extend(repeat(Variable.VTYPES.index(vtype), count))
+        if (vtype == Variable.VTYPE_FLOAT):
+            self.float_bounds.update((i, (val_min, val_max)) for i in ids)
+            val_min = val_max = None
+        flags = (_HAS_MIN if val_min is not None else 0) | (_HAS_MAX if val_max is not None else 0)
+        self.val_min.extend(repeat(0 if val_min is None else val_min, count))
+        self.val_max.extend(repeat(0 if val_max is None else val_max, count))
+        self.bounded.extend(repeat(flags, count))
+
+        if (domains is not None):
+            # Equal domains are stored once
+            shared = {key: self.shared_domains.setdefault(domain, domain) for key, domain in converted.items()}
+            for i, domain in enumerate(domains):
+                if (domain is not None):
+                    domains[i] = shared[id(domain)]
+                    self.domains[start + i] = domains[i]
+
+        self.family_ids.extend(repeat(len(self.families), count))
+        self.families.append(_Family(family, ids, indices, array))
+        if (array is not None):
+            self.arrays[array.name] = array
+        else:
+            last = self.declarations[-1] if self.declarations else None
+            if (isinstance(last, range) and last.stop == start):
+                self.declarations[-1] = range(last.start, ids.stop)
+            else:
+                self.declarations.append(ids)
+        return ids
+
+    def name(self, i: int) -> str:
+        name = self.renamed.get(i) if self.renamed else None
+        if (name is None):
+            name = self.names[self.name_offsets[i]:self.name_offsets[i + 1]].decode()
+        return name
+
+    def rename(self, i: int, name: str):
+        if (i < self._indexed and self.families[self.family_ids[i]].array is None):
+            del self._index[self.name(i)]
+            self._index[name] = i
+        self.renamed[i] = name
+        self.renames += 1
+
+    def _name_index(self) -> dict:
+        """name -> id of every variable, elements of arrays by their flat names.
+        Only the variables added since the last call are indexed."""
+        index = self._index
+        i = self._indexed
+        while (i < len(self)):
+            family = self.families[self.family_ids[i]]
+            ids = range(i, family.ids.stop)
+            if (family.array is None):
+                names = (self.name(j) for j in ids)
+            else:
+                names = index_names(family.name, family.indices[i - family.ids.start:])
+            for j, name in zip(ids, names):
+                if (index.setdefault(name, j) != j):
+                    raise PymzmDuplicateName(name)
+            i = ids.stop
+        self._indexed = i
+        return index
+
+    def find(self, name: str) -> Variable:
+        """Variable by the name reported by the solver, flat names for the
+        elements of arrays. KeyError if there is none."""
+        return self.handles[self._name_index()[name]]
+
+    def lookup(self, name: str) -> Tuple[str, tuple]:
+        """Family name and index of the variable reported as `name` by the
+        solver, the index is None for single variables. KeyError if there is none."""
+        i = self._name_index()[name]
+        family = self.families[self.family_ids[i]]
+        if (family.indices is None):
+            return family.name, None
+        return family.name, family.indices[i - family.ids.start]
+
+    def decode(self, values: dict) -> dict:
+        """Solver output grouped by variable family.
+
+        Args:
+            values (dict): output name -> value, e.g. the fields of a solution
+
+        Returns:
+            dict: family name -> {index: value}, single variables as name -> value.
+                Names that aren't variables are left out
+        """
+        index = self._name_index()
+        decoded = {}
+        for name, value in values.items():
+            array = self.arrays.get(name)
+            if (array is not None):
+                family = decoded.setdefault(name, {})
+                for idx, cell in zip(array.indices, array.cells):
+                    v = value
+                    for p in cell:
+                        v = v[p]
+                    family[idx] = v
+                continue
+
+            i = index.get(name)
+            if (i is None):
+                continue
+            family = self.families[self.family_ids[i]]
+            if (family.indices is None):
+                decoded[family.name] = value
+            else:
+                decoded.setdefault(family.name, {})[family.indices[i - family.ids.start]] = value
+        return decoded
+
+    def bounds(self, i: int) -> tuple:
+        if (i in self.float_bounds):
+            return self.float_bounds[i]
+        flags = self.bounded[i]
+        return (self.val_min[i] if flags & _HAS_MIN else None, self.val_max[i] if flags & _HAS_MAX else None)
+
+    def _declaration(self, i: int, domain_names: dict=None) -> str:
+        vtype = self.vtypes[i]
+        name = self.name(i)
+        if (vtype == _VTYPE_BOOL):
+            return f"var bool: {name};\n"
+
+        domain = self.domains.get(i)
+        if (domain is None):
+            val_min, val_max = self.bounds(i)
+            domain = f"{val_min}..{val_max}"
+        elif (domain_names):
+            domain = domain_names.get(domain, domain)
+        if (vtype == _VTYPE_SET):
+            return f"var set of {domain}: {name};\n"
+        return f"var {domain}: {name};\n"
+
+    def _domain_names(self, declarations: list, keep: bytearray=None) -> Tuple[dict, int]:
+        """Names of the domains written more than once, where the name is shorter
+        than the domain.
+
+        Returns:
+            Tuple[dict, int]: domain -> name ordered by first use, and the bytes
+                saved by writing the names instead of the domains
+        """
+        uses = {}
+        for declaration in declarations:
+            if (isinstance(declaration, VariableArray)):
+                domains = declaration._written_domains()
+            else:
+                domains = (self.domains.get(i) for i in declaration if keep is None or keep[i])
+            for domain in domains:
+                if (domain is not None):
+                    uses[domain] = uses.get(domain, 0) + 1
+
+        names = {}
+        saved = 0
+        for domain, count in uses.items():
+            name = f"{DOMAIN_PREFIX}{len(names)}"
+            text = str(domain)
+            if (count > 1 and len(text) > len(name)):
+                names[domain] = name
+                saved += count * (len(text) - len(name)) - len(f"set of int: {name} = {text};\n")
+        return names, saved
+
+    def _to_mz(self, keep: bytearray=None, stats: dict=None) -> str:
+        """Declarations of the variables, see `_iter_mz`."""
+        return "".join(self._iter_mz(keep, stats))
+
+    def _iter_mz(self, keep: bytearray=None, stats: dict=None, workers: int=None):
+        """Declarations of the variables, with `keep` only those marked in it
+        (arrays by their first element), one piece per declaration. Domains used
+        by several declarations are declared once as named sets, the bytes saved
+        are reported in `stats["domain_bytes_saved"]` if given. Long runs of
+        scalar declarations are rendered by `workers` processes."""
+        declarations = [
+            declaration for declaration in self.declarations
+            if keep is None or not isinstance(declaration, VariableArray) or keep[declaration.ids.start]
+        ]
+        domain_names, saved = self._domain_names(declarations, keep) if self.domains else ({}, 0)
+        if (stats is not None):
+            stats["domain_bytes_saved"] = saved
+
+        for domain, name in domain_names.items():
+            yield f"set of int: {name} = {domain};\n"
+        for declaration in declarations:
+            if (isinstance(declaration, VariableArray)):
+                yield declaration._to_mz(domain_names)
+            elif (keep is None):
+                yield self._render_range(declaration, domain_names, workers)
+            else:
+                yield from (self._declaration(i, domain_names) for i in declaration if keep[i])
+
+    def _render_range(self, ids: range, domain_names: dict, workers: int=None) -> str:
+        # Declarations of consecutive scalar variables. The text of the last call
+        # is reused, variables added to the end of the range since are appended
+        cached = self._rendered.get(ids.start)
+        if (cached is not None and cached[0] <= ids.stop and cached[1] == domain_names and cached[2] == self.renames):
+            stop, text = cached[0], cached[3]
+        else:
+            stop, text = ids.start, ""
+        if (stop < ids.stop):
+            def render(start: int, end: int) -> str:
+                return "".join(self._declaration(i, domain_names) for i in range(stop + start, stop + end))
+            text += "".join(render_parallel(render, ids.stop - stop, workers))
+            self._rendered[ids.start] = (ids.stop, domain_names, self.renames, text)
+        return text
+
+class _Family:
+    """Variables added together, with `ids` consecutive."""
+    __slots__ = ("name", "ids", "indices", "array")
+
+    def __init__(self, name: str, ids: range, indices: list, array: "VariableArray"):
+        self.name = name
+        self.ids = ids
+        self.indices = indices
+        self.array = array
+
+class _Handles:
+    """The `Variable` handles of a store as a sequence indexed by id. A handle
+    is made on first access and kept, so each variable has exactly one, and
+    families added in bulk take no space beyond the typed arrays of the
+    store until their elements are used."""
+    __slots__ = ("store", "created")
+
+    def __init__(self, store: VariableStore):
+        self.store = store
+        self.created = {} # id -> Variable
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, i):
+        if (isinstance(i, slice)):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if (i < 0):
+            i += len(self)
+        if (not 0 <= i < len(self)):
+            raise IndexError(i)
+        handle = self.created.get(i)
+        if (handle is None):
+            handle = Expression.__new__(VariableBool if self.store.vtypes[i] == _VTYPE_BOOL else Variable)
+            handle._bind(self.store, i)
+            self.created[i] = handle
+        return handle
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __eq__(self, other):
+        if (not isinstance(other, (_Handles, list, tuple))):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+class _GridIndices:
+    """Index tuples of a dense grid in row-major order, e.g. the indices of
+    `Model.add_variable_array`, computed on access instead of stored."""
+    __slots__ = ("shape",)
+
+    def __init__(self, shape: tuple):
+        self.shape = shape
+
+    def __len__(self):
+        return int(np.prod(self.shape))
+
+    def __getitem__(self, i):
+        if (isinstance(i, slice)):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if (i < 0):
+            i += len(self)
+        if (not 0 <= i < len(self)):
+            raise IndexError(i)
+        return tuple(int(k) for k in np.unravel_index(i, self.shape))
+
+    def __iter__(self):
+        return np.ndindex(*self.shape)
+
+_VTYPE_BOOL = Variable.VTYPES.index(Variable.VTYPE_BOOL)
+DOMAIN_PREFIX = "pymzm_dom"
+_HAS_MIN, _HAS_MAX = 1, 2
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+_VTYPE_SET = Variable.VTYPES.index(Variable.VTYPE_SET)
+
+class VariableArray:
+    """Family of variables declared as a single MiniZinc array.
+
+    The elements are ordinary `Variable` objects whose MiniZinc name is the
+    array access, e.g. `x[2, 3]`. Their flat names, e.g. `x_1_2`, are resolved
+    by `VariableStore.lookup`. Per-element domains are declared with the hull
+    of all domains and restricted by membership constraints.
+    """
+    def __init__(self, name: str, indices: list, vtype: str=Variable.VTYPE_INTEGER, val_min: int=None, val_max: int=None, domains: dict=None, store: VariableStore=None):
+        self.name = name
+        self.vtype = vtype
+        self.val_min = val_min
+        self.val_max = val_max
+        self.store = VariableStore() if store is None else store
+        self.indices = indices
+
+        self.cells, self.shape = _grid_positions(indices, "indices")
+        names = (f"{name}[{', '.join(str(p + 1) for p in cell)}]" for cell in self.cells)
+        domains = None if not domains else [domains.get(idx, None) for idx in indices]
+        self.ids = self.store._add(names, vtype, val_min, val_max, domains, family=name, indices=indices, array=self)
+        self.store.declarations.append(self)
+
+        self._variables = None
+        self._rendered = None
+        self.domain = None
+        element_domains = [self.store.domains.get(i) for i in self.ids]
+        if (element_domains[0] is not None):
+            if (all(d == element_domains[0] for d in element_domains)):
+                self.domain = element_domains[0]
+            else:
+                self.val_min = min(d.lower for d in element_domains)
+                self.val_max = max(d.upper for d in element_domains)
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def variables(self) -> ValueDict:
+        """index -> variable, made on first use."""
+        if (self._variables is None):
+            self._variables = ValueDict(zip(self.indices, self.store.handles[self.ids.start:self.ids.stop]))
+        return self._variables
+
+    def _restricted(self):
+        """Elements whose domain is narrower than the declared hull, with their domain."""
+        if (self.domain is not None or self.vtype not in [Variable.VTYPE_INTEGER, Variable.VTYPE_SET]):
+            return
+        domains = self.store.domains
+        for i in self.ids:
+            domain = domains.get(i)
+            if (domain is not None and domain.intervals != ((self.val_min, self.val_max),)):
+                yield self.store.handles[i], domain
+
+    def _written_domains(self) -> list:
+        if (self.domain is not None):
+            return [self.domain]
+        return [domain for _, domain in self._restricted()]
+
+    def _element_type(self, domain_names: dict=None) -> str:
+        if (self.vtype == Variable.VTYPE_BOOL):
+            return "var bool"
+        if (self.domain is not None):
+            domain = domain_names.get(self.domain, self.domain) if domain_names else self.domain
+        else:
+            domain = f"{self.val_min}..{self.val_max}"
+        if (self.vtype == Variable.VTYPE_SET):
+            return f"var set of {domain}"
+        return f"var {domain}"
+
+    def _to_mz(self, domain_names: dict=None):
+        # Arrays are not extended or renamed, only the domain names can change
+        domain_names = domain_names or {}
+        if (self._rendered is not None and self._rendered[0] == domain_names):
+            return self._rendered[1]
+
+        index_sets = ", ".join(f"1..{d}" for d in self.shape)
+        mz = f"array[{index_sets}] of {self._element_type(domain_names)}: {self.name};\n"
+        op = "subset" if self.vtype == Variable.VTYPE_SET else "in"
+        for variable, domain in self._restricted():
+            domain = domain_names.get(domain, domain) if domain_names else domain
+            mz += f"constraint {variable.name} {op} {domain};\n"
+        self._rendered = (domain_names, mz)
+        return mz
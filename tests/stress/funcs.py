@@ -24,6 +24,31 @@ def gen_model(cap, sizes):
     model.write("py.mzn")
     return model
 
+def gen_template():
+    # gen_model as a parametric model, built once and compiled per instance with the
+    # data of model.instance_data(cap=cap, stuff=sizes)
+    model = pymzm.Model()
+    n = model.add_parameter("n")
+    cap = model.add_parameter("cap")
+    items = model.add_index_set("ITEMS", n)
+    stuff = model.add_parameter("stuff", items)
+
+    bin_loads = model.add_variables("bin_load", items, val_min=0, val_max=cap)
+    model.add_constraint(pymzm.Constraint.decreasing(bin_loads))
+    model.add_constraint(bin_loads[0] > 0)
+
+    # Boolean if bin i has item j
+    bin_items = model.add_variables("bin_item", (items, items), vtype=pymzm.Variable.VTYPE_BOOL)
+    i, j = items.index("i"), items.index("j")
+    model.add_constraint(pymzm.forall(i, bin_loads[i] == pymzm.sum_over(j, bin_items[i, j] * stuff[j])))
+    model.add_constraint(pymzm.forall(j, pymzm.sum_over(i, bin_items[i, j]) == 1))
+
+    # Solve
+    model.set_solve_criteria(pymzm.SOLVE_MINIMIZE, pymzm.sum_over(i, bin_loads[i] > 0))
+    model.generate()
+    model.write("pt.mzn")
+    return model
+
 def compile_mzn_to_fzn(path, cap=None, n=None, stuff=None):
     if (cap is None):
         subprocess.run(f"minizinc -c {path}", stdout=subprocess.DEVNULL)
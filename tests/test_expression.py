@@ -129,9 +129,36 @@ class TestExpression(unittest.TestCase):
         self.assertRaises(pymzm.PymzmValueIsNotExpression,
             pymzm.Expression.sum,
             "test")
-        self.assertRaises(pymzm.PymzmNoValues,
-            pymzm.Expression.sum,
-            [])
+
+        # The empty sum is 0, as in MiniZinc
+        self.assertEqual(str(pymzm.Expression.sum(x for x in [])), "0")
+
+    def test_linear(self):
+        expr = pymzm.Expression.sum([self.xs[i % 3] * (i + 1) for i in range(6)] + [4])
+        self.assertIsInstance(expr, pymzm.LinearExpression)
+        self.assertEqual(len(expr.terms), 3)
+        self.assertEqual(expr.terms[self.xs[0]], 1 + 4)
+        self.assertEqual(expr.constant, 4)
+        self.assertEqual(str(self.x * 2 - self.x * 2 + 3), "3")
+
+        expr = pymzm.LinearExpression.weighted_sum(self.xs, range(10))
+        self.assertEqual(len(expr.terms), 9)
+
+        self._operator_case_multiple(lambda f, xs: f([x * 2 for x in xs]) - xs[0] == 9, pymzm.Expression.sum, sum, var_count=3)
+        self._operator_case_multiple(lambda f, xs: f([-x for x in xs]) + 5 == 1, pymzm.Expression.sum, sum, var_count=3)
+
+    def test_bounds(self):
+        x = self.x
+        z = self.model.add_variable("z", val_min=2, val_max=4)
+        self.assertEqual((x + z).bounds(), (-98, 104))
+        self.assertEqual((x * z - 1).bounds(), (-401, 399))
+        self.assertEqual((x // z).bounds(), (-50, 50))
+        self.assertEqual((x % z).bounds(), (-3, 3))
+        self.assertEqual(abs(x - 200).bounds(), (100, 300))
+        self.assertEqual(pymzm.Expression.sum(x > i for i in range(5)).bounds(), (0, 5))
+        self.assertEqual(pymzm.Expression.ifthenelse(self.y, z, -z).bounds(), (-4, 4))
+        self.assertEqual((x / z).bounds(), (-50.0, 50.0))
+        self.assertIsNone((x // pymzm.Expression("n")).bounds())
 
     def test_product(self):
         # Valid
@@ -333,6 +360,16 @@ class TestExpression(unittest.TestCase):
         expr = pymzm.Expression.ifthenelse(self.xs[1] >= self.y, self.y, self.xs[4])
         self.assertIsInstance(expr, pymzm.Expression)
 
+    def test_deep_expression(self):
+        n = 100000
+        expr = self.xs[0]
+        for i in range(1, n):
+            expr = expr + self.xs[i % 10]
+
+        # Rendering must not recurse
+        self.assertIsInstance(expr, pymzm.Expression)
+        self.assertEqual(str(expr).count("+"), n - 1)
+
 if __name__ == "__main__":
     t = TestExpression()
     t.setUpClass()
@@ -1,5 +1,11 @@
+import gzip
+import io
+import os
+import tempfile
 import unittest
 
+import numpy as np
+
 import pymzm
 import minizinc
 
@@ -20,3 +26,699 @@ class TestMisc(unittest.TestCase):
 
         self.assertTrue(result.solution is not None)
         self.assertTrue(result.objective < 0)
+
+    def test_cse(self):
+        model = self.model
+        xs = model.add_variables("x", range(3), pymzm.Variable.VTYPE_INTEGER, 0, 10)
+        model.add_constraint(abs(xs[0] - xs[1]) >= 2)
+        model.add_constraint(abs(xs[0] - xs[1]) <= 3)
+        model.add_constraint(xs[2] == 1)
+        model.add_constraint(xs[2] == 1)
+        model.set_solve_criteria(pymzm.SOLVE_MAXIMIZE, abs(xs[0] - xs[1]) + xs[2])
+        model.generate(cse=True)
+
+        # The repeated subexpression is defined once, the duplicate constraint is dropped
+        self.assertEqual(model.model_mzn_str.count("abs("), 1)
+        self.assertEqual(model.model_mzn_str.count("constraint "), 3)
+
+        result = minizinc.Instance(self.gecode, model).solve(all_solutions=False)
+        self.assertTrue(result.solution is not None)
+        self.assertEqual(result.objective, 4)
+
+    def test_cse_guarded(self):
+        model = self.model
+        x = model.add_variable("x", val_min=-5, val_max=5)
+        y = model.add_variable("y", val_min=-5, val_max=5)
+        c = model.add_constant("c", [1, 2, 3])
+        model.add_constraint(pymzm.Expression.ifthenelse(y != 0, (x // y) * (x // y), 0) >= 0)
+        model.add_constraint(pymzm.Expression.ifthenelse((x >= 1) & (x <= 3), c[x] + c[x], 0) >= 0)
+        model.add_constraint(y == 0)
+        model.set_solve_criteria(pymzm.SOLVE_MINIMIZE, x)
+        model.generate(cse=True)
+
+        # The division and the index stay under their guards
+        self.assertNotIn("pymzm_cse", model.model_mzn_str)
+
+        result = minizinc.Instance(self.gecode, model).solve(all_solutions=False)
+        self.assertEqual(result.objective, -5)
+
+    def test_expression_array(self):
+        model = self.model
+        xs = model.add_variables("x", [(i, j) for i in range(3) for j in range(4)], pymzm.Variable.VTYPE_INTEGER, 0, 5)
+        arr = xs.to_array()
+        self.assertEqual(arr.shape, (3, 4))
+        self.assertIs(arr[1, 2], xs[1, 2])
+
+        model.add_constraint(arr.sum(axis=1) == [3, 4, 5])
+        model.add_constraint(arr[:, 0] >= arr[:, 1])
+        model.set_solve_criteria(pymzm.SOLVE_MAXIMIZE, (arr * 2).sum())
+        model.generate()
+
+        # One comprehension per family instead of one constraint per row
+        self.assertEqual(model.model_mzn_str.count("constraint "), 2)
+        self.assertIn("forall(pymzm_i0 in 1..3)", model.model_mzn_str)
+
+        result = minizinc.Instance(self.gecode, model).solve(all_solutions=False)
+        self.assertTrue(result.solution is not None)
+        self.assertEqual(result.objective, 24)
+        for i, load in enumerate([3, 4, 5]):
+            self.assertEqual(sum(result[f"x_{i}_{j}"] for j in range(4)), load)
+            self.assertGreaterEqual(result[f"x_{i}_0"], result[f"x_{i}_1"])
+
+        self.assertRaises(pymzm.PymzmInvalidShape,
+            pymzm.ExpressionArray.from_dict,
+            {(0, 0): xs[0, 0], (1, 1): xs[1, 1]})
+
+    def test_expression_array_copies(self):
+        model = self.model
+        xs = model.add_variables("x", [(i, j) for i in range(3) for j in range(4)], pymzm.Variable.VTYPE_INTEGER, 0, 5)
+        ys = model.add_variable_array("y", (3, 4), pymzm.Variable.VTYPE_INTEGER, 0, 5, as_array=True)
+        arr = xs.to_array()
+        model.add_constraint(arr.sum(axis=1) <= 10)
+        model.add_constraint(arr.sum(axis=0) <= 6)
+        model.add_constraint(arr.sum() + ys.sum() >= 2)
+        model.set_solve_criteria(pymzm.SOLVE_SATISFY)
+        model.generate()
+
+        # The family is copied once for the model, the array is used by name
+        text = model.model_mzn_str
+        for i in range(3):
+            for j in range(4):
+                self.assertEqual(text.count(f"x_{i}_{j}"), 2)
+        self.assertNotIn("y[1, 1]", text)
+        self.assertIn("pymzm_f0[pymzm_i0, pymzm_i1]) + sum(pymzm_i0 in 1..3, pymzm_i1 in 1..4)(y[pymzm_i0, pymzm_i1])", text)
+
+        # Beyond array6d the elements are unrolled, with a warning
+        zs = model.add_variable_array("z", (2, 1, 1, 1, 1, 1, 1), val_min=0, val_max=5)
+        with self.assertWarns(pymzm.PymzmUnrolledArrayWarning):
+            model.add_constraint(zs >= 1)
+        model.generate()
+        self.assertIn("constraint forall([(z_0_0_0_0_0_0_0 >= 1), (z_1_0_0_0_0_0_0 >= 1)]);", model.model_mzn_str)
+
+    def test_bounds(self):
+        model = self.model
+        xs = model.add_variables("x", range(4), pymzm.Variable.VTYPE_INTEGER, 0, 10)
+        model.add_constraint(xs[0] + xs[1] == 2)
+        model.set_solve_criteria(pymzm.SOLVE_MINIMIZE, pymzm.Expression.sum(xs > 0))
+        model.generate(check_overflow=True)
+
+        # The objective is declared with its inferred domain
+        self.assertIn("var 0..4: pymzm_objective = ", model.model_mzn_str)
+        self.assertEqual(model.generate_stats["overflows"], [])
+
+        result = minizinc.Instance(self.gecode, model).solve(all_solutions=False)
+        self.assertEqual(result.objective, 1)
+
+        model = pymzm.Model()
+        x = model.add_variable("x", val_min=1, val_max=99999999)
+        y = model.add_variable("y", val_min=1, val_max=99999999)
+        model.add_constraint(x * y == 7829 * 6907)
+        model.set_solve_criteria(pymzm.SOLVE_SATISFY)
+        with self.assertWarns(pymzm.PymzmOverflowWarning):
+            model.generate(check_overflow=True)
+        self.assertEqual(len(model.generate_stats["overflows"]), 1)
+
+    def test_variable_array(self):
+        model = self.model
+        xs = model.add_variables("x", [(i, j) for i in range(2) for j in range(3)], pymzm.Variable.VTYPE_INTEGER, 0, 5, as_array=True)
+        ys = model.add_variables("y", ["a", "b"], domains=[{1, 3}, {2, 4}], as_array=True)
+        model.add_constraint(pymzm.Expression.sum(xs) == 7)
+        model.add_constraint(xs[1, 2] == ys["a"] + ys["b"])
+        model.set_solve_criteria(pymzm.SOLVE_MAXIMIZE, xs[1, 2])
+        model.generate()
+
+        # One declaration per family
+        self.assertIn("array[1..2, 1..3] of var 0..5: x;", model.model_mzn_str)
+        self.assertIn("constraint y[2] in {2, 4};", model.model_mzn_str)
+        self.assertEqual(model.model_mzn_str.count("var "), 2)
+
+        result = minizinc.Instance(self.gecode, model).solve(all_solutions=False)
+        self.assertEqual(result.objective, 5)
+        self.assertEqual(result["x_1_2"], 5)
+        self.assertEqual(result["y_a"] + result["y_b"], 5)
+        self.assertEqual(sum(result[f"x_{i}_{j}"] for i in range(2) for j in range(3)), 7)
+
+    def test_variable_grid(self):
+        model = self.model
+        xs = model.add_variable_array("x", (4, 4), val_min=1, val_max=4)
+        boxes = xs.blocks(2, 2)
+        self.assertEqual(boxes.shape, (2, 2, 2, 2))
+        self.assertIs(boxes[1, 0][0, 1], xs[2, 1])
+        self.assertIs(xs.T[0, 3], xs[3, 0])
+        self.assertEqual([v.name for v in xs[:, 1].flat], ["x_0_1", "x_1_1", "x_2_1", "x_3_1"])
+        with self.assertRaises(pymzm.PymzmInvalidShape):
+            xs.blocks(3, 3)
+
+        for i in range(4):
+            model.add_constraint(pymzm.Constraint.alldifferent(xs[i, :]))
+            model.add_constraint(pymzm.Constraint.alldifferent(xs[:, i]))
+            model.add_constraint(pymzm.Constraint.alldifferent(boxes[i // 2, i % 2]))
+        model.add_constraint(xs[0, 0] == 3)
+        model.set_solve_criteria(pymzm.SOLVE_SATISFY)
+        model.generate()
+        self.assertIn("alldifferent([x_2_0, x_2_1, x_3_0, x_3_1])", model.model_mzn_str)
+
+        result = minizinc.Instance(self.gecode, model).solve(all_solutions=False)
+        self.assertEqual(result["x_0_0"], 3)
+        self.assertEqual(sorted(result[f"x_{i}_2"] for i in range(4)), [1, 2, 3, 4])
+
+    def test_variable_store(self):
+        model = self.model
+        x = model.add_variable("x", val_min=-5, val_max=5)
+        ys = model.add_variables("y", range(3), domains=[{1, 2}, {4}, {1, 2}])
+        zs = model.add_variables("z", range(2), pymzm.Variable.VTYPE_FLOAT, 0.5, 1.5)
+        bs = model.add_variables("b", range(2), pymzm.Variable.VTYPE_BOOL)
+
+        self.assertEqual(len(model.store), 8)
+        self.assertEqual(model.variables, [x, *ys, *zs, *bs])
+        self.assertEqual((ys[1].name, ys[1].domain, ys[1].val_min), ("y_1", {4}, None))
+        self.assertEqual((zs[0].vtype, zs[0].val_min, zs[0].val_max), ("float", 0.5, 1.5))
+        self.assertIsInstance(bs[0], pymzm.ExpressionBool)
+        self.assertEqual(bs[1].bounds(), (0, 1))
+
+        model.set_solve_criteria(pymzm.SOLVE_SATISFY)
+        model.generate()
+        self.assertTrue(model.model_mzn_str.startswith(
+            "var -5..5: x;\nvar {1, 2}: y_0;\nvar {4}: y_1;\nvar {1, 2}: y_2;\n"
+            "var 0.5..1.5: z_0;\nvar 0.5..1.5: z_1;\nvar bool: b_0;\nvar bool: b_1;\n"))
+
+    def test_variable_store_bounds(self):
+        model = self.model
+        with self.assertRaises(pymzm.PymzmInvalidVariableError):
+            model.add_variable("big", val_min=0, val_max=2 ** 70)
+        with self.assertRaises(pymzm.PymzmInvalidVariableError):
+            model.add_variables("f", range(3), val_min=0.5, val_max=3)
+        self.assertEqual(len(model.store), 0)
+
+        low = model.add_variable("low", val_min=-2 ** 63, val_max=0)
+        self.assertEqual((low.val_min, low.val_max), (-2 ** 63, 0))
+        xs = model.add_variable_array("x", (100, 100), val_min=0, val_max=1)
+        self.assertIs(xs[99, 1], xs[-1, 1])
+        self.assertEqual(len(model.store.handles.created), 2)
+        self.assertEqual(model.lookup("x_99_1"), ("x", (99, 1)))
+
+        model.set_solve_criteria(pymzm.SOLVE_SATISFY)
+        model.generate()
+        self.assertTrue(model.model_mzn_str.startswith("var -9223372036854775808..0: low;\nvar 0..1: x_0_0;\n"))
+
+    def test_domains(self):
+        domain = pymzm.Domain(list(range(1, 501)) + list(range(700, 901)))
+        self.assertEqual(str(domain), "1..500 union 700..900")
+        self.assertEqual(len(domain), 701)
+        self.assertTrue(500 in domain and 700 in domain and 600 not in domain)
+        self.assertEqual(str(domain & range(450, 750)), "450..500 union 700..749")
+        self.assertEqual(str(pymzm.Domain({1, 2, 4, 5, 6, 9})), "{1, 2} union 4..6 union {9}")
+
+        model = self.model
+        xs = model.add_variables("x", range(2), domains=domain)
+        y = model.add_variable("y", domain=set(domain))
+        model.add_constraint(y == xs[0] + 600)
+        model.add_constraint(xs[1] > 500)
+        model.set_solve_criteria(pymzm.SOLVE_MINIMIZE, y)
+        model.generate()
+
+        # The shared domain is written once
+        self.assertEqual(model.model_mzn_str.count("700..900"), 1)
+        self.assertIn("var pymzm_dom0: y;", model.model_mzn_str)
+
+        result = minizinc.Instance(self.gecode, model).solve(all_solutions=False)
+        self.assertEqual(result["y"], 700)
+        self.assertEqual(result["x_1"], 700)
+
+    def test_names(self):
+        model = self.model
+        xs = model.add_variables("x", [("a_b", "c"), ("a", "b_c"), (-1, 2), (1, 2)], pymzm.Variable.VTYPE_INTEGER, 0, 3)
+        ys = model.add_variables("y", [(i, j) for i in range(2) for j in range(2)], pymzm.Variable.VTYPE_INTEGER, 0, 3, as_array=True)
+        z = model.add_variable("z", val_min=0, val_max=3)
+
+        names = [x.name for x in xs]
+        self.assertEqual(len(set(names)), 4)
+        self.assertEqual(names[2:], ["x_n1_2", "x_1_2"])
+        self.assertEqual(model.lookup("x_n1_2"), ("x", (-1, 2)))
+        self.assertEqual(model.lookup(xs["a", "b_c"].name), ("x", ("a", "b_c")))
+        self.assertEqual(model.lookup("y_1_0"), ("y", (1, 0)))
+        self.assertEqual(model.lookup("z"), ("z", None))
+        self.assertRaises(KeyError, model.lookup, "x_1_3")
+
+        model.add_constraint(xs[-1, 2] + ys[1, 0] + z == 9)
+        model.set_solve_criteria(pymzm.SOLVE_SATISFY)
+        model.generate()
+
+        result = minizinc.Instance(self.gecode, model).solve(all_solutions=False)
+        values = model.decode_solution(result.solution)
+        self.assertEqual(values["x"][-1, 2] + values["y"][1, 0] + values["z"], 9)
+
+    def test_output_type(self):
+        class Output:
+            def __init__(self, **values):
+                self.values = values
+
+        model = self.model
+        model.add_variables("x", range(3), pymzm.Variable.VTYPE_INTEGER, 0, 3, as_array=True)
+        model.set_solve_criteria(pymzm.SOLVE_SATISFY)
+        model.output_type = Output
+        model.generate()
+        self.assertIs(model.output_type, Output)
+
+        class Values(pymzm.Solution):
+            pass
+        model.output_type = Values
+        model.generate()
+        generated = model.output_type
+        self.assertTrue(issubclass(generated, Values))
+        model.generate()
+        self.assertIs(model.output_type, generated)
+
+    def test_numpy_indices(self):
+        model = self.model
+        xs = model.add_variables("x", np.arange(3), pymzm.Variable.VTYPE_INTEGER, 0, 3)
+        ys = model.add_variables("y", [(np.int64(i), np.int64(-j)) for i in range(2) for j in range(2)], pymzm.Variable.VTYPE_INTEGER, 0, 3)
+        self.assertEqual([x.name for x in xs], ["x_0", "x_1", "x_2"])
+        self.assertEqual([y.name for y in ys], ["y_0_0", "y_0_n1", "y_1_0", "y_1_n1"])
+        self.assertIs(xs[1], xs[np.int64(1)])
+        self.assertEqual(model.lookup("y_1_n1"), ("y", (1, -1)))
+
+    def test_prune(self):
+        model = self.model
+        sizes = model.add_constant("sizes", [3, 4, 5])
+        model.add_constant("unused", [1, 2])
+        xs = model.add_variables("x", range(10), pymzm.Variable.VTYPE_INTEGER, 0, 5)
+        ys = model.add_variables("y", range(3), pymzm.Variable.VTYPE_INTEGER, 0, 9, as_array=True)
+        model.add_variables("z", range(3), pymzm.Variable.VTYPE_INTEGER, 0, 9, as_array=True)
+        model.add_constraint(ys[2] == xs[0] + sizes[1])
+        model.set_solve_criteria(pymzm.SOLVE_MAXIMIZE, xs[1])
+        model.generate(prune=True)
+
+        self.assertNotIn("unused", model.model_mzn_str)
+        self.assertNotIn("x_2", model.model_mzn_str)
+        self.assertNotIn(" z;", model.model_mzn_str)
+        self.assertEqual(model.generate_stats["pruned_variables"], 8 + 3)
+        self.assertEqual(model.generate_stats["pruned_constants"], 1)
+
+        result = minizinc.Instance(self.gecode, model).solve(all_solutions=False)
+        self.assertEqual(result.objective, 5)
+        self.assertEqual(result["y_2"], result["x_0"] + 4)
+
+    def test_data(self):
+        def build(data, sizes):
+            model = pymzm.Model()
+            c = model.add_constant("sizes", sizes)
+            xs = model.add_variables("x", range(3), pymzm.Variable.VTYPE_INTEGER, 0, 9)
+            model.add_constraint(pymzm.Expression.sum(xs[i] * c[i] for i in range(3)) == 12)
+            model.set_solve_criteria(pymzm.SOLVE_MAXIMIZE, xs[0])
+            model.generate(data=data)
+            return model
+
+        # The model text doesn't depend on the data
+        first = build("instance", [3, 4, 5])
+        second = build("instance", [1, 2, 3])
+        self.assertEqual(first.model_mzn_str, second.model_mzn_str)
+        self.assertIn("array[1..3] of int: sizes;", first.model_mzn_str)
+
+        with tempfile.TemporaryDirectory() as directory:
+            fn = os.path.join(directory, "data.dzn")
+            third = build(fn, [2, 2, 2])
+            with open(fn) as f:
+                self.assertEqual(f.read(), "sizes = [2, 2, 2];\n")
+
+            self.assertEqual(minizinc.Instance(self.gecode, first).solve().objective, 4)
+            self.assertEqual(minizinc.Instance(self.gecode, second).solve().objective, 9)
+            self.assertEqual(minizinc.Instance(self.gecode, third).solve().objective, 6)
+
+    def test_array_literals(self):
+        self.assertEqual(pymzm.array_to_mz([3, -12, 0]), "[3, -12, 0]")
+        self.assertEqual(pymzm.array_to_mz([[1, 2], [3, 40]]), "[|1, 2|3, 40|]")
+        self.assertEqual(pymzm.array_to_mz([[True], [False]]), "[|true|false|]")
+        self.assertEqual(pymzm.array_to_mz(np.arange(-4, 4).reshape(2, 2, 2)), "array3d(1..2, 1..2, 1..2, [-4, -3, -2, -1, 0, 1, 2, 3])")
+        values = np.arange(-50, 50).reshape(10, 10)
+        self.assertEqual("".join(pymzm.array_to_mz_chunks(values, chunk_size=7)), pymzm.array_to_mz(values))
+        self.assertEqual(pymzm.array_to_mz(np.array([0, 2 ** 63 - 1], dtype=np.uint64)), "[0, 9223372036854775807]")
+        with self.assertRaises(OverflowError):
+            pymzm.array_to_mz(np.array([1, 2 ** 63], dtype=np.uint64))
+
+        model = self.model
+        costs = model.add_constant("costs", np.arange(24).reshape(2, 3, 4))
+        x = model.add_variable("x", val_min=0, val_max=30)
+        model.add_constraint(x == costs[(1, 2, 3)])
+        model.set_solve_criteria(pymzm.SOLVE_SATISFY)
+        model.generate()
+
+        result = minizinc.Instance(self.gecode, model).solve(all_solutions=False)
+        self.assertEqual(result["x"], 23)
+
+    def test_memmap_constant(self):
+        with tempfile.TemporaryDirectory() as directory:
+            values = np.memmap(os.path.join(directory, "costs.bin"), dtype=np.int32, mode="w+", shape=(30, 40))
+            values[:] = np.arange(1200).reshape(30, 40) - 600
+            model = self.model
+            costs = model.add_constant("costs", values)
+            self.assertIs(costs.value, values)
+
+            fn = os.path.join(directory, "data.dzn")
+            model.write_data(fn)
+            with open(fn) as f:
+                self.assertEqual(f.read(), f"costs = {pymzm.array_to_mz(np.asarray(values))};\n")
+
+    def test_dedup(self):
+        model = self.model
+        a = model.add_constant("a", np.arange(20).reshape(4, 5))
+        b = model.add_constant("b", [[5 * i + j for j in range(5)] for i in range(4)])
+        c = model.add_constant("c", np.arange(20).reshape(5, 4))
+        self.assertEqual(a.digest, b.digest)
+        self.assertNotEqual(a.digest, c.digest)
+
+        x = model.add_variable("x", val_min=0, val_max=100)
+        model.add_constraint(x == a[(1, 1)] + b[(3, 4)] + c[(4, 3)])
+        model.set_solve_criteria(pymzm.SOLVE_SATISFY)
+        model.generate(dedup=True)
+
+        self.assertIn("array[1..4,1..5] of int: b = a;", model.model_mzn_str)
+        self.assertEqual(model.generate_stats["dedup_constants"], 1)
+        stats = model.generate_stats
+        self.assertGreater(stats["dedup_constant_bytes"], 0)
+        self.assertEqual(stats["dedup_domain_bytes"], 0)
+        self.assertEqual(stats["dedup_bytes_saved"], stats["dedup_constant_bytes"] + stats["dedup_domain_bytes"])
+
+        result = minizinc.Instance(self.gecode, model).solve(all_solutions=False)
+        self.assertEqual(result["x"], 6 + 19 + 19)
+
+    def test_stream(self):
+        def build():
+            model = pymzm.Model()
+            model.add_constant("weights", np.arange(1, 101))
+            xs = model.add_variables("x", range(100), pymzm.Variable.VTYPE_INTEGER, 0, 1)
+            model.add_constraint(pymzm.Expression.sum(xs[i] * (i + 1) for i in range(100)) <= 10)
+            model.set_solve_criteria(pymzm.SOLVE_MAXIMIZE, pymzm.Expression.sum(xs))
+            return model
+
+        text = "".join(build().iter_mzn())
+        with tempfile.TemporaryDirectory() as directory:
+            fn = os.path.join(directory, "model.mzn.gz")
+            with gzip.open(fn, "wt") as f:
+                build().write(f)
+            with gzip.open(fn, "rt") as f:
+                self.assertEqual(f.read(), text)
+
+            model = build()
+            fn = os.path.join(directory, "model.mzn")
+            model.generate(out=fn)
+            self.assertIsNone(model.model_mzn_str)
+            with open(fn) as f:
+                self.assertEqual(f.read(), text)
+
+            result = minizinc.Instance(self.gecode, model).solve(all_solutions=False)
+            self.assertEqual(result.objective, 4)
+
+    def test_incremental(self):
+        model = self.model
+        xs = model.add_variables("x", range(20), pymzm.Variable.VTYPE_INTEGER, 0, 20)
+        for i in range(19):
+            model.add_constraint(xs[i] < xs[i + 1])
+        model.set_solve_criteria(pymzm.SOLVE_MINIMIZE, xs[19])
+        model.generate()
+        self.assertEqual(model.generate_stats["rendered"], 19)
+
+        # Only the new cut is rendered, the model text is given to MiniZinc once
+        model.add_constraint(xs[0] >= 1)
+        model.generate()
+        self.assertEqual((model.generate_stats["rendered"], model.generate_stats["reused"]), (1, 19))
+        self.assertEqual(model.model_mzn_str.count("var 0..20: x_3;"), 1)
+
+        result = minizinc.Instance(self.gecode, model).solve(all_solutions=False)
+        self.assertEqual(result.objective, 20)
+
+    def test_snapshot(self):
+        model = self.model
+        xs = model.add_variables("x", range(5), pymzm.Variable.VTYPE_INTEGER, 0, 9, as_array=True)
+        b = model.add_variable("b", pymzm.Variable.VTYPE_BOOL)
+        model.add_constant("w", np.array([3, 1, 4, 1, 5]))
+        model.add_constraint(pymzm.Constraint.alldifferent(xs))
+        model.add_constraint(b == (xs[0] + 2 * xs[1] >= 10))
+        model.set_solve_criteria(pymzm.SOLVE_MAXIMIZE, pymzm.Expression.sum(xs) + b)
+        model.generate()
+
+        buffer = io.BytesIO()
+        pymzm.save_snapshot(model, buffer)
+        buffer.seek(0)
+        loaded = pymzm.load_snapshot(buffer)
+        loaded.generate()
+        self.assertEqual(loaded.model_mzn_str, model.model_mzn_str)
+
+        result = minizinc.Instance(self.gecode, loaded).solve(all_solutions=False)
+        self.assertEqual(result.objective, 36)
+
+        with self.assertRaises(pymzm.PymzmSnapshotError):
+            pymzm.load_snapshot(io.BytesIO(b"not a snapshot"))
+
+    def test_snapshot_numpy_indices(self):
+        model = self.model
+        ys = model.add_variables("y", list(np.arange(3)), val_min=0, val_max=9)
+        zs = model.add_variables("z", [(np.int64(i), np.int32(-j)) for i in range(2) for j in range(2)], val_min=0, val_max=9, as_array=True)
+        model.add_constraint(ys[1] + zs[1, -1] >= 3)
+        model.set_solve_criteria(pymzm.SOLVE_SATISFY)
+        model.generate()
+
+        # The raw store arrays have the same item size on every platform
+        for name in ["vtypes", "val_min", "val_max", "bounded", "name_offsets", "family_ids"]:
+            self.assertIn(getattr(model.store, name).typecode, "bq")
+
+        buffer = io.BytesIO()
+        pymzm.save_snapshot(model, buffer)
+        buffer.seek(0)
+        loaded = pymzm.load_snapshot(buffer)
+        # Only the variables in the constraint get a handle
+        self.assertEqual(len(loaded.store.handles.created), 2)
+        loaded.generate()
+        self.assertEqual(loaded.model_mzn_str, model.model_mzn_str)
+        self.assertEqual(loaded.lookup("y_2"), ("y", 2))
+        self.assertEqual(loaded.lookup("z_1_n1"), ("z", (1, -1)))
+
+    def test_flatzinc(self):
+        model = self.model
+        xs = model.add_variables("x", range(3), pymzm.Variable.VTYPE_INTEGER, 0, 4)
+        b = model.add_variable("b", pymzm.Variable.VTYPE_BOOL)
+        model.add_constraint(pymzm.Constraint.alldifferent(xs))
+        model.add_constraint(b == (xs[0] + 2 * xs[1] >= 5))
+        model.add_constraint(xs[0] * xs[1] <= 6)
+        model.set_solve_criteria(pymzm.SOLVE_MAXIMIZE, pymzm.Expression.sum(xs) + b)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.fzn")
+            model.write_fzn(path)
+            with open(path) as f:
+                text = f.read()
+            self.assertIn("constraint fzn_all_different_int([x_0,x_1,x_2]);", text)
+            self.assertIn("constraint int_lin_le_reif([-1,-2],[x_0,x_1],-5,", text)
+            self.assertIn("var bool: b :: output_var;", text)
+            self.assertEqual(model.generate_stats["fzn_introduced"], 4)
+
+            # The solver runs the file as it is
+            solutions = pymzm.solve_fzn(path, self.gecode)
+        best = solutions[-1]
+        self.assertEqual(sum(best[f"x_{i}"] for i in range(3)) + best["b"], 10)
+
+        model = pymzm.Model()
+        model.add_variable("f", pymzm.Variable.VTYPE_FLOAT, 0.5, 1.5)
+        model.set_solve_criteria(pymzm.SOLVE_SATISFY)
+        with self.assertRaises(pymzm.PymzmUnsupportedFlatZinc):
+            model.write_fzn(io.StringIO())
+
+    def test_flatzinc_coefficients(self):
+        model = self.model
+        xs = model.add_variables("x", range(4), pymzm.Variable.VTYPE_INTEGER, 0, 5)
+        c = model.add_constant("c", [3, 1, 4, 1])
+        model.add_constraint(pymzm.Expression.sum(xs[i] * c[i] for i in range(4)) <= 20)
+        model.set_solve_criteria(pymzm.SOLVE_SATISFY)
+
+        # Elements of constants at fixed indices are coefficients, not products
+        out = io.StringIO()
+        model.write_fzn(out)
+        self.assertIn("constraint int_lin_le([3,1,4,1],[x_0,x_1,x_2,x_3],20);", out.getvalue())
+        self.assertNotIn("int_times", out.getvalue())
+        self.assertEqual(model.generate_stats["fzn_introduced"], 0)
+
+    def test_flatzinc_equivalence(self):
+        model = self.model
+        sizes = model.add_constant("sizes", [3, 4, 5, 2])
+        bins = model.add_variables("bin", range(4), pymzm.Variable.VTYPE_INTEGER, 0, 2, as_array=True)
+        load = model.add_variables("load", range(3), pymzm.Variable.VTYPE_INTEGER, 0, 8)
+        used = model.add_variables("used", range(3), pymzm.Variable.VTYPE_BOOL)
+        for j in range(3):
+            model.add_constraint(load[j] == pymzm.Expression.sum(sizes[i] * (bins[i] == j) for i in range(4)))
+            model.add_constraint(used[j] == (load[j] >= 1))
+        model.add_constraint(bins[0] != bins[1])
+        model.set_solve_criteria(pymzm.SOLVE_MINIMIZE, pymzm.Expression.sum(used) * 10 + load[0])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.fzn")
+            model.write_fzn(path)
+            fzn = pymzm.solve_fzn(path, self.gecode)[-1]
+
+        model.generate()
+        result = minizinc.Instance(self.gecode, model).solve(all_solutions=False)
+
+        # Both paths find the same optimum, and the FlatZinc solution is valid
+        self.assertEqual(result.objective, sum(fzn[f"used_{j}"] for j in range(3)) * 10 + fzn["load_0"])
+        placed = fzn["bin"]
+        self.assertNotEqual(placed[0], placed[1])
+        for j in range(3):
+            self.assertEqual(fzn[f"load_{j}"], sum(size for size, b in zip([3, 4, 5, 2], placed) if b == j))
+            self.assertEqual(fzn[f"used_{j}"], fzn[f"load_{j}"] >= 1)
+
+    def test_parallel(self):
+        model = self.model
+        xs = model.add_variables("x", range(3000), pymzm.Variable.VTYPE_INTEGER, 0, 3000)
+        for i in range(2999):
+            model.add_constraint(xs[i] + abs(xs[i] - 5) < xs[i + 1] + 2 * i)
+        model.set_solve_criteria(pymzm.SOLVE_MINIMIZE, xs[2999])
+        model.generate()
+        sequential = model.model_mzn_str
+
+        # Rendered in shards, the text is the same
+        model.add_constraint(xs[0] >= 1)
+        model.generate(workers=2)
+        self.assertEqual(model.model_mzn_str, sequential[:sequential.index("solve")] + "constraint (x_0 >= 1);\n" + sequential[sequential.index("solve"):])
+        self.assertEqual((model.generate_stats["rendered"], model.generate_stats["reused"]), (1, 2999))
+
+        result = minizinc.Instance(self.gecode, model).solve(all_solutions=False)
+        self.assertTrue(result.solution is not None)
+
+    def test_compile_cache(self):
+        model = self.model
+        xs = model.add_variables("x", range(4), pymzm.Variable.VTYPE_INTEGER, 1, 4)
+        model.add_constraint(pymzm.Constraint.increasing([xs[0], xs[1]]))
+        model.add_constraint(pymzm.Constraint.alldifferent(xs))
+        model.add_constraint(pymzm.Constraint.count(xs, 2, 1))
+        model.set_solve_criteria(pymzm.SOLVE_MAXIMIZE, xs[0] + 2 * xs[3])
+        model.generate()
+
+        # Includes in a fixed order
+        includes = [line for line in model.model_mzn_str.splitlines() if line.startswith("include")]
+        self.assertEqual(includes, sorted(includes))
+        self.assertEqual(len(includes), 3)
+
+        # Least recently used entries are evicted beyond max_bytes
+        with tempfile.TemporaryDirectory() as d:
+            cache = pymzm.CompileCache(os.path.join(d, "cache"), max_bytes=250)
+            for key in ["a", "b", "c"]:
+                for name in ["f.fzn", "f.ozn"]:
+                    with open(os.path.join(d, name), "w") as f:
+                        f.write(key * 50)
+                cache.put(key, os.path.join(d, "f.fzn"), os.path.join(d, "f.ozn"))
+                os.utime(os.path.join(d, "cache", key), (len(key), ord(key)))
+            self.assertEqual([key for _, _, key in cache.entries()], ["b", "c"])
+            self.assertIsNone(cache.get("a"))
+            self.assertTrue(cache.get("b")[0].endswith("model.fzn"))
+            self.assertEqual(cache.size(), 200)
+
+            # An unchanged model is compiled once
+            cache = pymzm.CompileCache(os.path.join(d, "models"))
+            fzn, ozn = model.compile(self.gecode, cache)
+            self.assertEqual(model.compile(self.gecode, cache), (fzn, ozn))
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+            self.assertEqual(model.fingerprint(self.gecode), os.path.basename(os.path.dirname(fzn)))
+            self.assertNotEqual(model.fingerprint(self.gecode, ["-O2"]), model.fingerprint(self.gecode))
+
+            solutions = pymzm.solve_fzn(fzn, self.gecode, ozn=ozn)
+            self.assertEqual(solutions[-1]["x_0"] + 2 * solutions[-1]["x_3"], 10)
+
+    def test_parameters(self):
+        # Bin packing template, built once for every instance
+        model = self.model
+        n = model.add_parameter("n")
+        cap = model.add_parameter("cap")
+        items = model.add_index_set("ITEMS", n)
+        sizes = model.add_parameter("sizes", items)
+        bin_loads = model.add_variables("bin_load", items, val_min=0, val_max=cap)
+        bin_items = model.add_variable_array("bin_item", (items, items), pymzm.Variable.VTYPE_BOOL)
+        i, j = items.index("i"), items.index("j")
+        model.add_constraint(pymzm.Constraint.decreasing(bin_loads))
+        model.add_constraint(bin_loads[0] > 0)
+        model.add_constraint(pymzm.forall(i, bin_loads[i] == pymzm.sum_over(j, bin_items[i, j] * sizes[j])))
+        model.add_constraint(pymzm.forall(j, pymzm.sum_over(i, bin_items[i, j]) == 1))
+        model.set_solve_criteria(pymzm.SOLVE_MINIMIZE, pymzm.sum_over(i, bin_loads[i] > 0))
+        model.generate()
+
+        self.assertIn("set of int: ITEMS = 0..(n - 1);", model.model_mzn_str)
+        self.assertIn("array[ITEMS] of var 0..cap: bin_load;", model.model_mzn_str)
+        self.assertIn("constraint forall(j in ITEMS)((sum(i in ITEMS)(bin_item[i, j]) == 1));", model.model_mzn_str)
+
+        # n is the length of sizes
+        self.assertEqual(model.instance_data(cap=5, sizes=[3, 2, 2, 1]), "n = 4;\ncap = 5;\nsizes = array1d(0..3, [3, 2, 2, 1]);\n")
+        with self.assertRaises(pymzm.PymzmParameterError):
+            model.instance_data(cap=5)
+        with self.assertRaises(pymzm.PymzmParameterError):
+            model.instance_data(n=3, cap=5, sizes=[3, 2])
+        with self.assertRaises(TypeError):
+            list(bin_loads)
+
+        text = model.model_mzn_str
+        for data, bins in [(dict(cap=5, sizes=[3, 2, 2, 1]), 2), (dict(cap=4, sizes=np.array([4, 4, 1])), 3)]:
+            result = model.instantiate(self.gecode, **data).solve(all_solutions=False)
+            self.assertEqual(result.objective, bins)
+        self.assertEqual(model.model_mzn_str, text)
+
+    def test_forall(self):
+        model = self.model
+        n = 6
+        xs = model.add_variables("x", range(n), pymzm.Variable.VTYPE_INTEGER, 0, 20)
+        ys = model.add_variable_array("y", (n, 2), pymzm.Variable.VTYPE_INTEGER, 0, 5)
+        gaps = model.add_constant("gap", [2, 1, 3, 1, 2, 1])
+
+        # Traced once, one constraint each
+        self.assertEqual(len(model.forall(range(n - 1), lambda i: xs[i] + gaps[i] <= xs[i + 1])), 1)
+        self.assertEqual(len(model.forall([range(n), range(2)], lambda i, k: ys[i, k] <= gaps[i] + k)), 1)
+        self.assertEqual(len(model.forall(range(n), lambda i: pymzm.Constraint.alldifferent([ys[i, 0], ys[i, 1]]))), 1)
+        self.assertIn("alldifferent", model.global_constraints)
+
+        # Branching on the index or indexing a list is unrolled
+        sizes = [1, 0, 1, 0, 1, 0]
+        self.assertEqual(len(model.forall(range(n), lambda i: ys[i, 0] >= 1 if i % 2 else ys[i, 1] >= 1)), n)
+        self.assertEqual(len(model.forall(range(n), lambda i: ys[i, 1] >= sizes[i])), n)
+        with self.assertRaises(KeyError):
+            model.forall(range(n), lambda i: xs[i] < xs[i + 1])
+        self.assertEqual(len(model.constraints), 3 + 2 * n + n - 1)
+
+        model.set_solve_criteria(pymzm.SOLVE_MINIMIZE, xs[n - 1] + pymzm.Expression.sum(ys.flat))
+        model.generate()
+        self.assertEqual(model.model_mzn_str.count("forall(pymzm_t0i0 in 0..4)"), 1)
+        result = minizinc.Instance(self.gecode, model).solve(all_solutions=False)
+        self.assertEqual(result.objective, 9 + 6)
+
+    def test_forall_copies(self):
+        model = self.model
+        xs = model.add_variables("x", range(4), pymzm.Variable.VTYPE_INTEGER, 0, 9)
+        ys = model.add_variable_array("y", (2, 3), pymzm.Variable.VTYPE_INTEGER, 0, 9, as_array=True)
+        zs = model.add_variables("z", [(i, j) for i in range(2) for j in range(3)], pymzm.Variable.VTYPE_BOOL, as_array=True)
+        model.forall(range(3), lambda i: xs[i] < xs[i + 1])
+        model.forall(range(3), lambda i: xs[i] + 1 != xs[i + 1])
+        model.forall([range(2), range(3)], lambda i, j: ys[i, j] + zs[i, j] >= xs[j])
+        model.set_solve_criteria(pymzm.SOLVE_SATISFY)
+        model.generate(prune=True)
+
+        # Arrays are indexed by name, scalar families through one shared copy
+        text = model.model_mzn_str
+        self.assertNotIn("let", text)
+        self.assertEqual(text.count("array1d(1..4, [x_0, x_1, x_2, x_3])"), 1)
+        self.assertIn("(y[(pymzm_t0i0 + 1), (pymzm_t0i1 + 1)] + z[(pymzm_t0i0 + 1), (pymzm_t0i1 + 1)])", text)
+
+    def test_simplify(self):
+        model = self.model
+        x = model.add_variable("x", val_min=-10, val_max=10)
+        y = model.add_variable("y", val_min=-10, val_max=10)
+        model.add_constraint(x * 1 + 0 == y)
+        model.add_constraint(pymzm.Expression.sum([]) + x + 2 + 3 >= 7)
+        model.add_constraint(5 < y - 2)
+        model.add_constraint(pymzm.Expression.AND([x == x, y >= y]))
+        model.set_solve_criteria(pymzm.SOLVE_MAXIMIZE, -(-x))
+        model.generate(simplify=True)
+
+        self.assertIn("constraint (x >= 2);", model.model_mzn_str)
+        self.assertIn("constraint (y > 7);", model.model_mzn_str)
+        self.assertEqual(model.model_mzn_str.count("constraint "), 3)
+        self.assertIn("solve maximize x;", model.model_mzn_str)
+        self.assertGreater(model.generate_stats["simplify_removed_nodes"], 0)
+
+        result = minizinc.Instance(self.gecode, model).solve(all_solutions=False)
+        self.assertTrue(result.solution is not None)
+        self.assertEqual(result.objective, 10)